@@ -0,0 +1,147 @@
+# Headless alert runner: loads the tables from the data source (DATA_BACKEND), evaluates the alert rules over the whole
+# data set and sends the digests, outside any Streamlit session.
+#
+#   python alert_runner.py              # one run, for cron
+#   python alert_runner.py --every 30   # run every 30 minutes
+import argparse
+import fcntl
+import json
+import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from alerts import FingerprintStore, build_digests, collect_contract_reminders, collect_notifications
+from data_source import create_source
+from loader import TABLE_COLUMNS
+from mailer import MailDispatcher
+
+load_dotenv()
+
+RUN_LOG = os.getenv("ALERT_RUN_LOG", "alert_runs.jsonl")
+LOCK_FILE = os.getenv("ALERT_RUNNER_LOCK", "alert_runner.lock")
+
+# How long a run waits for the queued digests to be delivered
+SEND_TIMEOUT_SECONDS = 600
+
+
+# Exclusive, non-blocking lock held for the duration of a run; released by the OS if the runner dies
+class RunnerLock:
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a+")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            self.file = None
+            return False
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(str(os.getpid()))
+        self.file.flush()
+        return True
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+
+
+def append_run_log(entry, path=RUN_LOG):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, default=str) + "\n")
+
+
+# Last entry of the run log, or None if the runner never ran
+def last_run(path=RUN_LOG):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 64 * 1024))
+        lines = f.read().decode("utf-8", errors="ignore").strip().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+def run_once(source, dispatcher, recipient):
+    timings = {}
+    start = time.perf_counter()
+    data, _ = source.load_tables(TABLE_COLUMNS)
+    errors = [error for _, error in data.values() if error]
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    df_po, _ = data["purchase_orders"]
+    df_pt, _ = data["payment_terms"]
+    df_contracts, _ = data["contracts"]
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    notifications = collect_notifications(df_contracts, df_po, df_pt, recipient)
+    reminders = collect_contract_reminders(df_contracts)
+    store = FingerprintStore()
+    digests = build_digests(notifications, store) + build_digests(reminders, store)
+    timings["evaluate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    messages = [(subject, body, to_email, attachments) for subject, body, to_email, _, attachments in digests]
+    batch = dispatcher.submit(messages, on_sent=lambda i: store.mark(digests[i][2], digests[i][3]))
+    batch.wait(SEND_TIMEOUT_SECONDS)
+    timings["send"] = time.perf_counter() - start
+
+    return {
+        "alerts": len(notifications) + len(reminders),
+        "digests": len(digests),
+        "sent": batch.sent,
+        "failed": batch.failed,
+        "errors": batch.errors[:20],
+        "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+    }
+
+
+def run(source, dispatcher, recipient):
+    entry = {"started_at": datetime.now().isoformat(timespec="seconds"), "pid": os.getpid()}
+    with RunnerLock() as acquired:
+        if not acquired:
+            entry.update(status="skipped", reason="another runner holds the lock")
+        else:
+            try:
+                entry.update(status="ok", **run_once(source, dispatcher, recipient))
+            except Exception as e:
+                entry.update(status="error", error=str(e))
+    entry["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    append_run_log(entry)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Évalue les alertes achats et envoie les digests.")
+    parser.add_argument("--every", type=float, metavar="MINUTES", help="répéter toutes les MINUTES minutes au lieu d'une seule exécution")
+    args = parser.parse_args()
+
+    required_vars = ["SMTP_SERVER", "SMTP_PORT", "NOTIFICATION_RECIPIENT"]
+    if os.getenv("DATA_BACKEND", "supabase") != "local":
+        required_vars = ["SUPABASE_URL", "SUPABASE_KEY"] + required_vars
+    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    if missing_vars:
+        raise SystemExit(f"Variables d'environnement manquantes : {', '.join(missing_vars)}. Vérifiez le fichier .env.")
+
+    source = create_source()
+    dispatcher = MailDispatcher.from_env()
+    recipient = os.getenv("NOTIFICATION_RECIPIENT")
+
+    while True:
+        started = time.monotonic()
+        entry = run(source, dispatcher, recipient)
+        print(json.dumps(entry, default=str))
+        if not args.every:
+            return
+        time.sleep(max(0.0, args.every * 60 - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+ALERTS_DB = os.getenv("ALERTS_DB", "alerts.db")
+
+# An unchanged alert is not sent again to the same recipient within this window
+DEDUP_WINDOW_HOURS = float(os.getenv("ALERT_DEDUP_HOURS", "24"))
+
+# Contracts expiring within this many days raise an alert
+CONTRACT_EXPIRY_DAYS = 60
+
+# Digest sections, in display order
+RULE_TITLES = {
+    "contract_expiry": "Contracts expiring",
+    "contract_reminder": "Contrats arrivant à échéance",
+    "po_pending": "Purchase orders pending validation",
+    "payment_delay": "Payment delays",
+}
+
+# Lines of a digest section written in the email body, most urgent first; the others go to the
+# attached CSV
+DIGEST_SECTION_LINES = int(os.getenv("ALERT_DIGEST_LINES", "50"))
+
+# Lines of the attached CSV; the alerts past it are not marked as sent and come in the next digests
+DIGEST_ATTACHMENT_LINES = int(os.getenv("ALERT_ATTACHMENT_LINES", "10000"))
+
+DIGEST_ATTACHMENT = "alertes.csv"
+
+# urgency orders the lines of a section, most urgent (greatest) first
+NOTIFICATION_COLUMNS = ["recipient", "rule", "fingerprint", "line", "urgency"]
+
+# Sidebar alert rules: (icon, summary label), in display order
+ALERT_RULES = {
+    "amount": ("🚨", "Commandes au-dessus du seuil"),
+    "pending": ("⏳", "Commandes en attente"),
+    "expiry": ("📅", "Contrats expirant sous 60 jours"),
+    "delay": ("⏰", "Retards de paiement"),
+}
+
+ALERT_COLUMNS = ["rule", "key", "fournisseur", "value"]
+
+# Alerts listed per rule in the sidebar before "show more"
+ALERTS_TOP_N = 5
+
+
+# Stable identity of an alert: the same alert in the same state keeps its fingerprint
+def fingerprint(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def _date(value):
+    return value.strftime('%d/%m/%Y') if pd.notna(value) else "?"
+
+
+def _notifications(recipients, rule, keys, lines, urgency):
+    return pd.DataFrame({
+        "recipient": recipients,
+        "rule": rule,
+        "fingerprint": [fingerprint(rule, *key) for key in keys],
+        "line": lines,
+        "urgency": pd.Series(urgency, dtype="float64").to_numpy(),
+    }, columns=NOTIFICATION_COLUMNS)
+
+
+# Vectorized masks of every alert rule, with now evaluated once for all contracts
+def alert_masks(df_po, df_contracts, df_pt, seuil_alert, seuil_delai, now=None):
+    now = now or pd.Timestamp.now()
+    days_left = (df_contracts["DATE_EXPIRATION"] - now).dt.days
+    return {
+        "amount": (df_po["MONTANT_EUR"] > seuil_alert).to_numpy(),
+        "pending": (df_po["STATUT"] == "En attente").to_numpy(),
+        "expiry": (days_left <= CONTRACT_EXPIRY_DAYS).to_numpy(),
+        "delay": (df_pt["DELAI_PAIEMENT"] > seuil_delai).to_numpy(),
+    }, days_left
+
+
+# Compact table of the sidebar alerts (rule, key, fournisseur, value), most urgent first within each rule
+def evaluate_alerts(df_po, df_contracts, df_pt, seuil_alert, seuil_delai, now=None):
+    masks, days_left = alert_masks(df_po, df_contracts, df_pt, seuil_alert, seuil_delai, now)
+    frames = [
+        pd.DataFrame({"rule": "amount", "key": df_po["PO_NUMBER"][masks["amount"]],
+                      "fournisseur": df_po["FOURNISSEUR"][masks["amount"]], "value": df_po["MONTANT_EUR"][masks["amount"]]})
+        .sort_values("value", ascending=False),
+        pd.DataFrame({"rule": "pending", "key": df_po["PO_NUMBER"][masks["pending"]],
+                      "fournisseur": df_po["FOURNISSEUR"][masks["pending"]], "value": df_po["MONTANT_EUR"][masks["pending"]]})
+        .sort_values("value", ascending=False),
+        pd.DataFrame({"rule": "expiry", "key": df_contracts["CONTRAT"][masks["expiry"]],
+                      "fournisseur": df_contracts["FOURNISSEUR"][masks["expiry"]], "value": days_left[masks["expiry"]]})
+        .sort_values("value"),
+        pd.DataFrame({"rule": "delay", "key": df_pt["FOURNISSEUR"][masks["delay"]],
+                      "fournisseur": df_pt["FOURNISSEUR"][masks["delay"]], "value": df_pt["DELAI_PAIEMENT"][masks["delay"]]})
+        .sort_values("value", ascending=False),
+    ]
+    return pd.concat(
+        [frame.astype({"key": str, "fournisseur": str, "value": "float64"}) for frame in frames],
+        ignore_index=True,
+    )[ALERT_COLUMNS]
+
+
+# Sidebar message of one alert row
+def alert_message(rule, key, fournisseur, value):
+    if rule == "amount":
+        return f"⚠️ {fournisseur}: {value:,.2f} EUR exceeds threshold"
+    if rule == "pending":
+        return f"⚠️ Order {key} pending"
+    if rule == "expiry":
+        return f"⚠️ Contract {key} expires in {value:.0f} days"
+    return f"⚠️ {fournisseur}: {value:g} days payment delay"
+
+
+# Evaluate the notification rules over the filtered frames in one pass, all addressed to recipient
+def collect_notifications(df_contracts, df_po, df_pt, recipient, now=None):
+    masks, days_left = alert_masks(df_po, df_contracts, df_pt, float("inf"), 0, now)
+    frames = []
+
+    expiring = df_contracts[masks["expiry"]]
+    frames.append(_notifications(
+        recipient, "contract_expiry",
+        zip(expiring["CONTRAT"], expiring["DATE_EXPIRATION"]),
+        [
+            f"{contrat} with {fournisseur} expires in {days} days ({expiration:%d/%m/%Y}), amount {montant:,.2f} MAD"
+            for contrat, fournisseur, days, expiration, montant in zip(
+                expiring["CONTRAT"], expiring["FOURNISSEUR"], days_left[expiring.index],
+                expiring["DATE_EXPIRATION"], expiring["MONTANT_MAD"])
+        ],
+        -days_left[expiring.index],
+    ))
+
+    pending = df_po[masks["pending"]]
+    frames.append(_notifications(
+        recipient, "po_pending",
+        zip(pending["PO_NUMBER"], pending["MONTANT_EUR"]),
+        [
+            f"{po} with {fournisseur}, {montant:,.2f} EUR, department {departement}, dated {_date(date)}"
+            for po, fournisseur, montant, departement, date in zip(
+                pending["PO_NUMBER"], pending["FOURNISSEUR"], pending["MONTANT_EUR"],
+                pending["DEPARTEMENT"], pending["DATE"])
+        ],
+        pending["MONTANT_EUR"],
+    ))
+
+    delayed = df_pt[masks["delay"]]
+    frames.append(_notifications(
+        recipient, "payment_delay",
+        zip(delayed["FOURNISSEUR"], delayed["DIVISION"], delayed["DELAI_PAIEMENT"]),
+        [
+            f"{fournisseur}: {delai:g} days payment delay, turnover {turnover:,.2f} EUR, division {division}"
+            for fournisseur, delai, turnover, division in zip(
+                delayed["FOURNISSEUR"], delayed["DELAI_PAIEMENT"], delayed["TURNOVER_EUR"], delayed["DIVISION"])
+        ],
+        delayed["DELAI_PAIEMENT"],
+    ))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+# Contract expiry reminders, each addressed to the contract's RESPONSABLE_EMAIL
+def collect_contract_reminders(df_contracts, now=None):
+    now = now or pd.Timestamp.now()
+    days_left = (df_contracts["DATE_EXPIRATION"] - now).dt.days
+    expiring = df_contracts[(days_left <= CONTRACT_EXPIRY_DAYS) & df_contracts["RESPONSABLE_EMAIL"].notna()]
+    return _notifications(
+        expiring["RESPONSABLE_EMAIL"].astype(str).to_numpy(), "contract_reminder",
+        zip(expiring["CONTRAT"], expiring["DATE_EXPIRATION"]),
+        [
+            f"Le contrat {contrat} avec {fournisseur} expire dans {days} jours (date d'expiration : {expiration:%d/%m/%Y})"
+            for contrat, fournisseur, days, expiration in zip(
+                expiring["CONTRAT"], expiring["FOURNISSEUR"], days_left[expiring.index], expiring["DATE_EXPIRATION"])
+        ],
+        -days_left[expiring.index],
+    )
+
+
+# Fingerprints of the alerts already sent, persisted in SQLite
+class FingerprintStore:
+    def __init__(self, path=ALERTS_DB):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sent_alerts (
+                    recipient TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    sent_at TEXT NOT NULL,
+                    PRIMARY KEY (recipient, fingerprint)
+                )
+            ''')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    # Fingerprints sent to recipient within the last window_hours
+    def recent(self, recipient, fingerprints, window_hours=DEDUP_WINDOW_HOURS):
+        since = (datetime.now() - timedelta(hours=window_hours)).strftime('%Y-%m-%d %H:%M:%S')
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT fingerprint FROM sent_alerts WHERE recipient = ? AND sent_at >= ? "
+                "AND fingerprint IN (SELECT value FROM json_each(?))",
+                (recipient, since, json.dumps(list(fingerprints))),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark(self, recipient, fingerprints):
+        sent_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sent_alerts (recipient, fingerprint, sent_at) VALUES (?, ?, ?)",
+                [(recipient, fp, sent_at) for fp in fingerprints],
+            )
+
+
+# Group the alerts not sent recently into one digest per recipient. The body lists the
+# DIGEST_SECTION_LINES most urgent alerts of each section; when there are more, the attached CSV
+# lists the body lines and then the others, up to DIGEST_ATTACHMENT_LINES. Only the alerts
+# delivered in the body or the attachment are returned as fingerprints to mark as sent.
+# Returns a list of (subject, body, recipient, fingerprints, attachments), attachments being
+# a list of (filename, CSV text).
+def build_digests(notifications, store, window_hours=DEDUP_WINDOW_HOURS):
+    sections = {rule: i for i, rule in enumerate(RULE_TITLES)}
+    digests = []
+    for recipient, group in notifications.groupby("recipient", sort=False):
+        sent = store.recent(recipient, group["fingerprint"], window_hours)
+        group = group[~group["fingerprint"].isin(sent)].drop_duplicates("fingerprint")
+        if group.empty:
+            continue
+        group = group.assign(section=group["rule"].map(sections)).sort_values(["section", "urgency"], ascending=[True, False], kind="stable")
+        in_body = (group.groupby("rule", sort=False).cumcount() < DIGEST_SECTION_LINES).to_numpy()
+        # The attachment lists the body lines, then the others in section order up to its limit
+        delivered = group[in_body | (np.cumsum(~in_body) <= DIGEST_ATTACHMENT_LINES - in_body.sum())]
+        attached = len(delivered) > in_body.sum()
+
+        paragraphs = []
+        for rule, title in RULE_TITLES.items():
+            section = group["rule"].to_numpy() == rule
+            lines = group.loc[section & in_body, "line"]
+            if len(lines):
+                paragraph = f"{title} ({section.sum()}):\n" + "\n".join(f"- {line}" for line in lines)
+                if section.sum() > len(lines):
+                    paragraph += f"\n… et {section.sum() - len(lines)} autre(s)" + (f", voir {DIGEST_ATTACHMENT}" if attached else "")
+                paragraphs.append(paragraph)
+        if len(delivered) < len(group):
+            paragraphs.append(f"{len(group) - len(delivered)} alerte(s) non jointe(s) suivront dans les prochains envois.")
+        attachments = []
+        if attached:
+            listing = pd.DataFrame({"section": delivered["rule"].map(RULE_TITLES), "alerte": delivered["line"]})
+            attachments.append((DIGEST_ATTACHMENT, listing.to_csv(index=False)))
+        subject = f"Alertes achats : {len(group)} nouvelle(s) alerte(s)"
+        digests.append((subject, "\n\n".join(paragraphs), recipient, delivered["fingerprint"].tolist(), attachments))
+    return digests
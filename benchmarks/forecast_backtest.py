@@ -0,0 +1,177 @@
+# Rolling-origin backtest of the tab 1 forecast models over the monthly MONTANT_EUR history of
+# every department and supplier.
+#
+# For each series and each origin (every --step months once --min-train months are known), every
+# model is fitted on the history up to the origin and scored on the next FORECAST_HORIZON months.
+# Reports MAPE over the months with purchases and fit/predict wall time, per model and column.
+# Series are spread over a process pool.
+#
+# Run from the repository root:
+#   python -m benchmarks.forecast_backtest                          # synthetic, 200k POs
+#   python -m benchmarks.forecast_backtest --rows 1000000 --workers 4
+#   python -m benchmarks.forecast_backtest --csv purchase_orders.csv --min-train 3
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import make_purchase_orders
+from forecast import FORECAST_COLUMNS, FORECAST_HORIZON, monthly_series
+from rollup import build_cube
+from schema import apply_schema
+
+SEASON = 12
+SES_ALPHAS = np.linspace(0.1, 0.9, 9)
+
+
+# The dashboard model: least squares over the days since the first month with purchases, as
+# forecast.fit_linear computes for all series at once
+def linear_model(dates, values, future):
+    present = ~np.isnan(values)
+    y = values[present]
+    first = dates[present][0]
+    x = (dates[present] - first) / np.timedelta64(1, "D")
+    if len(y) < 2:
+        return np.full(len(future), y[-1])
+    slope = ((x - x.mean()) * (y - y.mean())).sum() / ((x - x.mean()) ** 2).sum()
+    intercept = y.mean() - slope * x.mean()
+    return intercept + slope * ((future - first) / np.timedelta64(1, "D"))
+
+
+# Value of the same month one season earlier, or the last value with less than a season of history
+def seasonal_naive_model(dates, values, future):
+    values = np.nan_to_num(values)
+    if len(values) < SEASON:
+        return np.full(len(future), values[-1])
+    return values[len(values) - SEASON + np.arange(len(future)) % SEASON]
+
+
+# Simple exponential smoothing, alpha picked by one-step-ahead squared error
+def ses_model(dates, values, future):
+    values = np.nan_to_num(values)
+    best_level, best_error = values[-1], float("inf")
+    for alpha in SES_ALPHAS:
+        level, error = values[0], 0.0
+        for value in values[1:]:
+            error += (value - level) ** 2
+            level = alpha * value + (1 - alpha) * level
+        if error < best_error:
+            best_level, best_error = level, error
+    return np.full(len(future), best_level)
+
+
+def prophet_model(dates, values, future):
+    from prophet import Prophet
+    present = ~np.isnan(values)
+    model = Prophet(weekly_seasonality=False, daily_seasonality=False)
+    model.fit(pd.DataFrame({"ds": dates[present], "y": values[present]}))
+    return model.predict(pd.DataFrame({"ds": future}))["yhat"].to_numpy()
+
+
+MODELS = {
+    "linear": linear_model,
+    "seasonal_naive": seasonal_naive_model,
+    "ses": ses_model,
+    "prophet": prophet_model,
+}
+
+
+def available_models(names):
+    models = []
+    for name in names:
+        if name == "prophet":
+            try:
+                import prophet  # noqa: F401
+            except ImportError:
+                print("prophet non installé, modèle ignoré")
+                continue
+        models.append(name)
+    return models
+
+
+# Monthly series of every value of column on a regular month grid, NaN for months without POs
+def grid_series(cube, column):
+    series = monthly_series(cube, column)
+    for key, group in series.groupby(column, observed=True):
+        months = pd.date_range(group["MONTH"].min(), group["MONTH"].max(), freq="MS")
+        values = group.set_index("MONTH")["MONTANT_EUR"].reindex(months).to_numpy(dtype="float64")
+        yield str(key), months.to_numpy(), values
+
+
+# Backtest one chunk of series with every model; runs in a worker process
+def backtest_chunk(chunk, models, min_train, step):
+    stats = {name: {"errors": [], "forecasts": 0, "seconds": 0.0} for name in models}
+    for _, dates, values in chunk:
+        for origin in range(min_train, len(values) - FORECAST_HORIZON + 1, step):
+            if np.isnan(values[:origin]).all():
+                continue
+            actual = np.nan_to_num(values[origin:origin + FORECAST_HORIZON])
+            future = dates[origin:origin + FORECAST_HORIZON]
+            scored = actual > 0
+            for name in models:
+                start = time.perf_counter()
+                predicted = MODELS[name](dates[:origin], values[:origin], future)
+                stats[name]["seconds"] += time.perf_counter() - start
+                stats[name]["forecasts"] += 1
+                stats[name]["errors"].append(np.abs(predicted[scored] - actual[scored]) / actual[scored])
+    return {
+        name: {**entry, "errors": np.concatenate(entry["errors"]) if entry["errors"] else np.array([])}
+        for name, entry in stats.items()
+    }
+
+
+def run(cube, columns, models, workers, min_train, step):
+    rows = []
+    for column in columns:
+        series = list(grid_series(cube, column))
+        chunks = [series[i::workers] for i in range(workers)]
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(backtest_chunk, chunks, [models] * workers, [min_train] * workers, [step] * workers))
+        wall = time.perf_counter() - start
+        for name in models:
+            errors = np.concatenate([result[name]["errors"] for result in results])
+            forecasts = sum(result[name]["forecasts"] for result in results)
+            seconds = sum(result[name]["seconds"] for result in results)
+            rows.append({
+                "column": column,
+                "model": name,
+                "series": len(series),
+                "forecasts": forecasts,
+                "MAPE %": errors.mean() * 100 if len(errors) else np.nan,
+                "median APE %": np.median(errors) * 100 if len(errors) else np.nan,
+                "fit+predict s": seconds,
+                "ms / forecast": seconds / forecasts * 1000 if forecasts else np.nan,
+                "wall s (all models)": wall,
+            })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest des modèles de prévision des achats.")
+    parser.add_argument("--csv", help="fichier purchase_orders.csv à utiliser au lieu de données synthétiques")
+    parser.add_argument("--rows", type=int, default=200_000, help="nombre de POs synthétiques")
+    parser.add_argument("--columns", nargs="+", default=FORECAST_COLUMNS, choices=FORECAST_COLUMNS)
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--min-train", type=int, default=12, help="mois d'historique avant la première origine")
+    parser.add_argument("--step", type=int, default=1, help="mois entre deux origines")
+    parser.add_argument("--out", help="écrire les résultats dans ce fichier CSV")
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.csv, dtype=str) if args.csv else make_purchase_orders(args.rows)
+    cube = build_cube(apply_schema(raw, "purchase_orders"))
+    models = available_models(args.models)
+    report = run(cube, args.columns, models, args.workers, args.min_train, args.step)
+
+    print(f"{args.csv or 'synthetic'}, {len(raw):,} POs, horizon {FORECAST_HORIZON} months, min train {args.min_train}, step {args.step}")
+    print(report.round(3).to_string(index=False))
+    if args.out:
+        report.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Startup-time budget of the dashboard.
+#
+# 1. `-X importtime` breakdown of the modules test.py imports at module level (what every cold
+#    start pays before the login screen), by top-level package.
+# 2. Cold time to the login screen: a fresh interpreter runs the script with Streamlit's AppTest
+#    until it stops on the login prompt.
+#
+# Run from the repository root:
+#   python -m benchmarks.import_time [script ...]
+# e.g. compare against an older revision:
+#   git show <rev>:test.py > /tmp/test_old.py && python -m benchmarks.import_time /tmp/test_old.py test.py
+import ast
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Login-screen budget, in seconds of cold start
+LOGIN_BUDGET_SECONDS = float(os.getenv("LOGIN_BUDGET_SECONDS", "3.0"))
+
+
+# Modules imported by the top-level statements of a script
+def startup_modules(path):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+
+# Cumulative import time in ms of each top-level package imported by `modules`, in a fresh interpreter
+def import_breakdown(modules):
+    code = "\n".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    breakdown = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        # Nested imports are indented; only top-level entries add up to the total
+        if not line.split("|")[2].startswith("  "):
+            package = name.split(".")[0]
+            breakdown[package] = breakdown.get(package, 0.0) + int(cumulative) / 1000
+    return dict(sorted(breakdown.items(), key=lambda item: -item[1]))
+
+
+# Cold wall time, in a fresh interpreter, for AppTest to run a script up to the login screen
+def login_screen_seconds(path):
+    code = textwrap.dedent(f"""
+        import os, time
+        os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+        os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.ZRrHA1JJJW8opsbCGfG_HACGpVUMN_a9IV7pAx_Zmeo")
+        start = time.perf_counter()
+        from streamlit.testing.v1 import AppTest
+        app = AppTest.from_file({path!r}, default_timeout=120).run()
+        elapsed = time.perf_counter() - start
+        assert not app.exception, app.exception
+        print(elapsed)
+    """)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "AppTest failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def report(path):
+    modules = startup_modules(path)
+    breakdown = import_breakdown(modules)
+    print(f"== {path}")
+    print(f"{'package':<28}{'cumulative ms':>14}")
+    for package, ms in breakdown.items():
+        print(f"{package:<28}{ms:>14.1f}")
+    print(f"{'total':<28}{sum(breakdown.values()):>14.1f}")
+    try:
+        seconds = login_screen_seconds(os.path.abspath(path))
+        status = "OK" if seconds <= LOGIN_BUDGET_SECONDS else f"OVER BUDGET ({LOGIN_BUDGET_SECONDS:.1f} s)"
+        print(f"time to login screen: {seconds:.2f} s {status}")
+    except RuntimeError as e:
+        print(f"time to login screen: n/a ({e})")
+    print()
+
+
+if __name__ == "__main__":
+    for script in sys.argv[1:] or [os.path.join(ROOT, "test.py")]:
+        report(script)
@@ -0,0 +1,295 @@
+# End-to-end scaling benchmark of the dashboard data path, headless: every stage a rerun goes
+# through, on synthetic datasets of growing size (benchmarks/synthetic_data.py) or on tables
+# written to a directory.
+#
+# Stages, in data-path order (the first two and rollup_cube run once per data version in the
+# app, the others on reruns whose filters changed):
+#   type_conversion      schema.apply_schema of the three raw tables
+#   filter_indexes       the sidebar FilterIndexes
+#   sidebar_filtering    filter masks for a typical selection, and the filtered frames
+#   global_search        the SearchIndexes built on first search, then one query
+#   alert_evaluation     alerts.evaluate_alerts on the filtered frames
+#   rollup_cube          the monthly PO cube
+#   tab1_groupbys        cube slice for the filters and the tab 1 chart aggregations
+#   supplier_comparison  supplier scorecard and radar normalization
+#   forecast             department and supplier forecasts, and the series of the top supplier
+#   tab2_kpis            payment-terms analytics and both heatmap matrices
+#   ppt_export           report figures and the PowerPoint build (figures need kaleido)
+#
+# Each stage is timed over --repeat runs (best kept), then run once more under tracemalloc for
+# its peak memory above what was allocated before it. tracemalloc sees numpy and pandas
+# buffers but not Arrow string buffers; maxrss_mb, the process peak RSS after the stage, covers
+# those. Results are appended to --results (CSV) with the revision, so runs can be compared:
+# --compare reports each stage against the previous run of the same size in that file and
+# exits with status 1 when one is slower than --tolerance allows.
+#
+# Run from the repository root:
+#   python -m benchmarks.pipeline_benchmark                          # 10k, 100k and 1M POs
+#   python -m benchmarks.pipeline_benchmark --rows 10M --repeat 1
+#   python -m benchmarks.pipeline_benchmark --data data/1M --compare
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from alerts import evaluate_alerts
+from benchmarks.synthetic_data import SIZES, make_tables, parse_rows, read_tables
+from filter_index import FilterIndex
+from forecast import FORECAST_COLUMNS, Forecasts
+from payment_terms import HEATMAP_METRICS, PaymentTermsAnalytics
+from report import ReportJob, build_report, table_rows
+from rollup import build_cube, slice_cube
+from schema import apply_schema
+from scorecard import RADAR_METRICS, normalize_scores, supplier_scorecard
+from search_index import SEARCH_COLUMNS, SearchIndex
+
+RESULTS_FILE = os.path.join("benchmarks", "results", "pipeline.csv")
+RESULT_COLUMNS = ["run_at", "revision", "dataset", "rows", "stage", "seconds", "peak_mb", "maxrss_mb"]
+
+SEARCH_QUERY = "mécanique"
+# Sidebar selection: every value but the least frequent department and the cancelled POs,
+# over the last PERIOD_MONTHS months of data
+PERIOD_MONTHS = 24
+ALERT_AMOUNT_THRESHOLD = 100000.0
+ALERT_DELAY_THRESHOLD = 5
+# Slowdowns smaller than this are timer noise, never reported as regressions
+COMPARE_MIN_SECONDS = 0.01
+
+
+def type_conversion(ctx):
+    return {name: apply_schema(df, name) for name, df in ctx["raw"].items()}
+
+
+def filter_indexes(ctx):
+    return {
+        "po_index": FilterIndex(ctx["purchase_orders"], ["FOURNISSEUR", "DEPARTEMENT", "TYPE_ACHAT", "STATUT"], "DATE"),
+        "pt_index": FilterIndex(ctx["payment_terms"], ["FOURNISSEUR", "DIVISION"]),
+        "contracts_index": FilterIndex(ctx["contracts"], ["FOURNISSEUR"], "DATE_EXPIRATION"),
+    }
+
+
+def sidebar_filtering(ctx):
+    df_po, po_index = ctx["purchase_orders"], ctx["po_index"]
+    departments = df_po["DEPARTEMENT"].value_counts().index.tolist()
+    po_filters = {
+        "FOURNISSEUR": po_index.values("FOURNISSEUR"),
+        "DEPARTEMENT": departments[:-1] if len(departments) > 1 else departments,
+        "TYPE_ACHAT": po_index.values("TYPE_ACHAT"),
+        "STATUT": [status for status in po_index.values("STATUT") if status != "Annulé"],
+    }
+    period = (max(po_index.date_min, po_index.date_max - pd.DateOffset(months=PERIOD_MONTHS)), po_index.date_max)
+    pt_index, contracts_index = ctx["pt_index"], ctx["contracts_index"]
+    po_mask = po_index.mask(po_filters, period)
+    pt_mask = pt_index.mask({col: pt_index.values(col) for col in ("FOURNISSEUR", "DIVISION")})
+    contracts_mask = contracts_index.mask(
+        {"FOURNISSEUR": contracts_index.values("FOURNISSEUR")}, (contracts_index.date_min, contracts_index.date_max)
+    )
+    return {
+        "po_filters": po_filters,
+        "period": period,
+        "po_filtered": df_po[po_mask],
+        "pt_filtered": ctx["payment_terms"][pt_mask],
+        "contracts_filtered": ctx["contracts"][contracts_mask],
+    }
+
+
+def global_search(ctx):
+    matches = {}
+    for name in ("purchase_orders", "payment_terms", "contracts"):
+        matches[name] = SearchIndex(ctx[name], SEARCH_COLUMNS[name]).mask(SEARCH_QUERY)
+    return {"search_matches": {name: int(mask.sum()) for name, mask in matches.items()}}
+
+
+def alert_evaluation(ctx):
+    alerts = evaluate_alerts(ctx["po_filtered"], ctx["contracts_filtered"], ctx["pt_filtered"],
+                             ALERT_AMOUNT_THRESHOLD, ALERT_DELAY_THRESHOLD)
+    return {"alerts": alerts}
+
+
+def rollup_cube(ctx):
+    return {"cube": build_cube(ctx["purchase_orders"])}
+
+
+def tab1_groupbys(ctx):
+    po_rollup = slice_cube(ctx["cube"], ctx["po_filters"], ctx["period"], ctx["po_filtered"])
+    by_department = po_rollup.groupby(["MONTH", "DEPARTEMENT"], observed=True)["MONTANT_EUR"].sum()
+    monthly = po_rollup.groupby("MONTH")[["MONTANT_EUR", "QUANTITE"]].sum()
+    annual = po_rollup.groupby(po_rollup["MONTH"].dt.year)[["MONTANT_EUR", "QUANTITE"]].sum()
+    statuses = po_rollup.groupby("STATUT", observed=True)["COUNT"].sum()
+    types = po_rollup.groupby("TYPE_ACHAT", observed=True)["COUNT"].sum()
+    return {"po_rollup": po_rollup, "tab1_groups": (by_department, monthly, annual, statuses, types)}
+
+
+def supplier_comparison(ctx):
+    scorecard = supplier_scorecard(ctx["po_rollup"], ctx["pt_filtered"])
+    top = scorecard.nlargest(3, "MONTANT_EUR")
+    return {"scorecard": scorecard, "radar": normalize_scores(top, list(RADAR_METRICS))}
+
+
+def forecast(ctx):
+    forecasts = {column: Forecasts(ctx["po_rollup"], column) for column in FORECAST_COLUMNS}
+    top = ctx["scorecard"].nlargest(1, "MONTANT_EUR")["FOURNISSEUR"]
+    if len(top):
+        forecasts["FOURNISSEUR"].history(top.iloc[0])
+        forecasts["FOURNISSEUR"].projection(top.iloc[0])
+    return {"forecasts": forecasts}
+
+
+def tab2_kpis(ctx):
+    analytics = PaymentTermsAnalytics(ctx["pt_filtered"])
+    for metric in HEATMAP_METRICS.values():
+        analytics.heatmap_matrix(metric)
+    return {"pt_analytics": analytics}
+
+
+def ppt_export(ctx):
+    import plotly.express as px
+
+    statuses, types = ctx["tab1_groups"][3:]
+    analytics = ctx["pt_analytics"]
+    figures = [
+        ("PO par département", px.bar(ctx["tab1_groups"][0].reset_index(), x="MONTH", y="MONTANT_EUR", color="DEPARTEMENT")),
+        ("Statuts", px.pie(statuses.reset_index(), names="STATUT", values="COUNT", hole=0.4)),
+        ("Types d'achat", px.pie(types.reset_index(), names="TYPE_ACHAT", values="COUNT", hole=0.4)),
+        ("Nouveaux délais", analytics.terms_figure("new", "Nouveaux délais")),
+        ("Anciens délais", analytics.terms_figure("old", "Anciens délais")),
+    ]
+    tables = [
+        (title, table_rows(df), len(df))
+        for title, df in (("PO", ctx["po_filtered"]), ("PT", ctx["pt_filtered"]), ("Contrats", ctx["contracts_filtered"]))
+    ]
+    job = ReportJob()
+    build_report(job, figures, tables)
+    if job.error:
+        raise RuntimeError(job.error)
+    return {"report": job}
+
+
+STAGES = [
+    ("type_conversion", type_conversion),
+    ("filter_indexes", filter_indexes),
+    ("sidebar_filtering", sidebar_filtering),
+    ("global_search", global_search),
+    ("alert_evaluation", alert_evaluation),
+    ("rollup_cube", rollup_cube),
+    ("tab1_groupbys", tab1_groupbys),
+    ("supplier_comparison", supplier_comparison),
+    ("forecast", forecast),
+    ("tab2_kpis", tab2_kpis),
+    ("ppt_export", ppt_export),
+]
+
+# Stages whose outputs no other stage reads, skipped when not selected
+LEAF_STAGES = {"global_search", "alert_evaluation", "ppt_export"}
+
+
+def maxrss_mb():
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+# Run every stage on one dataset, returning one result row per stage
+def run(raw, repeat, stages):
+    ctx = {"raw": raw}
+    rows = []
+    for name, stage in STAGES:
+        if name not in stages:
+            # Later stages still need the outputs, computed once untimed
+            if name not in LEAF_STAGES:
+                ctx.update(stage(ctx))
+            continue
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs = stage(ctx)
+            best = min(best, time.perf_counter() - start)
+        del outputs
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        ctx.update(stage(ctx))
+        peak = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        rows.append({"stage": name, "seconds": best, "peak_mb": peak / 1e6, "maxrss_mb": maxrss_mb()})
+    if "ppt_export" in stages and ctx["report"].skipped:
+        print(f"  ppt_export : {len(ctx['report'].skipped)} figure(s) non rendue(s) (kaleido absent ?), seuls les tableaux sont mesurés")
+    return rows
+
+
+# Each stage of the run at run_at against the previous run of the same dataset and size
+def compare(results, run_at, tolerance):
+    regressions = []
+    current_runs = results[results["run_at"] == run_at][["dataset", "rows"]].drop_duplicates()
+    results = results.merge(current_runs, on=["dataset", "rows"])
+    for (dataset, rows), runs in results.groupby(["dataset", "rows"], sort=False):
+        run_ids = runs["run_at"].drop_duplicates().tolist()
+        if len(run_ids) < 2:
+            print(f"{dataset} ({rows:,} POs) : pas de run précédent à comparer")
+            continue
+        previous = runs[runs["run_at"] == run_ids[-2]].set_index("stage")
+        current = runs[runs["run_at"] == run_ids[-1]].set_index("stage")
+        table = pd.DataFrame({
+            "before_s": previous["seconds"], "after_s": current["seconds"],
+            "before_mb": previous["peak_mb"], "after_mb": current["peak_mb"],
+        }).dropna(subset=["before_s", "after_s"])
+        table["ratio"] = table["after_s"] / table["before_s"]
+        slower = (table["ratio"] > 1 + tolerance) & (table["after_s"] - table["before_s"] > COMPARE_MIN_SECONDS)
+        table["flag"] = slower.map({True: "REGRESSION", False: ""})
+        revisions = f"{previous['revision'].iloc[0]} -> {current['revision'].iloc[0]}"
+        print(f"\n{dataset} ({rows:,} POs), {revisions}")
+        print(table.round(4).to_string())
+        regressions += [(dataset, rows, stage) for stage in table.index[table["flag"] != ""]]
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout du pipeline de données du dashboard.")
+    parser.add_argument("--rows", nargs="+", type=parse_rows, default=[SIZES["10k"], SIZES["100k"], SIZES["1M"]],
+                        help=f"nombres de POs synthétiques, ou parmi {', '.join(SIZES)}")
+    parser.add_argument("--data", help="répertoire de tables (synthetic_data --out) à utiliser au lieu de données générées")
+    parser.add_argument("--stages", nargs="+", default=[name for name, _ in STAGES], choices=[name for name, _ in STAGES])
+    parser.add_argument("--repeat", type=int, default=3, help="runs chronométrés par étape (le meilleur est gardé)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results", default=RESULTS_FILE, help="fichier CSV où ajouter les résultats")
+    parser.add_argument("--compare", action="store_true", help="comparer au run précédent du fichier de résultats")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ralentissement toléré avant de signaler une régression")
+    args = parser.parse_args()
+
+    datasets = [(args.data, None)] if args.data else [("synthetic", rows) for rows in args.rows]
+    run_at, rev = datetime.now().isoformat(timespec="seconds"), revision()
+    results = []
+    for dataset, rows in datasets:
+        raw = read_tables(dataset) if args.data else make_tables(rows, args.seed)
+        rows = len(raw["purchase_orders"])
+        print(f"{dataset}, {rows:,} POs, {len(raw['payment_terms']):,} payment terms, {len(raw['contracts']):,} contrats")
+        report = pd.DataFrame(run(raw, args.repeat, args.stages))
+        del raw
+        print(report.round(4).to_string(index=False))
+        results.append(report.assign(run_at=run_at, revision=rev, dataset=dataset, rows=rows))
+
+    results = pd.concat(results, ignore_index=True)[RESULT_COLUMNS]
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    results.to_csv(args.results, mode="a", header=not os.path.exists(args.results), index=False)
+    print(f"\nRésultats ajoutés à {args.results}")
+
+    if args.compare:
+        regressions = compare(pd.read_csv(args.results), run_at, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
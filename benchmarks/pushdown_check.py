@@ -0,0 +1,112 @@
+# Check of the pushed-down sidebar filters and rollups against the in-memory data path: for a
+# few typical selections, the rows, monthly cube and supplier scorecard a data source computes
+# on the server (PostgREST filters and the sql/pushdown.sql functions for Supabase, SQL for the
+# local backend) are compared with FilterIndex masks, rollup.build_cube and
+# scorecard.supplier_scorecard over the fully loaded tables, and the rows each path transfers
+# are reported.
+#
+# Supabase needs sql/pushdown.sql applied first. Against a local stack (`supabase start`, or
+# PostgREST over any Postgres holding the tables), point SUPABASE_URL and SUPABASE_KEY at it.
+#
+# Run from the repository root:
+#   python -m benchmarks.pushdown_check                     # DATA_BACKEND, supabase by default
+#   python -m benchmarks.pushdown_check --backend local     # LOCAL_DATA_DIR tables in DuckDB
+import argparse
+import sys
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from data_source import create_source, narrowed
+from filter_index import FilterIndex
+from rollup import CUBE_DIMENSIONS, build_cube
+from scorecard import supplier_scorecard
+
+PO_COLUMNS = ["FOURNISSEUR", "DEPARTEMENT", "TYPE_ACHAT", "STATUT"]
+PT_COLUMNS = ["FOURNISSEUR", "DIVISION"]
+
+
+# Selections to check: (name, PO selections, period, payment-terms selections), built from the
+# values of the loaded tables
+def make_cases(po_index, pt_index):
+    po_all = {col: po_index.values(col) for col in PO_COLUMNS}
+    pt_all = {col: pt_index.values(col) for col in PT_COLUMNS}
+    full = (po_index.date_min.to_pydatetime(), po_index.date_max.to_pydatetime())
+    last_year = ((po_index.date_max - pd.DateOffset(years=1)).to_pydatetime(), full[1])
+    return [
+        ("tout", po_all, full, pt_all),
+        ("un département", {**po_all, "DEPARTEMENT": po_all["DEPARTEMENT"][:1]}, full, pt_all),
+        ("un fournisseur, un an", {**po_all, "FOURNISSEUR": po_all["FOURNISSEUR"][:1]}, last_year, pt_all),
+        ("sans un statut", {**po_all, "STATUT": po_all["STATUT"][1:]}, last_year, {**pt_all, "DIVISION": pt_all["DIVISION"][:1]}),
+        ("un an, bornes en cours de journée", po_all, (last_year[0] + pd.Timedelta(hours=12), full[1] - pd.Timedelta(hours=12)), pt_all),
+    ]
+
+
+def sort_frame(df, keys):
+    df = df.astype({col: str for col in keys if col in df})
+    return df.sort_values(keys, ignore_index=True)
+
+
+def compare(label, actual, expected, keys):
+    try:
+        pd.testing.assert_frame_equal(sort_frame(actual, keys), sort_frame(expected, keys), check_dtype=False, check_categorical=False, rtol=1e-9)
+    except AssertionError as e:
+        print(f"  ÉCART {label} : {e}")
+        return False
+    return True
+
+
+def check(source):
+    data, _ = source.load_tables()
+    for name, (df, error) in data.items():
+        if error:
+            sys.exit(error)
+    df_po, df_pt = data["purchase_orders"][0], data["payment_terms"][0]
+    po_index, pt_index = FilterIndex(df_po, PO_COLUMNS, "DATE"), FilterIndex(df_pt, PT_COLUMNS)
+    po_all = {col: po_index.values(col) for col in PO_COLUMNS}
+    pt_all = {col: pt_index.values(col) for col in PT_COLUMNS}
+    print(f"{source.name} : {len(df_po)} POs, {len(df_pt)} conditions de paiement")
+
+    ok = True
+    for name, po_filters, period, pt_filters in make_cases(po_index, pt_index):
+        df_po_filtered = df_po[po_index.mask(po_filters, period)]
+        df_pt_filtered = df_pt[pt_index.mask(pt_filters)]
+        cube = build_cube(df_po_filtered)
+        scorecard = supplier_scorecard(cube, df_pt_filtered)
+        selections, pt_selections = narrowed(po_filters, po_all), narrowed(pt_filters, pt_all)
+
+        start = time.perf_counter()
+        rows = source.rows("purchase_orders", po_filters, period)
+        rows_seconds = time.perf_counter() - start
+        # The complement filters too: po_all was read from the tables just loaded
+        complement_rows = source.rows("purchase_orders", po_filters, period, all_values=po_all, complete=True)
+        start = time.perf_counter()
+        server_cube = source.rollup(None, selections, period)
+        cube_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        server_scorecard = source.scorecard(selections, period, pt_selections)
+        scorecard_seconds = time.perf_counter() - start
+
+        print(f"{name} : {len(df_po_filtered)}/{len(df_po)} POs filtrés ({rows_seconds:.2f} s), "
+              f"cube {len(server_cube)} lignes ({cube_seconds:.2f} s), "
+              f"scorecard {len(server_scorecard)} lignes ({scorecard_seconds:.2f} s)")
+        ok &= compare("lignes", rows, df_po_filtered.reset_index(drop=True), ["PO_NUMBER"])
+        ok &= compare("lignes (complément)", complement_rows, df_po_filtered.reset_index(drop=True), ["PO_NUMBER"])
+        ok &= compare("cube", server_cube, cube, ["MONTH"] + CUBE_DIMENSIONS)
+        ok &= compare("scorecard", server_scorecard, scorecard, ["FOURNISSEUR"])
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérifie les filtres et agrégations exécutés côté serveur.")
+    parser.add_argument("--backend", choices=["supabase", "local"], help="source de données (par défaut DATA_BACKEND)")
+    args = parser.parse_args()
+    load_dotenv()
+    ok = check(create_source(args.backend))
+    print("OK" if ok else "Des écarts ont été trouvés.")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
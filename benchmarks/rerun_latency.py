@@ -0,0 +1,113 @@
+# Rerun latency of the dashboard interactions. For each widget below: the wall time of the rerun
+# it triggers under AppTest, which always reruns the whole script, and, when the widget lives in
+# a st.fragment, the time of that fragment's profiler span, which is what the interaction costs
+# in the browser where only the fragment reruns (plus Streamlit's own per-message overhead).
+# Scripts without fragment spans report the full rerun only, which is what they cost.
+#
+# The app runs on the local backend (DATA_BACKEND=local) over the tables of --data, logged in
+# directly, with the profiler on.
+#
+# Run from the repository root:
+#   python -m benchmarks.synthetic_data --rows 100k --out data/100k
+#   git show <rev>:test.py > /tmp/test_old.py
+#   python -m benchmarks.rerun_latency --data data/100k /tmp/test_old.py test.py
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Interactions: (name, tab index, widget type, key, index of the option to pick or text to type,
+# fragment span of the widget)
+INTERACTIONS = [
+    ("heatmap_metric", 1, "selectbox", "heatmap_metric", 1, "tab2.heatmap"),
+    ("po_view", 0, "radio", "po_view", 1, "tab1.po_by_dept"),
+    ("predict_option", 0, "selectbox", "predict_option", 1, "tab1.forecast"),
+    ("comment_text", 0, "text_area", "comment_text", "Relancer le fournisseur", "tab1.po_comments"),
+]
+
+
+def find_widget(app, kind, key):
+    for widget in getattr(app, kind):
+        if widget.key == key:
+            return widget
+    raise LookupError(f"{kind} {key} introuvable")
+
+
+# Wall time of one AppTest rerun, and the seconds of the fragment span_name in the profiled
+# rerun (None if the script has no such fragment)
+def timed_run(app, span_name=None):
+    start = time.perf_counter()
+    app.run()
+    elapsed = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    runs = app.session_state["profiler"].runs
+    spans = [span["seconds"] for span in runs[-1]["spans"] if span["name"] == span_name and span.get("fragment")] if runs else []
+    return elapsed, (spans[0] if spans else None)
+
+
+def measure(path, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(path, default_timeout=600)
+    app.session_state["logged_in"] = True
+    app.session_state["user_email"] = "benchmark"
+    start = time.perf_counter()
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    results = [("first run", time.perf_counter() - start, None)]
+    results.append(("rerun, no change", statistics.median(timed_run(app)[0] for _ in range(repeat)), None))
+
+    tab_labels = [tab.label for tab in app.tabs]
+    for name, tab, kind, key, choice, span_name in INTERACTIONS:
+        # Scripts with lazy tabs keep the selected tab under main_tab, which the browser sends
+        # with every rerun but AppTest does not
+        app.session_state["main_tab"] = tab_labels[tab]
+        app.run()
+        full, fragment = [], []
+        for i in range(repeat):
+            app.session_state["main_tab"] = tab_labels[tab]
+            widget = find_widget(app, kind, key)
+            if kind == "text_area":
+                widget.input(f"{choice} {i}")
+            else:
+                widget.set_value(widget.options[choice if i % 2 == 0 else 0])
+            elapsed, span = timed_run(app, span_name)
+            full.append(elapsed)
+            if span is not None:
+                fragment.append(span)
+        results.append((name, statistics.median(full), statistics.median(fragment) if fragment else None))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence des reruns du dashboard par interaction.")
+    parser.add_argument("scripts", nargs="*", default=[os.path.join(ROOT, "test.py")])
+    parser.add_argument("--data", required=True, help="répertoire des tables (synthetic_data --out)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    os.environ["DATA_BACKEND"] = "local"
+    os.environ["LOCAL_DATA_DIR"] = os.path.abspath(args.data)
+    os.environ["PROFILER_ENABLED"] = "1"
+
+    # One process per script, so that the caches warmed by one do not speed up the next
+    if len(args.scripts) > 1:
+        for path in args.scripts:
+            subprocess.run([sys.executable, "-m", "benchmarks.rerun_latency", "--data", args.data, "--repeat", str(args.repeat), path], cwd=ROOT, check=True)
+        return
+
+    for path in args.scripts:
+        print(f"== {path}")
+        print(f"{'interaction':<20}{'full rerun ms':>15}{'fragment ms':>13}")
+        for name, full, fragment in measure(os.path.abspath(path), args.repeat):
+            print(f"{name:<20}{full * 1000:>15.0f}{'' if fragment is None else f'{fragment * 1000:.0f}':>13}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
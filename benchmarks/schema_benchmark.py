@@ -0,0 +1,57 @@
+# Memory and groupby speed of the typed schema (schema.py) against the former object-dtype frames.
+# Run from the repository root: python -m benchmarks.schema_benchmark [rows]
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_data import make_purchase_orders
+from schema import apply_schema
+
+
+# The conversions test.py applied before the schema module
+def legacy_decode(df):
+    df = df.copy()
+    df["DATE"] = pd.to_datetime(df["DATE"], errors="coerce")
+    df["MONTANT_EUR"] = pd.to_numeric(df["MONTANT_EUR"], errors="coerce")
+    df["QUANTITE"] = pd.to_numeric(df["QUANTITE"], errors="coerce")
+    df["STATUT"] = df["STATUT"].astype(str)
+    df["TYPE_ACHAT"] = df["TYPE_ACHAT"].astype(str)
+    return df
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows):
+    raw = make_purchase_orders(rows)
+    frames = {
+        "object": legacy_decode(raw),
+        "schema": apply_schema(raw, "purchase_orders"),
+    }
+    selected = ["HP", "AQ", "IT"]
+    results = []
+    for name, df in frames.items():
+        results.append({
+            "frame": name,
+            "memory_mb": df.memory_usage(deep=True).sum() / 1e6,
+            "groupby_departement_ms": timed(lambda: df.groupby("DEPARTEMENT", observed=True)["MONTANT_EUR"].sum()) * 1e3,
+            "groupby_fournisseur_ms": timed(lambda: df.groupby("FOURNISSEUR", observed=True)["MONTANT_EUR"].sum()) * 1e3,
+            "groupby_statut_type_ms": timed(lambda: df.groupby(["STATUT", "TYPE_ACHAT"], observed=True).size()) * 1e3,
+            "isin_departement_ms": timed(lambda: df["DEPARTEMENT"].isin(selected)) * 1e3,
+            "unique_fournisseur_ms": timed(lambda: df["FOURNISSEUR"].unique()) * 1e3,
+        })
+    return pd.DataFrame(results).set_index("frame")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    report = run(rows)
+    print(f"purchase_orders, {rows:,} rows")
+    print(report.round(2).T.to_string())
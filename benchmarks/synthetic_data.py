@@ -0,0 +1,230 @@
+# Synthetic purchase_orders, payment_terms and contracts tables at production volume, in the raw
+# form the sync hands to schema.apply_schema: text and dates as strings, amounts and days as numbers.
+#
+# - Suppliers follow a Zipf-like popularity (a few suppliers carry most POs), their count grows
+#   with the PO volume; the fixture suppliers come first.
+# - Departments, purchase types and statuses are skewed; amounts are log-normal per purchase type.
+# - PO dates span DATE_START..DATE_END with yearly growth and a seasonal profile (August dip,
+#   December peak); contract expirations span a year back to three years ahead of today.
+# - Each supplier has payment terms in one to three divisions and one or more contracts.
+#
+# Run from the repository root:
+#   python -m benchmarks.synthetic_data --rows 1000000 --out data/1M
+#   python -m benchmarks.synthetic_data --rows 10M --out data/10M --format parquet
+# The CSVs have the columns of the fixtures; a directory can be passed to
+# benchmarks.pipeline_benchmark --data or its purchase_orders.csv to benchmarks.forecast_backtest --csv.
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Named volumes of the scaling benchmarks, in POs
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+# POs generated at once; larger tables are written chunk by chunk
+CHUNK_ROWS = 1_000_000
+
+DATE_START = pd.Timestamp("2021-01-01")
+DATE_END = pd.Timestamp("2025-12-31")
+YEARLY_GROWTH = 1.15
+# Relative PO volume of each calendar month
+SEASONALITY = np.array([0.9, 1.0, 1.1, 1.0, 1.0, 1.05, 0.85, 0.5, 1.05, 1.1, 1.15, 1.3])
+
+FIXTURE_SUPPLIERS = ["3M Mécanique", "GROW HR", "VMSI", "Hinsya", "ACTIVE MARSETEND"]
+SUPPLIER_WORDS = ["Mécanique", "Électronique", "Logistique", "Services", "Industrie", "Câblage", "Plasturgie", "Métallerie"]
+SUPPLIER_ZIPF = 1.1
+# Suppliers per PO, within [MIN_SUPPLIERS, MAX_SUPPLIERS]
+POS_PER_SUPPLIER = 500
+MIN_SUPPLIERS = 50
+MAX_SUPPLIERS = 20_000
+
+# Fixture departments first, then by decreasing share of the POs
+DEPARTMENTS = ["HP", "AQ", "APW", "AEE", "APF", "LOG", "PROD", "QUAL", "MAINT", "IT", "RH", "FIN", "R&D", "HSE", "ACH", "DG"]
+DEPARTMENT_DECAY = 0.8
+# (share of POs, log-normal mu, sigma of the amount in EUR)
+PURCHASE_TYPES = {
+    "Matériel": (0.40, 8.5, 1.3),
+    "Services": (0.35, 9.5, 1.5),
+    "Maintenance": (0.15, 8.0, 1.0),
+    "Logiciel": (0.10, 9.0, 1.2),
+}
+STATUSES = {"Validé": 0.62, "Reçu": 0.20, "En attente": 0.14, "Annulé": 0.04}
+# Share of POs without a quantity
+MISSING_QUANTITY_RATE = 0.002
+
+DIVISIONS = ["Logistics", "Production", "Engineering", "Quality", "Maintenance", "IT", "HR", "Finance"]
+PAYMENT_DAYS = np.array([30, 45, 60, 90, 120])
+PAYMENT_DAYS_SHARE = np.array([0.15, 0.30, 0.35, 0.15, 0.05])
+PAYMENT_CONDITIONS = ["Z752", "Z030", "Z045", "Z060", "Z090"]
+BUYER_EMAILS = ["achats@kostal.com"] + [f"acheteur{i:02d}@kostal.com" for i in range(1, 20)]
+
+
+def parse_rows(value):
+    return SIZES.get(value) or int(value)
+
+
+def supplier_count(rows):
+    return int(np.clip(rows // POS_PER_SUPPLIER, MIN_SUPPLIERS, MAX_SUPPLIERS))
+
+
+def supplier_names(count):
+    generated = [f"{SUPPLIER_WORDS[i % len(SUPPLIER_WORDS)]} {i:05d}" for i in range(count - len(FIXTURE_SUPPLIERS))]
+    return np.array(FIXTURE_SUPPLIERS + generated, dtype=object)
+
+
+# Share of the POs of each supplier, by rank
+def supplier_weights(count):
+    weights = 1 / np.arange(1, count + 1) ** SUPPLIER_ZIPF
+    return weights / weights.sum()
+
+
+def _shares(values):
+    values = np.asarray(values, dtype="float64")
+    return values / values.sum()
+
+
+def _months():
+    months = pd.date_range(DATE_START, DATE_END, freq="MS")
+    years = (months.year - DATE_START.year).to_numpy()
+    weights = _shares(YEARLY_GROWTH ** years * SEASONALITY[months.month - 1])
+    return months.to_numpy(dtype="datetime64[D]"), months.days_in_month.to_numpy(), weights
+
+
+# POs numbered from first, drawn from the seed and first so chunks are reproducible one by one
+def make_purchase_orders(rows, suppliers=None, first=0, seed=0):
+    rng = np.random.default_rng([seed, 0, first])
+    suppliers = supplier_names(supplier_count(rows)) if suppliers is None else suppliers
+    months, month_days, month_weights = _months()
+    month = rng.choice(len(months), rows, p=month_weights)
+    dates = months[month] + (rng.random(rows) * month_days[month]).astype("timedelta64[D]")
+
+    types = list(PURCHASE_TYPES)
+    type_codes = rng.choice(len(types), rows, p=_shares([share for share, _, _ in PURCHASE_TYPES.values()]))
+    mu = np.array([mu for _, mu, _ in PURCHASE_TYPES.values()])[type_codes]
+    sigma = np.array([sigma for _, _, sigma in PURCHASE_TYPES.values()])[type_codes]
+    quantity = pd.array(np.minimum(rng.geometric(0.08, rows), 999), dtype="Int64")
+    quantity[rng.random(rows) < MISSING_QUANTITY_RATE] = pd.NA
+
+    return pd.DataFrame({
+        "PO_NUMBER": "PO" + pd.Series(np.arange(first + 1, first + rows + 1)).astype(str).str.zfill(8),
+        "FOURNISSEUR": suppliers[rng.choice(len(suppliers), rows, p=supplier_weights(len(suppliers)))],
+        "DEPARTEMENT": np.array(DEPARTMENTS, dtype=object)[
+            rng.choice(len(DEPARTMENTS), rows, p=_shares(DEPARTMENT_DECAY ** np.arange(len(DEPARTMENTS))))
+        ],
+        "MONTANT_EUR": rng.lognormal(mu, sigma).round(2),
+        "QUANTITE": quantity,
+        "DATE": np.datetime_as_string(dates, unit="D"),
+        "TYPE_ACHAT": np.array(types, dtype=object)[type_codes],
+        "STATUT": np.array(list(STATUSES), dtype=object)[rng.choice(len(STATUSES), rows, p=_shares(list(STATUSES.values())))],
+    })
+
+
+# Payment terms of every supplier in one to three divisions; turnover follows the supplier's share of the POs
+def make_payment_terms(rows, suppliers=None, seed=0):
+    rng = np.random.default_rng([seed, 1])
+    suppliers = supplier_names(supplier_count(rows)) if suppliers is None else suppliers
+    per_supplier = rng.integers(1, 4, len(suppliers))
+    supplier = np.repeat(np.arange(len(suppliers)), per_supplier)
+    count = len(supplier)
+    division = np.concatenate([rng.choice(len(DIVISIONS), n, replace=False) for n in per_supplier])
+
+    old = rng.choice(len(PAYMENT_DAYS), count, p=PAYMENT_DAYS_SHARE)
+    # 60% renegotiated one step shorter, 30% unchanged, 10% one step longer
+    step = rng.choice([-1, 0, 1], count, p=[0.6, 0.3, 0.1])
+    new = np.clip(old + step, 0, len(PAYMENT_DAYS) - 1)
+    turnover = supplier_weights(len(suppliers))[supplier] * rows * 20_000 / per_supplier[supplier] * rng.lognormal(0, 0.5, count)
+    delay = np.where(rng.random(count) < 0.7, 0, rng.integers(1, 31, count))
+
+    return pd.DataFrame({
+        "FOURNISSEUR": suppliers[supplier],
+        "OLD_DAYS": PAYMENT_DAYS[old],
+        "NEW_DAYS": PAYMENT_DAYS[new],
+        "TURNOVER_EUR": turnover.round(2),
+        "DIVISION": np.array(DIVISIONS, dtype=object)[division],
+        "CONDITION_PAIEMENT": np.array(PAYMENT_CONDITIONS, dtype=object)[rng.integers(0, len(PAYMENT_CONDITIONS), count)],
+        "DELAI_PAIEMENT": delay,
+    })
+
+
+# One or more contracts per supplier, expiring between a year ago and three years from today
+def make_contracts(rows, suppliers=None, seed=0, today=None):
+    rng = np.random.default_rng([seed, 2])
+    suppliers = supplier_names(supplier_count(rows)) if suppliers is None else suppliers
+    today = (today or pd.Timestamp.today()).normalize().to_datetime64().astype("datetime64[D]")
+    supplier = np.repeat(np.arange(len(suppliers)), 1 + rng.poisson(0.3, len(suppliers)))
+    count = len(supplier)
+    expiration = today + rng.integers(-365, 3 * 365, count).astype("timedelta64[D]")
+
+    return pd.DataFrame({
+        "CONTRAT": "C" + pd.Series(np.arange(1, count + 1)).astype(str).str.zfill(6),
+        "FOURNISSEUR": suppliers[supplier],
+        "DATE_EXPIRATION": np.datetime_as_string(expiration, unit="D"),
+        "MONTANT_MAD": rng.lognormal(15, 1, count).round(2),
+        "RESPONSABLE_EMAIL": np.array(BUYER_EMAILS, dtype=object)[rng.integers(0, len(BUYER_EMAILS), count)],
+    })
+
+
+# The three tables of a rows-PO dataset, in memory
+def make_tables(rows, seed=0):
+    suppliers = supplier_names(supplier_count(rows))
+    return {
+        "purchase_orders": make_purchase_orders(rows, suppliers, seed=seed),
+        "payment_terms": make_payment_terms(rows, suppliers, seed=seed),
+        "contracts": make_contracts(rows, suppliers, seed=seed),
+    }
+
+
+# Write the three tables of a rows-PO dataset to out_dir as <table>.csv or <table>.parquet,
+# generating and appending the POs CHUNK_ROWS at a time
+def write_tables(rows, out_dir, fmt="csv", seed=0, chunk_rows=CHUNK_ROWS):
+    os.makedirs(out_dir, exist_ok=True)
+    suppliers = supplier_names(supplier_count(rows))
+    paths = {}
+
+    path = os.path.join(out_dir, f"purchase_orders.{fmt}")
+    writer = None
+    for first in range(0, rows, chunk_rows):
+        chunk = make_purchase_orders(min(chunk_rows, rows - first), suppliers, first=first, seed=seed)
+        if fmt == "csv":
+            chunk.to_csv(path, mode="w" if first == 0 else "a", header=first == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        print(f"purchase_orders: {first + len(chunk):,}/{rows:,}")
+    if writer is not None:
+        writer.close()
+    paths["purchase_orders"] = path
+
+    for name, make in (("payment_terms", make_payment_terms), ("contracts", make_contracts)):
+        df = make(rows, suppliers, seed=seed)
+        paths[name] = os.path.join(out_dir, f"{name}.{fmt}")
+        df.to_csv(paths[name], index=False) if fmt == "csv" else df.to_parquet(paths[name], index=False)
+        print(f"{name}: {len(df):,}")
+    return paths
+
+
+# Tables written by write_tables (or the fixtures, from the repository root), in their raw form
+def read_tables(data_dir):
+    tables = {}
+    for name in ("purchase_orders", "payment_terms", "contracts"):
+        path = os.path.join(data_dir, f"{name}.parquet")
+        tables[name] = pd.read_parquet(path) if os.path.exists(path) else pd.read_csv(os.path.join(data_dir, f"{name}.csv"))
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des tables synthétiques purchase_orders, payment_terms et contracts.")
+    parser.add_argument("--rows", type=parse_rows, default=SIZES["100k"], help=f"nombre de POs, ou l'un de {', '.join(SIZES)}")
+    parser.add_argument("--out", required=True, help="répertoire de sortie")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_tables(args.rows, args.out, args.format, args.seed)
+
+
+if __name__ == "__main__":
+    main()
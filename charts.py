@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Chart budgets: traces per chart (the long tail is grouped as "Autres"), points per line,
+# bars with a text label, and points above which lines are drawn with WebGL
+CHART_MAX_TRACES = int(os.getenv("CHART_MAX_TRACES", "12"))
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+CHART_MAX_LABELLED_BARS = int(os.getenv("CHART_MAX_LABELLED_BARS", "60"))
+CHART_WEBGL_MIN_POINTS = int(os.getenv("CHART_WEBGL_MIN_POINTS", "1000"))
+
+OTHERS_LABEL = "Autres"
+
+
+# Largest-Triangle-Three-Buckets: positions of threshold points of (x, y) that keep the visual
+# shape of the series. x must be increasing; datetimes are compared as integers.
+def lttb_indices(x, y, threshold):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    x = (x.astype("datetime64[ns]").view("int64") if x.dtype.kind == "M" else x).astype("float64")
+    y = np.asarray(y, dtype="float64")
+
+    # Buckets of the points between the first and the last, which are always kept
+    edges = np.linspace(1, n - 1, threshold - 1).astype("int64")
+    selected = np.empty(threshold, dtype="int64")
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the last bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+# Rows of a line chart frame reduced to max_points with LTTB, in x order
+def downsample(df, x, y, max_points=CHART_MAX_POINTS):
+    if len(df) <= max_points:
+        return df
+    df = df.sort_values(x)
+    return df.iloc[lttb_indices(df[x].to_numpy(), df[y].to_numpy(), max_points)]
+
+
+# Keep the max_groups - 1 largest values of column by total value and sum the others into a
+# single "Autres" group, per keys (e.g. the x axis of a stacked bar chart)
+def collapse_tail(df, column, value, keys=(), max_groups=CHART_MAX_TRACES):
+    totals = df.groupby(column, observed=True)[value].sum()
+    if len(totals) <= max_groups:
+        return df
+    top = totals.nlargest(max_groups - 1).index
+    labels = df[column].astype(str).where(df[column].isin(top), OTHERS_LABEL)
+    collapsed = df.assign(**{column: labels}).groupby(list(keys) + [column], sort=False)[value].sum().reset_index()
+    order = [str(label) for label in top] + [OTHERS_LABEL]
+    collapsed[column] = pd.Categorical(collapsed[column], categories=order)
+    return collapsed.sort_values(list(keys) + [column]).reset_index(drop=True)
+
+
+# Bar labels outside the bars while the chart has few enough bars to read them, none otherwise
+def label_bars(fig, max_bars=CHART_MAX_LABELLED_BARS):
+    bars = sum(len(trace.y) for trace in fig.data if trace.type == "bar" and trace.y is not None)
+    if bars > max_bars:
+        fig.update_traces(text=None, texttemplate=None, selector=dict(type="bar"))
+    else:
+        fig.update_traces(textposition="outside", selector=dict(type="bar"))
+    return fig
+
+
+# plotly.express render_mode for a line or scatter chart of points points
+def render_mode(points, webgl_min_points=CHART_WEBGL_MIN_POINTS):
+    return "webgl" if points >= webgl_min_points else "svg"
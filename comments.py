@@ -0,0 +1,85 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+COMMENTS_DB = os.getenv("COMMENTS_DB", "comments.db")
+
+# Schema migrations, applied in order and tracked in PRAGMA user_version
+MIGRATIONS = [
+    # 1: surrogate key and (type, id) index over the original keyless table
+    [
+        "CREATE TABLE IF NOT EXISTS comments (id TEXT, type TEXT, comment TEXT, user TEXT, timestamp TEXT)",
+        '''
+        CREATE TABLE comments_v1 (
+            comment_id INTEGER PRIMARY KEY,
+            id TEXT,
+            type TEXT,
+            comment TEXT,
+            user TEXT,
+            timestamp TEXT
+        )
+        ''',
+        "INSERT INTO comments_v1 (id, type, comment, user, timestamp) SELECT id, type, comment, user, timestamp FROM comments ORDER BY rowid",
+        "DROP TABLE comments",
+        "ALTER TABLE comments_v1 RENAME TO comments",
+        "CREATE INDEX comments_type_id ON comments (type, id)",
+    ],
+]
+
+
+# Comments on purchase orders and contracts. One long-lived WAL connection per process,
+# shared by the Streamlit session threads behind a lock; sqlite3 keeps the statements below
+# prepared in its statement cache.
+class CommentStore:
+    def __init__(self, path=COMMENTS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock:
+            # IMMEDIATE: a second process starting at the same time waits, then sees the new version
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+                for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                    for statement in statements:
+                        self.conn.execute(statement)
+                    self.conn.execute(f"PRAGMA user_version = {number}")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def add(self, item_type, item_id, comment, user):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO comments (id, type, comment, user, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (item_id, item_type, comment, user, datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+            )
+
+    # Comments of one item as a (comment, user, timestamp) frame, oldest first
+    def list(self, item_type, item_id):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT comment, user, timestamp FROM comments WHERE type = ? AND id = ? ORDER BY comment_id",
+                (item_type, item_id),
+            ).fetchall()
+        return pd.DataFrame(rows, columns=["comment", "user", "timestamp"])
+
+    # Number of comments of each of item_ids, in one query; items without comments are left out
+    def counts(self, item_type, item_ids):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, COUNT(*) FROM comments WHERE type = ? "
+                "AND id IN (SELECT value FROM json_each(?)) GROUP BY id",
+                (item_type, json.dumps([str(item_id) for item_id in item_ids])),
+            ).fetchall()
+        return dict(rows)
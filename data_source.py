@@ -0,0 +1,269 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+from loader import TABLE_COLUMNS, TABLE_KEYS, day_range, fetch_pages, pushdown_filters, resolve_columns
+from rollup import CUBE_DIMENSIONS, CUBE_MEASURES, build_cube
+from schema import TABLE_SCHEMAS, apply_schema
+from scorecard import SCORECARD_COLUMNS
+from sync import load_decoded_tables
+
+# Column filtered by a date range, per table
+DATE_COLUMNS = {"purchase_orders": "DATE", "contracts": "DATE_EXPIRATION"}
+
+# Arguments of the sql/pushdown.sql functions taking the PO and payment-terms selections
+PO_RPC_ARGS = {"FOURNISSEUR": "fournisseurs", "DEPARTEMENT": "departements", "TYPE_ACHAT": "types_achat", "STATUT": "statuts"}
+PT_RPC_ARGS = {"FOURNISSEUR": "pt_fournisseurs", "DIVISION": "divisions"}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# The selections ({column: selected values}) that leave values out, given all the values of each
+# column: selecting everything filters nothing and is not pushed down
+def narrowed(selections, all_values):
+    return {col: list(selected) for col, selected in selections.items() if set(all_values[col]) - set(selected)}
+
+
+# RPC arguments of selections and a period, named by args
+def _rpc_args(args, selections=None, period=None):
+    params = {args[col]: [str(value) for value in selected] for col, selected in (selections or {}).items()}
+    if period is not None:
+        params["date_from"], params["date_to"] = day_range(period)
+    return params
+
+
+# Cube frame (rollup.build_cube columns and dtypes) of po_rollup records
+def _cube_frame(records):
+    cube = pd.DataFrame([] if records is None else records, columns=["MONTH"] + CUBE_DIMENSIONS + CUBE_MEASURES)
+    cube = cube.astype({col: "category" for col in CUBE_DIMENSIONS})
+    cube["MONTH"] = pd.to_datetime(cube["MONTH"]).astype("datetime64[ns]")
+    return cube.astype({"MONTANT_EUR": "float64", "QUANTITE": "float64", "COUNT": "int64"})
+
+
+# Scorecard frame (scorecard.supplier_scorecard columns and dtypes) of supplier_scorecard records,
+# ordered by supplier
+def _scorecard_frame(records):
+    scorecard = pd.DataFrame([] if records is None else records, columns=SCORECARD_COLUMNS).sort_values("FOURNISSEUR", ignore_index=True)
+    scorecard = scorecard.astype({col: "float64" for col in SCORECARD_COLUMNS[1:]})
+    return scorecard.astype({"FOURNISSEUR": "category", "PO_COUNT": "int64"})
+
+
+# Source of the dashboard tables. load_tables() returns ({table_name: (df, error)}, stats) with the
+# tables decoded into their schema, rows() the rows of a selection, rollup() the monthly PO cube
+# of rollup.build_cube and scorecard() the supplier scorecard of scorecard.supplier_scorecard.
+# Selections map columns to their selected values and only restrict the columns they name.
+class SupabaseSource:
+    name = "supabase"
+
+    def __init__(self, url=None, key=None):
+        self.url = url or os.getenv("SUPABASE_URL")
+        self.key = key or os.getenv("SUPABASE_KEY")
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from supabase import create_client
+            self._client = create_client(self.url, self.key)
+        return self._client
+
+    def load_tables(self, tables=None):
+        return load_decoded_tables(self.client, tables or TABLE_COLUMNS)
+
+    # Rows of a table matching the selections and date range, filtered by PostgREST so that only
+    # those rows are downloaded (see loader.pushdown_filters; all_values gives the values of each
+    # column, used only with complete, when they were read from the server's current data).
+    # Selections too long for the URL are applied after the download.
+    def rows(self, table_name, selections=None, period=None, columns=None, all_values=None, complete=False):
+        columns = columns or TABLE_COLUMNS[table_name]
+        key, date_column = TABLE_KEYS[table_name], DATE_COLUMNS.get(table_name)
+        filtered = list(selections or {}) + ([date_column] if period is not None and date_column else [])
+        mapping, error = resolve_columns(self.client, table_name, list(dict.fromkeys(columns + key + filtered)))
+        if error:
+            raise ValueError(error)
+        filters, residual = pushdown_filters(selections, period, date_column, all_values, mapping, complete)
+        fetched = list(dict.fromkeys(columns + key + list(residual)))
+        remote = [mapping[col] for col in fetched]
+        records = [row for page in fetch_pages(self.client, table_name, remote, [mapping[col] for col in key], filters=filters) for row in page]
+        df = apply_schema(pd.DataFrame(records, columns=remote).set_axis(fetched, axis=1), table_name)
+        for col, selected in residual.items():
+            df = df[df[col].astype(str).isin(selected)]
+        return df[columns].reset_index(drop=True)
+
+    # Without a selection or period the cube is built from the synced POs; otherwise the
+    # po_rollup function aggregates the selection in Postgres and only the cube is downloaded
+    def rollup(self, df_po, selections=None, period=None):
+        if selections is None and period is None:
+            return build_cube(df_po)
+        return _cube_frame(self.client.rpc("po_rollup", _rpc_args(PO_RPC_ARGS, selections, period)).execute().data)
+
+    # Supplier scorecard of a PO selection and period, with the payment days of the payment-terms
+    # selection, aggregated by the supplier_scorecard function
+    def scorecard(self, selections=None, period=None, pt_selections=None):
+        params = {**_rpc_args(PO_RPC_ARGS, selections, period), **_rpc_args(PT_RPC_ARGS, pt_selections)}
+        return _scorecard_frame(self.client.rpc("supplier_scorecard", params).execute().data)
+
+
+# Local backend: the table files of data_dir loaded into an embedded DuckDB database, reloaded
+# only when a file changes. Tables are stored typed as schema.py declares them, the category
+# columns as DuckDB ENUMs so that they come back as pandas categoricals without decoding. Row
+# filters (category selections and date ranges) and the monthly rollup are pushed down to SQL.
+class LocalSource:
+    name = "local"
+
+    def __init__(self, data_dir=".", path=":memory:"):
+        import duckdb
+
+        self.data_dir = data_dir
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = duckdb.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS imports (table_name VARCHAR PRIMARY KEY, signature VARCHAR, rows BIGINT)")
+
+    def _source_file(self, table_name):
+        for extension in ("parquet", "csv"):
+            path = os.path.join(self.data_dir, f"{table_name}.{extension}")
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"Aucun fichier {table_name}.parquet ou {table_name}.csv dans {os.path.abspath(self.data_dir)}")
+
+    # Load a table file unless the database already holds its current version. Returns the
+    # version and the rows loaded (0 when the file was unchanged).
+    def _import(self, table_name, required_cols):
+        path = self._source_file(table_name)
+        stat = os.stat(path)
+        signature = f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+        row = self.conn.execute("SELECT signature, rows FROM imports WHERE table_name = ?", [table_name]).fetchone()
+        if row is not None and row[0] == signature:
+            return f"{signature}:{row[1]}", 0
+
+        reader = "read_parquet" if path.endswith(".parquet") else "read_csv"
+        literal = "'" + path.replace("'", "''") + "'"
+        cursor = self.conn.cursor()
+        cursor.execute(f"CREATE OR REPLACE TEMP TABLE raw AS SELECT * FROM {reader}({literal})")
+        mapping, error = resolve_columns(None, table_name, required_cols, [name for name, *_ in cursor.execute("DESCRIBE raw").fetchall()])
+        if error:
+            raise ValueError(error)
+
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+            select = []
+            for col in required_cols:
+                source, dtype = _quote(mapping[col]), TABLE_SCHEMAS[table_name][col]
+                if dtype == "category":
+                    enum = _quote(f"{table_name}_{col}")
+                    cursor.execute(f"DROP TYPE IF EXISTS {enum}")
+                    cursor.execute(f"CREATE TYPE {enum} AS ENUM (SELECT DISTINCT CAST({source} AS VARCHAR) FROM raw WHERE {source} IS NOT NULL ORDER BY 1)")
+                    select.append(f"CAST({source} AS {enum}) AS {_quote(col)}")
+                elif dtype == "string":
+                    select.append(f"CAST({source} AS VARCHAR) AS {_quote(col)}")
+                elif dtype.startswith("datetime64"):
+                    select.append(f"TRY_CAST({source} AS DATE) AS {_quote(col)}")
+                else:
+                    select.append(f"TRY_CAST({source} AS DOUBLE) AS {_quote(col)}")
+            cursor.execute(f"CREATE TABLE {_quote(table_name)} AS SELECT {', '.join(select)} FROM raw")
+            rows = cursor.execute(f"SELECT count(*) FROM {_quote(table_name)}").fetchone()[0]
+            cursor.execute("INSERT OR REPLACE INTO imports VALUES (?, ?, ?)", [table_name, signature, rows])
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS raw")
+        return f"{signature}:{rows}", rows
+
+    # WHERE clause of a selection ({column: selected values}) and date range
+    @staticmethod
+    def _where(table_name, selections=None, period=None, not_null=()):
+        clauses, params = [f"{_quote(col)} IS NOT NULL" for col in not_null], []
+        for col, selected in (selections or {}).items():
+            clauses.append(f"{_quote(col)} IN (SELECT unnest(?::VARCHAR[]))")
+            params.append([str(value) for value in selected])
+        if period is not None:
+            # Whole days, as loader.day_range sends them to PostgREST
+            date_col = _quote(DATE_COLUMNS[table_name])
+            clauses.append(f"{date_col} >= ?::DATE AND {date_col} <= ?::DATE")
+            params += list(day_range(period))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _query(self, sql, params):
+        return self.conn.cursor().execute(sql, params).arrow().read_all().to_pandas()
+
+    def load_tables(self, tables=None):
+        data, stats = {}, {}
+        for name, required_cols in (tables or TABLE_COLUMNS).items():
+            start = time.perf_counter()
+            try:
+                with self._lock:
+                    version, imported = self._import(name, required_cols)
+                df = self.rows(name, columns=required_cols)
+                elapsed = time.perf_counter() - start
+                data[name] = (df, None)
+                stats[name] = {
+                    "mode": "local",
+                    "rows": len(df),
+                    "fetched": len(df),
+                    "imported": imported,
+                    "seconds": elapsed,
+                    "rows_per_sec": len(df) / elapsed if elapsed > 0 else float("inf"),
+                    "version": version,
+                    "base_version": None,
+                }
+            except Exception as e:
+                data[name] = (pd.DataFrame(columns=required_cols), f"⚠️ Erreur lors du chargement de {name}: {str(e)}")
+                stats[name] = None
+        return data, stats
+
+    # Rows of a table matching the selections and date range, decoded into its schema (SQL
+    # parameters have no length limit, all_values and complete are not needed)
+    def rows(self, table_name, selections=None, period=None, columns=None, all_values=None, complete=False):
+        columns = columns or TABLE_COLUMNS[table_name]
+        where, params = self._where(table_name, selections, period)
+        return apply_schema(self._query(f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(table_name)}{where}", params), table_name)
+
+    # Monthly PO cube of the rows matching the selections and date range, aggregated in SQL:
+    # the rows of rollup.build_cube over those POs, unordered. df_po is unused, the cube is
+    # read from the database.
+    def rollup(self, df_po=None, selections=None, period=None):
+        dimensions = ", ".join(map(_quote, CUBE_DIMENSIONS))
+        where, params = self._where("purchase_orders", selections, period, not_null=["DATE"] + CUBE_DIMENSIONS)
+        cube = self._query(
+            f'SELECT CAST(date_trunc(\'month\', "DATE") AS TIMESTAMP) AS MONTH, {dimensions}, '
+            f'coalesce(sum("MONTANT_EUR"), 0) AS MONTANT_EUR, coalesce(sum("QUANTITE"), 0) AS QUANTITE, '
+            f'count(*) AS COUNT FROM "purchase_orders"{where} GROUP BY ALL',
+            params,
+        )
+        return cube.astype({"MONTH": "datetime64[ns]", "MONTANT_EUR": "float64", "QUANTITE": "float64", "COUNT": "int64"})
+
+    # Supplier scorecard of a PO selection and period, with the payment days of the payment-terms
+    # selection, aggregated in SQL
+    def scorecard(self, selections=None, period=None, pt_selections=None):
+        po_where, params = self._where("purchase_orders", selections, period, not_null=["DATE"] + CUBE_DIMENSIONS)
+        pt_where, pt_params = self._where("payment_terms", pt_selections, not_null=["FOURNISSEUR", "DIVISION"])
+        records = self._query(
+            f'WITH po AS (SELECT CAST("FOURNISSEUR" AS VARCHAR) AS FOURNISSEUR, coalesce(sum("MONTANT_EUR"), 0) AS MONTANT_EUR, '
+            f'coalesce(sum("QUANTITE"), 0) AS QUANTITE, count(*) AS PO_COUNT, count(*) FILTER (WHERE "STATUT" = \'En attente\') AS PENDING '
+            f'FROM "purchase_orders"{po_where} GROUP BY 1), '
+            f'pt AS (SELECT CAST("FOURNISSEUR" AS VARCHAR) AS FOURNISSEUR, avg("NEW_DAYS") AS NEW_DAYS FROM "payment_terms"{pt_where} GROUP BY 1) '
+            f'SELECT po.FOURNISSEUR, MONTANT_EUR, QUANTITE, PO_COUNT, 100.0 * PENDING / PO_COUNT AS Taux_Pending, '
+            f'MONTANT_EUR / PO_COUNT AS TICKET_MOYEN, NEW_DAYS FROM po LEFT JOIN pt ON pt.FOURNISSEUR = po.FOURNISSEUR',
+            params + pt_params,
+        )
+        return _scorecard_frame(records)
+
+
+# Data source selected by DATA_BACKEND, "supabase" (default) or "local"; read when called so
+# that a .env loaded after the imports applies
+def create_source(backend=None):
+    backend = backend or os.getenv("DATA_BACKEND", "supabase")
+    if backend == "local":
+        return LocalSource(os.getenv("LOCAL_DATA_DIR", "."), os.getenv("LOCAL_DB", ":memory:"))
+    if backend == "supabase":
+        return SupabaseSource()
+    raise ValueError(f"DATA_BACKEND inconnu : {backend} (attendu : supabase ou local)")
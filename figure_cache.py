@@ -0,0 +1,59 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Bytes of rendered images kept in memory, least recently used evicted first
+FIGURE_CACHE_MAX_BYTES = int(os.getenv("FIGURE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+# Start the Kaleido renderer ahead of the first export and keep it running: Kaleido 1.x runs a
+# persistent sync server, Kaleido 0.2 keeps its subprocess alive after a first render
+def warm_renderer():
+    try:
+        import kaleido
+        if hasattr(kaleido, "start_sync_server"):
+            kaleido.start_sync_server(silence_warnings=True)
+        else:
+            import plotly.graph_objects as go
+            go.Figure().to_image(format="png", width=10, height=10)
+    except Exception:
+        pass
+
+
+# Content-addressed cache of rendered figures, shared by the PNG and PowerPoint exports. The key
+# hashes the figure JSON, the output format and size, and the default template the figure
+# falls back to, so an unchanged figure is never rendered twice.
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(fig, format="png", width=None, height=None, scale=None):
+        import plotly.io as pio
+        digest = hashlib.sha256(fig.to_json().encode("utf-8"))
+        digest.update(f"|{format}|{width}|{height}|{scale}|{pio.templates.default}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def render(self, fig, format="png", width=None, height=None, scale=None):
+        key = self.key(fig, format, width, height, scale)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+            self.misses += 1
+        image = fig.to_image(format=format, width=width, height=height, scale=scale)
+        with self._lock:
+            if key not in self._images and len(image) <= self.max_bytes:
+                self._images[key] = image
+                self.nbytes += len(image)
+                while self.nbytes > self.max_bytes:
+                    _, evicted = self._images.popitem(last=False)
+                    self.nbytes -= len(evicted)
+        return image
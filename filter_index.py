@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Columns with at most this many distinct values get one packed bitmap per value;
+# wider columns are answered with a lookup table over their category codes
+BITMAP_MAX_CARDINALITY = 256
+
+
+# Filter index over one table, built once per data version: packed bitmaps per category
+# value and a sorted date index, so sidebar filters become bitmap intersections and a
+# binary search instead of full-column isin/between scans.
+class FilterIndex:
+    def __init__(self, df, columns, date_column=None):
+        self.size = len(df)
+        self.nbytes = (self.size + 7) // 8
+        self.columns = {}
+        for col in columns:
+            values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype("category")
+            codes = values.cat.codes.to_numpy()
+            categories = values.cat.categories.tolist()
+            entry = {
+                "categories": categories,
+                "codes": codes,
+                "missing": np.packbits(codes < 0) if (codes < 0).any() else None,
+                "bitmaps": None,
+            }
+            if len(categories) <= BITMAP_MAX_CARDINALITY:
+                entry["bitmaps"] = [np.packbits(codes == i) for i in range(len(categories))]
+            self.columns[col] = entry
+
+        self.date_column = date_column
+        if date_column is not None:
+            dates = df[date_column].to_numpy(dtype="datetime64[ns]").view("int64")
+            self.date_order = np.argsort(dates, kind="stable")
+            self.sorted_dates = dates[self.date_order]
+            valid = self.sorted_dates[self.sorted_dates != np.iinfo("int64").min]
+            self.date_min = pd.Timestamp(valid[0]) if len(valid) else None
+            self.date_max = pd.Timestamp(valid[-1]) if len(valid) else None
+
+    # Distinct values of an indexed column, in category order
+    def values(self, col):
+        return self.columns[col]["categories"]
+
+    def _column_bitmap(self, col, selected):
+        entry = self.columns[col]
+        categories = entry["categories"]
+        selected = set(selected)
+        codes = [i for i, value in enumerate(categories) if value in selected]
+        if len(codes) == len(categories) and entry["missing"] is None:
+            return None
+        if entry["bitmaps"] is None:
+            lookup = np.zeros(len(categories) + 1, dtype=bool)
+            lookup[codes] = True
+            # code -1 (missing) maps to the trailing False slot
+            return np.packbits(lookup[entry["codes"]])
+        if len(codes) <= len(categories) // 2:
+            bitmap = np.zeros(self.nbytes, dtype=np.uint8)
+            for i in codes:
+                bitmap |= entry["bitmaps"][i]
+            return bitmap
+        # Most values selected: clear the unselected ones (and missing values) instead
+        excluded = entry["missing"].copy() if entry["missing"] is not None else np.zeros(self.nbytes, dtype=np.uint8)
+        for i in set(range(len(categories))) - set(codes):
+            excluded |= entry["bitmaps"][i]
+        return ~excluded
+
+    def _date_bitmap(self, start, end):
+        lo = np.searchsorted(self.sorted_dates, pd.Timestamp(start).value, side="left")
+        hi = np.searchsorted(self.sorted_dates, pd.Timestamp(end).value, side="right")
+        if lo == 0 and hi == self.size:
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.date_order[lo:hi]] = True
+        return np.packbits(mask)
+
+    # Row mask for {column: selected values} and an optional inclusive (start, end) date range
+    def mask(self, selections, date_range=None):
+        result = None
+        for col, selected in selections.items():
+            bitmap = self._column_bitmap(col, selected)
+            if bitmap is not None:
+                result = bitmap if result is None else result & bitmap
+        if date_range is not None and self.date_column is not None:
+            bitmap = self._date_bitmap(*date_range)
+            if bitmap is not None:
+                result = bitmap if result is None else result & bitmap
+        if result is None:
+            return np.ones(self.size, dtype=bool)
+        return np.unpackbits(result, count=self.size).astype(bool)
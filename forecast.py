@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Series forecast by the dashboard, one per value of each column
+FORECAST_COLUMNS = ["DEPARTEMENT", "FOURNISSEUR"]
+
+# Months projected past the last month of each series
+FORECAST_HORIZON = 6
+
+# "linear" (closed-form least squares, all series at once) or "prophet" (one model per series,
+# fitted on a process pool)
+FORECAST_MODEL = os.getenv("FORECAST_MODEL", "linear")
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", str(os.cpu_count() or 1)))
+
+
+# Monthly MONTANT_EUR of every value of column, from rollup cube rows, sorted by (column, MONTH)
+def monthly_series(cube, column):
+    return cube.groupby([column, "MONTH"], observed=True)["MONTANT_EUR"].sum().reset_index()
+
+
+# Least-squares line of MONTANT_EUR over the days since each series' first month, fitted for
+# all series at once from grouped sums. Series with a single month get no slope.
+def fit_linear(series, column):
+    first = series.groupby(column, observed=True)["MONTH"].transform("min")
+    x = (series["MONTH"] - first).dt.days.to_numpy(dtype="float64")
+    y = series["MONTANT_EUR"].to_numpy(dtype="float64")
+    sums = (
+        pd.DataFrame({column: series[column], "x": x, "y": y, "xx": x * x, "xy": x * y})
+        .groupby(column, observed=True)
+        .agg(n=("x", "size"), sx=("x", "sum"), sy=("y", "sum"), sxx=("xx", "sum"), sxy=("xy", "sum"))
+    )
+    months = series.groupby(column, observed=True)["MONTH"].agg(["min", "max"])
+    denominator = sums["n"] * sums["sxx"] - sums["sx"] ** 2
+    slope = (sums["n"] * sums["sxy"] - sums["sx"] * sums["sy"]) / denominator.where(denominator > 0)
+    return pd.DataFrame({
+        "FIRST_MONTH": months["min"],
+        "LAST_MONTH": months["max"],
+        "MONTHS": sums["n"],
+        "SLOPE": slope,
+        "INTERCEPT": (sums["sy"] - slope * sums["sx"]) / sums["n"],
+    })
+
+
+# The FORECAST_HORIZON month starts following each series' last month, shape (series, horizon)
+def future_months(last_months):
+    months = last_months.to_numpy(dtype="datetime64[ns]").astype("datetime64[M]")
+    return (months[:, None] + np.arange(1, FORECAST_HORIZON + 1)).astype("datetime64[ns]")
+
+
+def project_linear(params):
+    params = params[params["SLOPE"].notna()]
+    future = future_months(params["LAST_MONTH"])
+    days = (future - params["FIRST_MONTH"].to_numpy(dtype="datetime64[ns]")[:, None]) / np.timedelta64(1, "D")
+    values = params["INTERCEPT"].to_numpy()[:, None] + params["SLOPE"].to_numpy()[:, None] * days
+    return params.index.repeat(FORECAST_HORIZON), future.ravel(), values.ravel()
+
+
+# Prophet projection of one series; runs in a worker process
+def _prophet_projection(dates, values, future):
+    from prophet import Prophet
+    model = Prophet(weekly_seasonality=False, daily_seasonality=False)
+    model.fit(pd.DataFrame({"ds": dates, "y": values}))
+    return model.predict(pd.DataFrame({"ds": future}))["yhat"].to_numpy()
+
+
+def project_prophet(series, column, params, workers=FORECAST_WORKERS):
+    params = params[params["MONTHS"] >= 2]
+    future = future_months(params["LAST_MONTH"])
+    rows = series.groupby(column, observed=True).indices
+    tasks = [
+        (series["MONTH"].to_numpy()[rows[key]], series["MONTANT_EUR"].to_numpy()[rows[key]], months)
+        for key, months in zip(params.index, future)
+    ]
+    # spawn: forking the multi-threaded Streamlit server is not safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        values = list(pool.map(_prophet_projection, *zip(*tasks))) if tasks else []
+    return params.index.repeat(FORECAST_HORIZON), future.ravel(), np.concatenate(values) if values else np.array([])
+
+
+# Fitted history and projections of every series of one column, looked up by series value
+class Forecasts:
+    def __init__(self, cube, column, model=FORECAST_MODEL):
+        self.column = column
+        self.model = model
+        self.series = monthly_series(cube, column)
+        self.params = fit_linear(self.series, column)
+        if model == "prophet":
+            keys, dates, values = project_prophet(self.series, column, self.params)
+        else:
+            keys, dates, values = project_linear(self.params)
+        self.projections = pd.DataFrame({column: keys, "DATE": dates, "MONTANT_EUR": values})
+        self._series_rows = self.series.groupby(column, observed=True).indices
+        self._projection_rows = self.projections.groupby(column, observed=True).indices
+
+    # Monthly history of one series as (DATE, MONTANT_EUR); empty if the value has no POs
+    def history(self, key):
+        rows = self._series_rows.get(key, [])
+        return self.series.iloc[rows][["MONTH", "MONTANT_EUR"]].rename(columns={"MONTH": "DATE"}).reset_index(drop=True)
+
+    # Projected (DATE, MONTANT_EUR) of one series; empty if it has fewer than two months
+    def projection(self, key):
+        rows = self._projection_rows.get(key, [])
+        return self.projections.iloc[rows][["DATE", "MONTANT_EUR"]].reset_index(drop=True)
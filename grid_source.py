@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+# Rows per grid page offered to the user; the first is the default
+PAGE_SIZES = [50, 100, 250, 500]
+
+
+# Server-side row source of a detail grid, built once per data version over the full table.
+# A page request (row mask, sort, text filter, page) is answered from cached sort orders so
+# only the rows of the visible page are materialized and sent to the browser.
+class GridSource:
+    def __init__(self, df, columns):
+        self.df = df[columns].reset_index(drop=True)
+        self.columns = columns
+        self._orders = {}
+
+    # Columns a text filter can apply to
+    def text_columns(self):
+        return [
+            col for col in self.columns
+            if isinstance(self.df[col].dtype, (pd.CategoricalDtype, pd.StringDtype)) or self.df[col].dtype == object
+        ]
+
+    # (non-null row positions in ascending order, null row positions) of a column, sorted once
+    def _order(self, column):
+        if column not in self._orders:
+            values = self.df[column]
+            order = values.sort_values(kind="stable", na_position="last").index.to_numpy()
+            valid = len(values) - int(values.isna().sum())
+            self._orders[column] = (order[:valid], order[valid:])
+        return self._orders[column]
+
+    # Rows whose column contains text, case-insensitive; categorical columns match their
+    # categories once and map back through the codes
+    def text_mask(self, column, text):
+        values = self.df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            hits = np.flatnonzero(values.cat.categories.astype(str).str.contains(text, case=False, regex=False))
+            return np.isin(values.cat.codes.to_numpy(), hits)
+        return values.astype("string").str.contains(text, case=False, regex=False).fillna(False).to_numpy(dtype=bool)
+
+    # One page of the rows selected by mask (a boolean array over the full table), optionally
+    # sorted by sort_by; nulls always come last. Returns (page rows, total selected rows).
+    def page(self, mask, sort_by=None, ascending=True, page=1, page_size=PAGE_SIZES[0]):
+        if sort_by is None:
+            positions = np.flatnonzero(mask)
+        else:
+            valid, missing = self._order(sort_by)
+            if not ascending:
+                valid = valid[::-1]
+            positions = np.concatenate([valid[mask[valid]], missing[mask[missing]]])
+        start = (page - 1) * page_size
+        return self.df.iloc[positions[start:start + page_size]], len(positions)
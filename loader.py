@@ -0,0 +1,172 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Columns used by the dashboard for each Supabase table
+TABLE_COLUMNS = {
+    "purchase_orders": ["PO_NUMBER", "FOURNISSEUR", "DEPARTEMENT", "MONTANT_EUR", "QUANTITE", "DATE", "TYPE_ACHAT", "STATUT"],
+    "payment_terms": ["FOURNISSEUR", "OLD_DAYS", "NEW_DAYS", "TURNOVER_EUR", "DIVISION", "CONDITION_PAIEMENT", "DELAI_PAIEMENT"],
+    "contracts": ["CONTRAT", "FOURNISSEUR", "DATE_EXPIRATION", "MONTANT_MAD", "RESPONSABLE_EMAIL"],
+}
+
+# Unique, non-null key of each table, used for keyset pagination: one or more columns (a
+# supplier has one payment-terms row per division)
+TABLE_KEYS = {
+    "purchase_orders": ["PO_NUMBER"],
+    "payment_terms": ["FOURNISSEUR", "DIVISION"],
+    "contracts": ["CONTRAT"],
+}
+
+# PostgREST caps responses at 1000 rows by default (db-max-rows)
+PAGE_SIZE = 1000
+
+# Longest value list sent as one PostgREST in.(...) filter, which travels in the URL
+PUSHDOWN_MAX_VALUES = int(os.getenv("PUSHDOWN_MAX_VALUES", "200"))
+# postgrest-py quotes list values without escaping these, so lists holding them are not sent
+PUSHDOWN_UNSAFE_CHARS = ('"', "\\")
+
+
+# List the columns of a table from its first row (None when the table is empty)
+def fetch_columns(client, table_name):
+    response = client.table(table_name).select("*").limit(1).execute()
+    if not response.data:
+        return None
+    return list(response.data[0].keys())
+
+
+# Map each required column to its actual name in Supabase (columns may be stored in lower case)
+def resolve_columns(client, table_name, required_cols, actual_cols=None):
+    actual_cols = actual_cols or fetch_columns(client, table_name)
+    if not actual_cols:
+        return None, f"Aucune donnée trouvée dans la table {table_name}. Vérifiez si la table existe et contient des données."
+    by_lower = {col.lower(): col for col in actual_cols}
+    missing_cols = [col for col in required_cols if col.lower() not in by_lower]
+    if missing_cols:
+        return None, f"Colonnes manquantes dans {table_name}: {missing_cols}. Colonnes disponibles: {actual_cols}"
+    return {col: by_lower[col.lower()] for col in required_cols}, None
+
+
+# Value in a PostgREST logic tree (or=...), quoted so that commas, dots and parentheses are literal
+def _tree_value(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+# Keep the rows after the key values last in key order: k1 > v1, or k1 = v1 and k2 > v2, ...
+def _after(query, key, last):
+    if len(key) == 1:
+        return query.gt(key[0], last[0])
+    terms = []
+    for i in range(len(key)):
+        conditions = [f"{col}.eq.{_tree_value(value)}" for col, value in zip(key[:i], last[:i])]
+        conditions.append(f"{key[i]}.gt.{_tree_value(last[i])}")
+        terms.append(conditions[0] if i == 0 else f"and({','.join(conditions)})")
+    return query.or_(",".join(terms))
+
+
+# Page through a table ordered by its key columns, yielding one list of records per page;
+# start_after holds the key values to start after
+def fetch_pages(client, table_name, columns, key, page_size=PAGE_SIZE, filters=None, start_after=None):
+    last = start_after
+    while True:
+        query = client.table(table_name).select(",".join(columns)).limit(page_size)
+        for col in key:
+            query = query.order(col)
+        if filters:
+            query = filters(query)
+        if last is not None:
+            query = _after(query, key, last)
+        page = query.execute().data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = [page[-1][col] for col in key]
+
+
+# First and last day of a period, as ISO dates: the date columns hold days, so a period starting
+# mid-day starts on the next day
+def day_range(period):
+    return pd.Timestamp(period[0]).ceil("D").strftime("%Y-%m-%d"), pd.Timestamp(period[1]).floor("D").strftime("%Y-%m-%d")
+
+
+def _sendable(values):
+    return len(values) <= PUSHDOWN_MAX_VALUES and not any(char in value for value in values for char in PUSHDOWN_UNSAFE_CHARS)
+
+
+# PostgREST filters of a sidebar selection ({column: selected values}) and period, as a filters
+# callable for fetch_pages. Each column becomes in.(selected), and the period gte/lte on
+# date_column; mapping renames the columns to their names in Supabase. all_values (the values of
+# each column) allows not.in.(left out) when that list is shorter, but only with complete: the
+# complement also selects the values the server holds and all_values lacks, so all_values must
+# come from the server's current data, not from a snapshot that may be behind it. As with the
+# sidebar filter indexes, rows with a missing value are never selected. Columns whose list stays
+# over PUSHDOWN_MAX_VALUES, or holds a PUSHDOWN_UNSAFE_CHARS value, are not sent: they are
+# returned as the residual selections to apply after the download. Returns (filters or None,
+# residual).
+def pushdown_filters(selections=None, period=None, date_column=None, all_values=None, mapping=None, complete=False):
+    mapping, all_values = mapping or {}, (all_values or {}) if complete else {}
+    steps, residual = [], {}
+    for col, selected in (selections or {}).items():
+        name = mapping.get(col, col)
+        selected = [str(value) for value in selected]
+        chosen = set(selected)
+        excluded = [str(value) for value in all_values[col] if str(value) not in chosen] if col in all_values else None
+        if excluded == []:
+            steps.append(lambda query, name=name: query.not_.is_(name, "null"))
+        elif excluded is not None and len(excluded) < len(selected) and _sendable(excluded):
+            steps.append(lambda query, name=name, values=excluded: query.not_.in_(name, values).not_.is_(name, "null"))
+        elif _sendable(selected):
+            steps.append(lambda query, name=name, values=selected: query.in_(name, values))
+        else:
+            residual[col] = selected
+    if period is not None and date_column is not None:
+        first, last = day_range(period)
+        name = mapping.get(date_column, date_column)
+        steps.append(lambda query: query.gte(name, first).lte(name, last))
+
+    def filters(query):
+        for step in steps:
+            query = step(query)
+        return query
+    return (filters if steps else None), residual
+
+
+# Load the required columns of a table, returning (df, error, stats)
+def load_table(client, table_name, required_cols, page_size=PAGE_SIZE, filters=None):
+    start = time.perf_counter()
+    try:
+        mapping, error = resolve_columns(client, table_name, required_cols)
+        if error:
+            return pd.DataFrame(columns=required_cols), error, None
+        key = [mapping[col] for col in TABLE_KEYS[table_name]]
+        frames = []
+        for page in fetch_pages(client, table_name, list(mapping.values()), key, page_size, filters):
+            frames.append(pd.DataFrame.from_records(page))
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=list(mapping.values()))
+        df = df.rename(columns={actual: col for col, actual in mapping.items()})[required_cols]
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": len(df),
+            "pages": len(frames),
+            "seconds": elapsed,
+            "rows_per_sec": len(df) / elapsed if elapsed > 0 else float("inf"),
+        }
+        return df, None, stats
+    except Exception as e:
+        return pd.DataFrame(columns=required_cols), f"⚠️ Erreur lors du chargement de {table_name}: {str(e)}", None
+
+
+# Load several tables concurrently, returning {table_name: (df, error, stats)}
+def load_tables(client, tables=None, page_size=PAGE_SIZE):
+    tables = tables or TABLE_COLUMNS
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        futures = {
+            name: executor.submit(load_table, client, name, cols, page_size)
+            for name, cols in tables.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
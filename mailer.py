@@ -0,0 +1,186 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# Errors worth retrying on a fresh connection
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def is_transient(error):
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    # 4xx replies (greylisting, rate limiting, mailbox busy) are temporary by definition
+    return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+
+# attachments is a list of (filename, text) files attached as UTF-8
+def build_message(sender, to_email, subject, body, attachments=()):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    for filename, text in attachments:
+        part = MIMEText(text, 'csv' if filename.endswith('.csv') else 'plain', 'utf-8')
+        part.add_header('Content-Disposition', 'attachment', filename=filename)
+        msg.attach(part)
+    return msg
+
+
+# Result handle of a batch of queued emails, updated by the dispatcher workers
+class MailBatch:
+    def __init__(self, total, on_sent=None):
+        self.total = total
+        self.on_sent = on_sent
+        self.sent = 0
+        self.failed = 0
+        self.errors = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if total == 0:
+            self._done.set()
+
+    def _record(self, index, error=None):
+        callback_error = None
+        if error is None and self.on_sent is not None:
+            try:
+                self.on_sent(index)
+            except Exception as e:
+                callback_error = f"Email envoyé mais non enregistré : {e}"
+        with self._lock:
+            if error is None:
+                self.sent += 1
+            else:
+                self.failed += 1
+                self.errors.append(error)
+            if callback_error:
+                self.errors.append(callback_error)
+            if self.sent + self.failed >= self.total:
+                self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def progress(self):
+        return (self.sent + self.failed) / self.total if self.total else 1.0
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+# Shared token bucket limiting the send rate across workers
+class RateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Sends emails from a bounded queue on background workers. Each worker keeps its own
+# authenticated SMTP connection open between messages (smtplib connections are not
+# thread-safe), reconnects after idle_timeout or a dropped connection, and retries
+# transient failures with exponential backoff.
+class MailDispatcher:
+    def __init__(self, server, port, username=None, password=None, starttls=True, workers=2,
+                 rate_per_second=5.0, max_retries=3, queue_size=1000, idle_timeout=30.0, timeout=30.0):
+        self.server = server
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.sender = username or f"noreply@{server}"
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = [threading.Thread(target=self._work, daemon=True, name=f"mailer-{i}") for i in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(
+            os.getenv("SMTP_SERVER"),
+            os.getenv("SMTP_PORT"),
+            os.getenv("SMTP_USERNAME"),
+            os.getenv("SMTP_PASSWORD"),
+            starttls=os.getenv("SMTP_STARTTLS", "1") != "0",
+            workers=int(os.getenv("SMTP_WORKERS", "2")),
+            rate_per_second=float(os.getenv("SMTP_RATE_PER_SECOND", "5")),
+            **kwargs,
+        )
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username and self.password:
+            connection.login(self.username, self.password)
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except smtplib.SMTPException:
+            connection.close()
+        except OSError:
+            pass
+
+    def _work(self):
+        connection = None
+        while True:
+            try:
+                batch, index, msg = self.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close(connection)
+                connection = None
+                continue
+            error = None
+            for attempt in range(self.max_retries + 1):
+                try:
+                    if connection is None:
+                        connection = self._connect()
+                    self.rate_limiter.acquire()
+                    connection.sendmail(msg['From'], [msg['To']], msg.as_string())
+                    error = None
+                    break
+                except Exception as e:
+                    error = f"{msg['To']}: {e}"
+                    self._close(connection)
+                    connection = None
+                    if not is_transient(e) or attempt == self.max_retries:
+                        break
+                    time.sleep(min(2 ** attempt, 30))
+            batch._record(index, error)
+            self.queue.task_done()
+
+    # Queue (subject, body, to_email) or (subject, body, to_email, attachments) messages and return
+    # a MailBatch tracking their delivery; on_sent(index) is called from the worker once the
+    # message at that index is delivered
+    def submit(self, messages, on_sent=None):
+        messages = list(messages)
+        batch = MailBatch(len(messages), on_sent)
+        for index, (subject, body, to_email, *attachments) in enumerate(messages):
+            try:
+                self.queue.put_nowait((batch, index, build_message(self.sender, to_email, subject, body, *attachments)))
+            except queue.Full:
+                batch._record(index, f"{to_email}: file d'attente d'envoi pleine")
+        return batch
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Payment-term buckets of the new/old terms pies: (0, 45], (45, 60], (60, inf)
+TERM_BUCKET_EDGES = [45, 60]
+TERM_BUCKET_LABELS = ["≤45 days", "45-60 days", "≥60 days"]
+
+# Suppliers shown as heatmap rows, by turnover; the others are grouped as "Autres"
+HEATMAP_MAX_SUPPLIERS = int(os.getenv("HEATMAP_MAX_SUPPLIERS", "50"))
+
+HEATMAP_METRICS = {"Turnover (EUR)": "TURNOVER_EUR", "Délai Paiement (jours)": "NEW_DAYS"}
+
+
+def _codes(values):
+    values = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+    return values.cat.codes.to_numpy(), values.cat.categories
+
+
+# Term bucket counts as the pies show them; days that are missing or not positive are left out
+def term_buckets(days):
+    days = np.asarray(days, dtype="float64")
+    valid = days > 0
+    counts = np.bincount(np.searchsorted(TERM_BUCKET_EDGES, days[valid]), minlength=len(TERM_BUCKET_LABELS))
+    return pd.Series(counts, index=TERM_BUCKET_LABELS)
+
+
+# Tab 2 analytics of the filtered payment terms, from one grouped pass over the rows: term
+# buckets, cash-flow KPIs, per-division aggregates and the supplier x division heatmap, kept
+# sparse as (supplier code, division code) cells with their sums and counts.
+class PaymentTermsAnalytics:
+    def __init__(self, df_pt):
+        new = df_pt["NEW_DAYS"].to_numpy(dtype="float64", na_value=np.nan)
+        old = df_pt["OLD_DAYS"].to_numpy(dtype="float64", na_value=np.nan)
+        turnover = df_pt["TURNOVER_EUR"].to_numpy(dtype="float64", na_value=np.nan)
+
+        self.rows = len(df_pt)
+        self.new_terms = term_buckets(new)
+        self.old_terms = term_buckets(old)
+        self.kpis = {
+            "turnover": np.nansum(turnover),
+            "improvement": np.count_nonzero(new < old) / self.rows * 100 if self.rows else 0.0,
+            "cash_flow": np.nansum((old - new) * turnover / 360),
+        }
+
+        supplier_codes, self.suppliers = _codes(df_pt["FOURNISSEUR"])
+        division_codes, self.divisions = _codes(df_pt["DIVISION"])
+        # Rows without a supplier still count for their division, under a sentinel supplier code
+        supplier_codes = np.where(supplier_codes >= 0, supplier_codes, len(self.suppliers))
+        valid = division_codes >= 0
+        cell_keys = supplier_codes[valid].astype("int64") * len(self.divisions) + division_codes[valid]
+        keys, inverse = np.unique(cell_keys, return_inverse=True)
+
+        # Sums and non-null counts per (supplier, division) cell
+        def cell_sum(values):
+            values = values[valid]
+            present = ~np.isnan(values)
+            return (
+                np.bincount(inverse[present], weights=values[present], minlength=len(keys)),
+                np.bincount(inverse[present], minlength=len(keys)),
+            )
+
+        self.cells = pd.DataFrame({"supplier": keys // len(self.divisions), "division": keys % len(self.divisions)})
+        for name, values in (("TURNOVER_EUR", turnover), ("NEW_DAYS", new), ("OLD_DAYS", old)):
+            self.cells[f"{name}_sum"], self.cells[f"{name}_count"] = cell_sum(values)
+
+        by_division = self.cells.groupby("division").sum()
+        self.division_table = pd.DataFrame({
+            "DIVISION": self.divisions[by_division.index],
+            "TURNOVER_EUR": by_division["TURNOVER_EUR_sum"].to_numpy(),
+            "NEW_DAYS": (by_division["NEW_DAYS_sum"] / by_division["NEW_DAYS_count"]).to_numpy(),
+            "OLD_DAYS": (by_division["OLD_DAYS_sum"] / by_division["OLD_DAYS_count"]).to_numpy(),
+        })
+        self.division_table["Improvement"] = (
+            (self.division_table["OLD_DAYS"] - self.division_table["NEW_DAYS"]) / self.division_table["OLD_DAYS"] * 100
+        ).round(2)
+
+    # Dense supplier x division matrix of one metric (turnover summed, days averaged) over the
+    # observed suppliers and divisions; suppliers past max_rows by turnover become "Autres"
+    def heatmap_matrix(self, metric="TURNOVER_EUR", max_rows=HEATMAP_MAX_SUPPLIERS):
+        cells = self.cells[self.cells["supplier"] < len(self.suppliers)]
+        supplier_turnover = cells.groupby("supplier")["TURNOVER_EUR_sum"].sum().sort_values(ascending=False)
+        top = supplier_turnover.index[:max_rows - 1] if len(supplier_turnover) > max_rows else supplier_turnover.index
+        top = np.sort(top)
+        rows = pd.Series(np.arange(len(top)), index=top)
+        row = cells["supplier"].map(rows).fillna(len(top)).astype("int64").to_numpy()
+        labels = [str(self.suppliers[code]) for code in top] + (["Autres"] if len(top) < len(supplier_turnover) else [])
+
+        observed = np.unique(cells["division"].to_numpy())
+        col = np.searchsorted(observed, cells["division"].to_numpy())
+        sums = np.zeros((len(labels), len(observed)))
+        counts = np.zeros((len(labels), len(observed)))
+        np.add.at(sums, (row, col), cells[f"{metric}_sum"].to_numpy())
+        np.add.at(counts, (row, col), cells[f"{metric}_count"].to_numpy())
+        values = sums if metric == "TURNOVER_EUR" else np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        return pd.DataFrame(values, index=pd.Index(labels, name="FOURNISSEUR"),
+                            columns=pd.Index([str(self.divisions[code]) for code in observed], name="DIVISION"))
+
+    # Figures, usable outside Streamlit
+
+    def terms_figure(self, which, title, colors=None):
+        import plotly.express as px
+        counts = self.new_terms if which == "new" else self.old_terms
+        column = "NEW_DAYS" if which == "new" else "OLD_DAYS"
+        return px.pie(counts.rename_axis(column).reset_index(name="Count"), names=column, values="Count",
+                      hole=0.4, title=title, color_discrete_sequence=colors)
+
+    def heatmap_figure(self, metric_label, title, colors=None):
+        import plotly.express as px
+        return px.imshow(self.heatmap_matrix(HEATMAP_METRICS[metric_label]), title=f"{title} ({metric_label})",
+                         color_continuous_scale=colors)
+
+    def division_figure(self, title, colors=None):
+        import plotly.express as px
+        df_division = self.division_table
+        fig = px.bar(df_division, x="DIVISION", y=["NEW_DAYS", "OLD_DAYS"], barmode="group", title=title,
+                     color_discrete_sequence=colors)
+        fig.add_scatter(x=df_division["DIVISION"], y=df_division["TURNOVER_EUR"], mode="lines+markers", name="Turnover", yaxis="y2")
+        fig.update_layout(yaxis2=dict(title="Turnover (EUR)", overlaying="y", side="right"), yaxis_title="Days")
+        return fig
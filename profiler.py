@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Reruns kept per session
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "20"))
+
+# Emails allowed to see the profiler panel, comma-separated
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+_DISABLED = nullcontext()
+
+# tracemalloc is process-wide: it runs while at least one session traces memory, and the sessions
+# tracing are counted so that one of them turning it off does not stop it for the others
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+
+
+def _start_tracing():
+    global _tracing_sessions
+    with _tracing_lock:
+        _tracing_sessions += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _stop_tracing():
+    global _tracing_sessions
+    with _tracing_lock:
+        _tracing_sessions -= 1
+        if _tracing_sessions == 0:
+            tracemalloc.stop()
+
+
+def _sole_tracer():
+    with _tracing_lock:
+        return _tracing_sessions == 1
+
+
+def is_admin(email):
+    return bool(email) and email.lower() in ADMIN_EMAILS
+
+
+# Named timing spans of the script reruns of one session. Spans nest: mark(name, depth) closes
+# the open spans at depth and below and opens a new one, for the top-to-bottom stages of the
+# script; span(name) wraps a block; fragment(name, depth) wraps the body of a st.fragment, which
+# also reruns alone and is then recorded as a rerun of its own. Memory deltas are recorded only
+# with trace_memory, which turns tracemalloc on; they, like the peak, count the allocations of
+# the whole process, and the peak is left out while other sessions trace too, since resetting it
+# would be felt by all of them. Disabled, every call returns at once.
+class Profiler:
+    def __init__(self, history=PROFILE_HISTORY):
+        self.runs = deque(maxlen=history)
+        self.enabled = False
+        self.trace_memory = False
+        self._run = None
+        self._stack = []
+        self._count = 0
+        self._tracing = None
+        self._track_peak = False
+
+    def start_rerun(self, enabled, trace_memory=False, fragment=None):
+        # A rerun interrupted by st.stop() or an exception never reached finish()
+        self.finish(complete=False)
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        # The session's count is released by a finalizer, so that a session dropped while
+        # tracing (closed tab, expired session) does not keep tracemalloc running
+        if self.trace_memory and self._tracing is None:
+            _start_tracing()
+            self._tracing = weakref.finalize(self, _stop_tracing)
+        elif not self.trace_memory and self._tracing is not None:
+            self._tracing()
+            self._tracing = None
+        if not enabled:
+            return
+        self._track_peak = self.trace_memory and _sole_tracer()
+        if self._track_peak:
+            tracemalloc.reset_peak()
+        self._count += 1
+        self._run = {
+            "run": self._count,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "fragment": fragment,
+            "origin": time.perf_counter(),
+            "spans": [],
+        }
+
+    def _memory(self):
+        return tracemalloc.get_traced_memory()[0] if self.trace_memory else None
+
+    def _open(self, name):
+        span = {
+            "name": name,
+            "depth": len(self._stack),
+            "start": time.perf_counter() - self._run["origin"],
+            "seconds": None,
+            "memory_bytes": self._memory(),
+        }
+        self._run["spans"].append(span)
+        self._stack.append(span)
+
+    def _close(self):
+        span = self._stack.pop()
+        span["seconds"] = time.perf_counter() - self._run["origin"] - span["start"]
+        if span["memory_bytes"] is not None:
+            span["memory_bytes"] = self._memory() - span["memory_bytes"]
+
+    def mark(self, name, depth=0):
+        if self._run is None:
+            return
+        while len(self._stack) > depth:
+            self._close()
+        self._open(name)
+
+    def span(self, name):
+        if self._run is None:
+            return _DISABLED
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        self._open(name)
+        try:
+            yield
+        finally:
+            self._close()
+
+    # Within a full rerun, a span marked at depth and closed at the end of the block; in a rerun
+    # of the fragment alone (no rerun in progress), a rerun named after the fragment
+    @contextmanager
+    def fragment(self, name, depth=0):
+        if self._run is None:
+            if not self.enabled:
+                yield
+                return
+            self.start_rerun(True, self.trace_memory, fragment=name)
+            try:
+                with self._span(name):
+                    yield
+            finally:
+                self.finish()
+            return
+        self.mark(name, depth)
+        self._stack[-1]["fragment"] = True
+        try:
+            yield
+        finally:
+            while self._run is not None and len(self._stack) > depth:
+                self._close()
+
+    def finish(self, complete=True):
+        if self._run is None:
+            return
+        while self._stack:
+            self._close()
+        run = self._run
+        self._run = None
+        run["seconds"] = time.perf_counter() - run.pop("origin")
+        run["complete"] = complete
+        run["peak_bytes"] = tracemalloc.get_traced_memory()[1] if self._track_peak and _sole_tracer() else None
+        self.runs.append(run)
+
+    def to_json(self):
+        return json.dumps(list(self.runs), indent=2)
+
+
+# Horizontal waterfall of one rerun: one bar per span from its start to its end, nested spans
+# indented under their parent
+def waterfall_figure(run, title=None):
+    import plotly.graph_objects as go
+
+    spans = run["spans"]
+    labels = [f"{'  ' * span['depth']}{span['name']} #{i}" for i, span in enumerate(spans)]
+    fig = go.Figure(go.Bar(
+        y=labels,
+        x=[span["seconds"] * 1000 for span in spans],
+        base=[span["start"] * 1000 for span in spans],
+        orientation="h",
+        text=[f"{span['seconds'] * 1000:.1f} ms" for span in spans],
+        hovertext=[
+            f"{span['name']}: {span['seconds'] * 1000:.1f} ms"
+            + (f", {span['memory_bytes'] / 1e6:+.1f} MB" if span["memory_bytes"] is not None else "")
+            for span in spans
+        ],
+        marker_color=[span["depth"] for span in spans],
+    ))
+    fig.update_layout(
+        title=title or f"Rerun #{run['run']} ({run['seconds'] * 1000:.0f} ms)",
+        xaxis_title="ms depuis le début du rerun",
+        yaxis=dict(autorange="reversed"),
+        height=max(300, 22 * len(spans) + 120),
+    )
+    return fig
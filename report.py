@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+# Optional .pptx whose slide masters and layouts the report is built on
+REPORT_TEMPLATE = os.getenv("REPORT_TEMPLATE")
+
+# Table rows per slide, and rows exported per table before the rest is summarized on a slide of
+# its own (0 exports every row)
+REPORT_ROWS_PER_SLIDE = int(os.getenv("REPORT_ROWS_PER_SLIDE", "15"))
+REPORT_MAX_TABLE_ROWS = int(os.getenv("REPORT_MAX_TABLE_ROWS", "300"))
+
+# Figures rendered at once
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", "4"))
+
+# Layout of the default template used for every slide: title only
+TITLE_ONLY_LAYOUT = 5
+
+
+# Handle of a report built in the background: current stage, per-stage timings, and the
+# .pptx bytes or the error once done
+class ReportJob:
+    def __init__(self):
+        self.stage = "en attente"
+        self.timings = {}
+        self.result = None
+        self.error = None
+        self.skipped = []
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+# Render the figures to PNG concurrently, keeping their order, through figure_cache if given.
+# Returns the (title, png) pairs and the titles of the figures that failed to render.
+def render_figures(figures, figure_cache=None, workers=REPORT_RENDER_WORKERS):
+    def render(fig):
+        try:
+            return figure_cache.render(fig) if figure_cache is not None else fig.to_image(format="png")
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        images = list(pool.map(render, [fig for _, fig in figures]))
+    rendered = [(title, image) for (title, _), image in zip(figures, images) if image is not None]
+    failed = [title for (title, _), image in zip(figures, images) if image is None]
+    return rendered, failed
+
+
+# Header and cell text of a table in one bulk conversion per column
+def table_cells(df):
+    return list(df.columns), df.astype("string").fillna("").to_numpy(dtype=object)
+
+
+def _slide(prs, title):
+    layout = prs.slide_layouts[TITLE_ONLY_LAYOUT if len(prs.slide_layouts) > TITLE_ONLY_LAYOUT else -1]
+    slide = prs.slides.add_slide(layout)
+    if slide.shapes.title is not None:
+        slide.shapes.title.text = title
+    return slide
+
+
+def _add_table(prs, title, header, cells, total_rows):
+    from pptx.util import Inches, Pt
+
+    chunks = range(0, max(len(cells), 1), REPORT_ROWS_PER_SLIDE)
+    for number, start in enumerate(chunks, start=1):
+        rows = cells[start:start + REPORT_ROWS_PER_SLIDE]
+        slide = _slide(prs, f"{title} ({number}/{len(chunks)})" if len(chunks) > 1 else title)
+        table = slide.shapes.add_table(len(rows) + 1, len(header), Inches(0.5), Inches(1.5), Inches(9), Inches(0.3) * (len(rows) + 1)).table
+        for j, name in enumerate(header):
+            table.cell(0, j).text = str(name)
+        for i, row in enumerate(rows, start=1):
+            for j, value in enumerate(row):
+                cell = table.cell(i, j)
+                cell.text = value
+                cell.text_frame.paragraphs[0].font.size = Pt(9)
+    if total_rows > len(cells):
+        _slide(prs, title).shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(1)).text_frame.text = (
+            f"{total_rows - len(cells):,} ligne(s) supplémentaire(s) non exportée(s) sur {total_rows:,}."
+        )
+
+
+# Build the report: one slide per figure, then each table split into slides of
+# REPORT_ROWS_PER_SLIDE rows. figures is a list of (title, plotly figure); tables a list of
+# (title, DataFrame, total rows), the DataFrames already cut to the rows to export.
+def build_report(job, figures, tables, template=REPORT_TEMPLATE, figure_cache=None):
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    try:
+        job.stage = "rendu des graphiques"
+        start = time.perf_counter()
+        images, job.skipped = render_figures(figures, figure_cache)
+        job.timings["render"] = time.perf_counter() - start
+
+        job.stage = "préparation des tableaux"
+        start = time.perf_counter()
+        prepared = [(title, *table_cells(df), total_rows) for title, df, total_rows in tables]
+        job.timings["tables"] = time.perf_counter() - start
+
+        job.stage = "assemblage"
+        start = time.perf_counter()
+        prs = Presentation(template) if template else Presentation()
+        for title, image in images:
+            _slide(prs, title).shapes.add_picture(BytesIO(image), Inches(0.5), Inches(1.5), width=Inches(9))
+        for title, header, cells, total_rows in prepared:
+            _add_table(prs, title, header, cells, total_rows)
+        job.timings["assemble"] = time.perf_counter() - start
+
+        job.stage = "enregistrement"
+        start = time.perf_counter()
+        buffer = BytesIO()
+        prs.save(buffer)
+        job.result = buffer.getvalue()
+        job.timings["save"] = time.perf_counter() - start
+        job.stage = "terminé"
+    except Exception as e:
+        job.error = str(e)
+        job.stage = "échec"
+    finally:
+        job._done.set()
+
+
+# Rows of df to export, cut to REPORT_MAX_TABLE_ROWS when a cap is set
+def table_rows(df):
+    return df.head(REPORT_MAX_TABLE_ROWS) if REPORT_MAX_TABLE_ROWS > 0 else df
+
+
+# Start building a report on a background thread and return its ReportJob
+def start_report(figures, tables, template=REPORT_TEMPLATE, figure_cache=None):
+    job = ReportJob()
+    tables = [(title, table_rows(df), len(df)) for title, df in tables]
+    threading.Thread(target=build_report, args=(job, figures, tables, template, figure_cache), daemon=True, name="report").start()
+    return job
@@ -0,0 +1,81 @@
+import threading
+
+import pandas as pd
+
+from schema import apply_schema
+
+# Dimensions and measures of the purchase-order rollup cube
+CUBE_DIMENSIONS = ["DEPARTEMENT", "FOURNISSEUR", "TYPE_ACHAT", "STATUT"]
+CUBE_MEASURES = ["MONTANT_EUR", "QUANTITE", "COUNT"]
+
+
+def month_start(dates):
+    return pd.Series(dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[M]").astype("datetime64[ns]"), index=dates.index)
+
+
+# Monthly rollup of purchase orders: one row per (MONTH, dimensions) with summed amounts,
+# quantities and PO counts. Rows with a missing date or dimension are left out, as the
+# sidebar filters never select them.
+def build_cube(df_po):
+    keys = df_po[CUBE_DIMENSIONS].assign(MONTH=month_start(df_po["DATE"]))
+    cube = (
+        keys.assign(MONTANT_EUR=df_po["MONTANT_EUR"], QUANTITE=df_po["QUANTITE"], COUNT=1)
+        .groupby(["MONTH"] + CUBE_DIMENSIONS, observed=True)
+        .agg(MONTANT_EUR=("MONTANT_EUR", "sum"), QUANTITE=("QUANTITE", "sum"), COUNT=("COUNT", "sum"))
+        .reset_index()
+    )
+    return cube.astype({"QUANTITE": "float64", "COUNT": "int64"})
+
+
+# Apply a delta load to a cube: add the new rows and subtract the versions they replaced
+def patch_cube(cube, previous, delta):
+    parts = [cube, build_cube(delta)]
+    if len(previous):
+        removed = build_cube(previous)
+        removed[CUBE_MEASURES] = -removed[CUBE_MEASURES]
+        parts.append(removed)
+    combined = pd.concat(parts, ignore_index=True).astype({dim: "category" for dim in CUBE_DIMENSIONS})
+    patched = combined.groupby(["MONTH"] + CUBE_DIMENSIONS, observed=True)[CUBE_MEASURES].sum().reset_index()
+    return patched[patched["COUNT"] > 0].reset_index(drop=True)
+
+
+# Cube rows for the sidebar filters. Months fully inside the period come from the cube; the
+# partial months at either end are re-aggregated from the already filtered POs.
+def slice_cube(cube, selections, period, df_po_filtered):
+    start, end = pd.Timestamp(period[0]), pd.Timestamp(period[1])
+    # Full months [first_full, last_full]: month starts m with start <= m and m + 1 month <= end + 1ns
+    first_full = start.to_period("M").to_timestamp()
+    if first_full < start:
+        first_full += pd.offsets.MonthBegin(1)
+    last_full = (end + pd.Timedelta(1, "ns")).to_period("M").to_timestamp() - pd.offsets.MonthBegin(1)
+
+    mask = (cube["MONTH"] >= first_full) & (cube["MONTH"] <= last_full)
+    for col, selected in selections.items():
+        mask &= cube[col].isin(selected)
+    dates = df_po_filtered["DATE"]
+    edges = df_po_filtered[(dates < first_full) | (dates >= last_full + pd.offsets.MonthBegin(1))]
+    return pd.concat([cube[mask], build_cube(edges)], ignore_index=True)
+
+
+# Holds the cube of the latest data version, patched in place when a delta sync follows the
+# version it was built from and rebuilt otherwise, with build(df_po) (e.g. a data source's rollup)
+class CubeStore:
+    def __init__(self):
+        self.version = None
+        self.cube = None
+        self._lock = threading.Lock()
+
+    def get(self, df_po, stats, build=build_cube):
+        with self._lock:
+            if self.cube is not None and self.version == stats["version"]:
+                return self.cube
+            if self.cube is not None and stats["mode"] == "delta" and stats.get("base_version") == self.version:
+                self.cube = patch_cube(
+                    self.cube,
+                    apply_schema(stats["previous"], "purchase_orders"),
+                    apply_schema(stats["delta"], "purchase_orders"),
+                )
+            else:
+                self.cube = build(df_po)
+            self.version = stats["version"]
+            return self.cube
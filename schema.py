@@ -0,0 +1,56 @@
+import pandas as pd
+
+# Column dtypes of each table once decoded.
+# - "category" for the low-cardinality dimensions used by filters and groupbys
+# - "float32" for day counts (small integers, exact in float32, NaN allowed)
+# - "Int32" for quantities (falls back to float64 if the source holds fractional values)
+# - "float64" for amounts: millions with cents need more than float32's 7 significant digits
+# - "datetime64[ns]" for dates, "string" for identifiers and free text
+TABLE_SCHEMAS = {
+    "purchase_orders": {
+        "PO_NUMBER": "string",
+        "FOURNISSEUR": "category",
+        "DEPARTEMENT": "category",
+        "MONTANT_EUR": "float64",
+        "QUANTITE": "Int32",
+        "DATE": "datetime64[ns]",
+        "TYPE_ACHAT": "category",
+        "STATUT": "category",
+    },
+    "payment_terms": {
+        "FOURNISSEUR": "category",
+        "OLD_DAYS": "float32",
+        "NEW_DAYS": "float32",
+        "TURNOVER_EUR": "float64",
+        "DIVISION": "category",
+        "CONDITION_PAIEMENT": "category",
+        "DELAI_PAIEMENT": "float32",
+    },
+    "contracts": {
+        "CONTRAT": "string",
+        "FOURNISSEUR": "category",
+        "DATE_EXPIRATION": "datetime64[ns]",
+        "MONTANT_MAD": "float64",
+        "RESPONSABLE_EMAIL": "category",
+    },
+}
+
+
+def decode_column(series, dtype):
+    if dtype == "category":
+        return series.astype("category")
+    if dtype == "string":
+        return series.astype("string")
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(series, errors="coerce").astype(dtype)
+    numeric = pd.to_numeric(series, errors="coerce")
+    try:
+        return numeric.astype(dtype)
+    except (TypeError, ValueError):
+        return numeric.astype("float64")
+
+
+# Decode a raw table into its declared schema, returning a new DataFrame
+def apply_schema(df, table_name):
+    schema = TABLE_SCHEMAS[table_name]
+    return df.assign(**{col: decode_column(df[col], dtype) for col, dtype in schema.items() if col in df.columns})
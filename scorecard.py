@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+# Columns of the supplier scorecard, in display order
+SCORECARD_COLUMNS = ["FOURNISSEUR", "MONTANT_EUR", "QUANTITE", "PO_COUNT", "Taux_Pending", "TICKET_MOYEN", "NEW_DAYS"]
+
+# Metrics plotted on the supplier comparison radar: (scorecard column, axis label)
+RADAR_METRICS = {
+    "MONTANT_EUR": "Montant",
+    "QUANTITE": "Quantité",
+    "Taux_Pending": "Taux Pending",
+    "NEW_DAYS": "Délai Paiement",
+}
+
+
+# Per-supplier metrics in one grouped pass over PO rows or rollup cube rows (anything with
+# FOURNISSEUR, STATUT, MONTANT_EUR, QUANTITE and an optional COUNT per row), joined with the
+# payment days of payment_terms
+def supplier_scorecard(df_po, df_pt):
+    counts = df_po["COUNT"] if "COUNT" in df_po else pd.Series(1, index=df_po.index)
+    grouped = (
+        pd.DataFrame({
+            "FOURNISSEUR": df_po["FOURNISSEUR"],
+            "MONTANT_EUR": df_po["MONTANT_EUR"],
+            "QUANTITE": df_po["QUANTITE"],
+            "PO_COUNT": counts,
+            "PENDING": counts.where(df_po["STATUT"] == "En attente", 0),
+        })
+        .groupby("FOURNISSEUR", observed=True)
+        .sum()
+    )
+    scorecard = grouped[grouped["PO_COUNT"] > 0].reset_index()
+    scorecard["Taux_Pending"] = scorecard["PENDING"] / scorecard["PO_COUNT"] * 100
+    scorecard["TICKET_MOYEN"] = scorecard["MONTANT_EUR"] / scorecard["PO_COUNT"]
+
+    payment_days = df_pt.groupby("FOURNISSEUR", observed=True)["NEW_DAYS"].mean()
+    scorecard["NEW_DAYS"] = scorecard["FOURNISSEUR"].astype(str).map(payment_days.rename(index=str)).astype("float64")
+    return scorecard[SCORECARD_COLUMNS]
+
+
+# Min-max scale the given columns to [0, 1] across the rows of the scorecard
+def normalize_scores(scorecard, columns):
+    values = scorecard[columns].to_numpy(dtype="float64")
+    low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+    scaled = scorecard.copy()
+    scaled[columns] = (values - low) / (high - low + 1e-6)
+    return scaled
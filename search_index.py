@@ -0,0 +1,173 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Longest gram indexed: queries up to this many bytes are answered by their gram's postings
+# alone, longer ones by intersecting the postings of their grams and checking the candidates
+NGRAM = 4
+
+# Postings covering more than this fraction of the vocabulary are kept as packed bitmaps
+DENSE_FRACTION = 1 / 32
+
+# Text columns searched by the global search box
+SEARCH_COLUMNS = {
+    "purchase_orders": ["PO_NUMBER", "FOURNISSEUR", "DEPARTEMENT", "TYPE_ACHAT", "STATUT"],
+    "payment_terms": ["FOURNISSEUR", "DIVISION", "CONDITION_PAIEMENT"],
+    "contracts": ["CONTRAT", "FOURNISSEUR", "RESPONSABLE_EMAIL"],
+}
+
+
+# Lower-case and strip accents so "Materiel" matches "Matériel"
+def normalize(text):
+    text = str(text)
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+# Postings of the distinct n-byte grams of every term, as (sorted gram codes, postings length of
+# each gram, term ids of all the postings end to end). The terms are laid end to end in buffer,
+# term_of gives the term of each byte and start the offset of each term. Terms hold no NUL byte,
+# so the codes of longer grams are greater and never collide with shorter ones.
+def _gram_postings(buffer, term_of, start, lengths, n):
+    positions = np.flatnonzero(np.arange(len(buffer)) - start[term_of] <= lengths[term_of] - n)
+    codes = np.zeros(len(positions), dtype=np.int64)
+    for k in range(n):
+        codes = (codes << 8) | buffer[positions + k]
+    keys = np.sort((codes << 31) | term_of[positions])
+    del positions, codes
+    keys = keys[np.diff(keys, prepend=-1) != 0]
+    grams = keys >> 31
+    bounds = np.flatnonzero(np.diff(grams, prepend=-1))
+    return grams[bounds], np.diff(np.append(bounds, len(grams))), (keys & 0x7FFFFFFF).astype(np.int32)
+
+
+def _gram_code(gram):
+    return int.from_bytes(gram, "big")
+
+
+# Search index over the text columns of one table, built once per data load. Distinct values
+# are normalized into a shared vocabulary of UTF-8 terms, indexed by all their grams of 1 to
+# NGRAM bytes, so that every query is a substring query whatever its length. Matches on the
+# vocabulary are projected back to rows through each column's category codes.
+class SearchIndex:
+    def __init__(self, df, columns):
+        self.size = len(df)
+        vocabulary = []
+        vocabulary_ids = {}
+        self.columns = {}
+        for col in columns:
+            values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype("category")
+            ids = np.empty(len(values.cat.categories), dtype=np.int64)
+            for i, value in enumerate(values.cat.categories):
+                term = normalize(value).replace("\0", "").encode()
+                if term not in vocabulary_ids:
+                    vocabulary_ids[term] = len(vocabulary)
+                    vocabulary.append(term)
+                ids[i] = vocabulary_ids[term]
+            self.columns[col] = (ids, values.cat.codes.to_numpy())
+
+        # Term ids in order of length, so that each power-of-two width of the candidate check
+        # arrays holds a range of ids
+        lengths = np.fromiter(map(len, vocabulary), dtype=np.int64, count=len(vocabulary))
+        order = np.argsort(lengths, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.columns = {col: (rank[ids], codes) for col, (ids, codes) in self.columns.items()}
+        vocabulary = [vocabulary[i] for i in order]
+        lengths = lengths[order]
+        self.terms = len(vocabulary)
+
+        self.buckets = []
+        first = 0
+        while first < self.terms:
+            width = 1 << max(int(lengths[first]) - 1, 0).bit_length()
+            last = int(np.searchsorted(lengths, width, side="right"))
+            self.buckets.append((first, np.array(vocabulary[first:last], dtype=f"S{width}")))
+            first = last
+
+        buffer = np.frombuffer(b"".join(vocabulary), dtype=np.uint8)
+        term_of = np.repeat(np.arange(self.terms, dtype=np.int32), lengths)
+        start = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        codes, counts, ids = map(np.concatenate, zip(*(_gram_postings(buffer, term_of, start, lengths, n) for n in range(1, NGRAM + 1))))
+        del buffer, term_of, vocabulary
+
+        bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        dense = counts > self.terms * DENSE_FRACTION
+        self.dense = {}
+        for code, first, count in zip(codes[dense], bounds[dense], counts[dense]):
+            bitmap = np.zeros(self.terms, dtype=bool)
+            bitmap[ids[first:first + count]] = True
+            self.dense[int(code)] = np.packbits(bitmap)
+        self.codes = codes[~dense]
+        self.ids = ids[np.repeat(~dense, counts)]
+        self.starts = np.concatenate(([0], np.cumsum(counts[~dense])))
+
+    # Postings of one gram: sorted term ids, a packed bitmap over the vocabulary, or None
+    def _postings(self, gram):
+        code = _gram_code(gram)
+        if code in self.dense:
+            return self.dense[code]
+        i = np.searchsorted(self.codes, code)
+        if i == len(self.codes) or self.codes[i] != code:
+            return None
+        return self.ids[self.starts[i]:self.starts[i + 1]]
+
+    # Sorted ids of the candidate terms holding needle, checked on the terms themselves
+    def _check(self, candidates, needle):
+        found = []
+        firsts = [first for first, _ in self.buckets] + [self.terms]
+        for (first, terms), lo, hi in zip(self.buckets, np.searchsorted(candidates, firsts[:-1]), np.searchsorted(candidates, firsts[1:])):
+            if lo < hi and terms.itemsize >= len(needle):
+                ids = candidates[lo:hi]
+                found.append(ids[np.strings.find(terms[ids - first], needle) >= 0])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int32)
+
+    # Vocabulary mask of the terms holding needle (bytes)
+    def _terms(self, needle):
+        grams = {needle} if len(needle) <= NGRAM else {needle[i:i + NGRAM] for i in range(len(needle) - NGRAM + 1)}
+        postings = [self._postings(gram) for gram in grams]
+        if any(ids is None for ids in postings):
+            return np.zeros(self.terms, dtype=bool)
+        bitmaps = [ids for ids in postings if ids.dtype == np.uint8]
+        lists = sorted((ids for ids in postings if ids.dtype != np.uint8), key=len)
+        if lists:
+            candidates = lists[0]
+            for ids in lists[1:]:
+                # Postings are sorted: probe the candidates with a binary search instead of a merge
+                positions = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+                candidates = candidates[ids[positions] == candidates]
+            for bitmap in bitmaps:
+                candidates = candidates[(bitmap[candidates >> 3] >> (7 - (candidates & 7))) & 1 == 1]
+        else:
+            matched = np.bitwise_and.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0]
+            if len(needle) <= NGRAM:
+                return np.unpackbits(matched, count=self.terms).view(bool)
+            candidates = np.flatnonzero(np.unpackbits(matched, count=self.terms))
+        # Grams can all match without the needle being contiguous: confirm on the candidates
+        if len(needle) > NGRAM:
+            candidates = self._check(candidates, needle)
+        matched = np.zeros(self.terms, dtype=bool)
+        matched[candidates] = True
+        return matched
+
+    def _rows(self, matched):
+        mask = np.zeros(self.size, dtype=bool)
+        for ids, codes in self.columns.values():
+            hit = matched[ids]
+            if not hit.any():
+                continue
+            # code -1 (missing value) maps to the trailing False slot
+            mask |= np.append(hit, False)[codes]
+            if mask.all():
+                break
+        return mask
+
+    # Row mask of the rows holding every word of the query in at least one text column
+    def mask(self, query):
+        mask = np.ones(self.size, dtype=bool)
+        for word in normalize(query).split():
+            mask &= self._rows(self._terms(word.replace("\0", "").encode()))
+        return mask
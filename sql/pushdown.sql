@@ -0,0 +1,122 @@
+-- Server-side filters and rollups used by data_source.SupabaseSource.
+--
+-- Apply once, in the Supabase SQL editor or with psql:
+--   psql "$DATABASE_URL" -f sql/pushdown.sql
+-- The identifiers are those of the CSV fixtures (quoted, upper case) and "DATE" is assumed to be
+-- a date column; adapt them if the tables were created otherwise. The functions run with the
+-- caller's rights, so row-level security still applies.
+
+-- Indexes of the columns the sidebar filters push down
+create index if not exists purchase_orders_date on purchase_orders ("DATE");
+create index if not exists purchase_orders_departement on purchase_orders ("DEPARTEMENT");
+create index if not exists purchase_orders_fournisseur on purchase_orders ("FOURNISSEUR");
+create index if not exists payment_terms_fournisseur on payment_terms ("FOURNISSEUR");
+
+-- Monthly rollup of all POs (rollup.build_cube), for PostgREST queries over whole months, e.g.
+--   /po_monthly_rollup?DEPARTEMENT=eq.HP&MONTH=gte.2024-01-01&select=MONTH,MONTANT_EUR
+create or replace view po_monthly_rollup as
+select
+    date_trunc('month', "DATE")::date as "MONTH",
+    "DEPARTEMENT", "FOURNISSEUR", "TYPE_ACHAT", "STATUT",
+    coalesce(sum("MONTANT_EUR"), 0)::float8 as "MONTANT_EUR",
+    coalesce(sum("QUANTITE"), 0)::float8 as "QUANTITE",
+    count(*) as "COUNT"
+from purchase_orders
+where "DATE" is not null
+    and "DEPARTEMENT" is not null and "FOURNISSEUR" is not null
+    and "TYPE_ACHAT" is not null and "STATUT" is not null
+group by 1, 2, 3, 4, 5;
+
+-- POs of a sidebar selection: a null array or date leaves that filter out. Like the rollup cube,
+-- POs with a missing date or dimension are never selected.
+create or replace function po_selection(
+    fournisseurs text[] default null,
+    departements text[] default null,
+    types_achat text[] default null,
+    statuts text[] default null,
+    date_from date default null,
+    date_to date default null
+)
+returns setof purchase_orders
+language sql stable
+as $$
+    select *
+    from purchase_orders
+    where "DATE" is not null
+        and "DEPARTEMENT" is not null and "FOURNISSEUR" is not null
+        and "TYPE_ACHAT" is not null and "STATUT" is not null
+        and (fournisseurs is null or "FOURNISSEUR" = any(fournisseurs))
+        and (departements is null or "DEPARTEMENT" = any(departements))
+        and (types_achat is null or "TYPE_ACHAT" = any(types_achat))
+        and (statuts is null or "STATUT" = any(statuts))
+        and (date_from is null or "DATE" >= date_from)
+        and (date_to is null or "DATE" <= date_to)
+$$;
+
+-- Monthly rollup of a selection, in one JSON array so that db-max-rows does not cut it
+create or replace function po_rollup(
+    fournisseurs text[] default null,
+    departements text[] default null,
+    types_achat text[] default null,
+    statuts text[] default null,
+    date_from date default null,
+    date_to date default null
+)
+returns json
+language sql stable
+as $$
+    select coalesce(json_agg(cube), '[]'::json)
+    from (
+        select
+            date_trunc('month', "DATE")::date as "MONTH",
+            "DEPARTEMENT", "FOURNISSEUR", "TYPE_ACHAT", "STATUT",
+            coalesce(sum("MONTANT_EUR"), 0)::float8 as "MONTANT_EUR",
+            coalesce(sum("QUANTITE"), 0)::float8 as "QUANTITE",
+            count(*) as "COUNT"
+        from po_selection(fournisseurs, departements, types_achat, statuts, date_from, date_to)
+        group by 1, 2, 3, 4, 5
+    ) cube
+$$;
+
+-- Supplier scorecard (scorecard.supplier_scorecard) of a PO selection, with the mean new
+-- payment days of the selected payment terms, in one JSON array
+create or replace function supplier_scorecard(
+    fournisseurs text[] default null,
+    departements text[] default null,
+    types_achat text[] default null,
+    statuts text[] default null,
+    date_from date default null,
+    date_to date default null,
+    pt_fournisseurs text[] default null,
+    divisions text[] default null
+)
+returns json
+language sql stable
+as $$
+    with po as (
+        select
+            "FOURNISSEUR",
+            coalesce(sum("MONTANT_EUR"), 0)::float8 as "MONTANT_EUR",
+            coalesce(sum("QUANTITE"), 0)::float8 as "QUANTITE",
+            count(*) as "PO_COUNT",
+            count(*) filter (where "STATUT" = 'En attente') as "PENDING"
+        from po_selection(fournisseurs, departements, types_achat, statuts, date_from, date_to)
+        group by 1
+    ), pt as (
+        select "FOURNISSEUR", avg("NEW_DAYS")::float8 as "NEW_DAYS"
+        from payment_terms
+        where "FOURNISSEUR" is not null and "DIVISION" is not null
+            and (pt_fournisseurs is null or "FOURNISSEUR" = any(pt_fournisseurs))
+            and (divisions is null or "DIVISION" = any(divisions))
+        group by 1
+    )
+    select coalesce(json_agg(scorecard), '[]'::json)
+    from (
+        select
+            po."FOURNISSEUR", po."MONTANT_EUR", po."QUANTITE", po."PO_COUNT",
+            100.0 * po."PENDING" / po."PO_COUNT" as "Taux_Pending",
+            po."MONTANT_EUR" / po."PO_COUNT" as "TICKET_MOYEN",
+            pt."NEW_DAYS"
+        from po left join pt on pt."FOURNISSEUR" = po."FOURNISSEUR"
+    ) scorecard
+$$;
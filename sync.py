@@ -0,0 +1,203 @@
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from loader import PAGE_SIZE, TABLE_COLUMNS, TABLE_KEYS, fetch_columns, fetch_pages, resolve_columns
+from schema import apply_schema
+
+# Local columnar snapshots of the Supabase tables
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", ".snapshots")
+
+# Column used as sync watermark when the table has one, otherwise the table key when it is a
+# single column; tables with neither are fully synced every time
+UPDATED_AT = "updated_at"
+
+# Seconds between two scans of the table keys on the server. The watermark only finds new and
+# updated rows, so on the delta path the keys are compared at most this often to drop the
+# snapshot rows deleted on the server (0 compares them on every sync)
+SYNC_RECONCILE_SECONDS = int(os.getenv("SYNC_RECONCILE_SECONDS", "3600"))
+
+
+def snapshot_paths(table_name, snapshot_dir=SNAPSHOT_DIR):
+    return (
+        os.path.join(snapshot_dir, f"{table_name}.parquet"),
+        os.path.join(snapshot_dir, f"{table_name}.json"),
+    )
+
+
+# Read a table snapshot and its sync metadata, or (None, None) when there is none yet
+def read_snapshot(table_name, snapshot_dir=SNAPSHOT_DIR):
+    data_path, meta_path = snapshot_paths(table_name, snapshot_dir)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None, None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return pd.read_parquet(data_path), meta
+
+
+# Write through a temporary file of its own in the same directory, then move it into place:
+# the dashboard and the alert runner may sync the same table at the same time
+def _write_atomic(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _write_json(path, meta):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+# Write the snapshot first and the metadata last, each through a temporary file
+def write_snapshot(table_name, df, meta, snapshot_dir=SNAPSHOT_DIR):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    data_path, meta_path = snapshot_paths(table_name, snapshot_dir)
+    _write_atomic(data_path, lambda path: df.to_parquet(path, index=False))
+    _write_atomic(meta_path, lambda path: _write_json(path, meta))
+
+
+# Keys of the rows on the server, as a MultiIndex over the key columns (remote names)
+def _server_keys(client, table_name, key, page_size):
+    records = [row for page in fetch_pages(client, table_name, key, key, page_size) for row in page]
+    return pd.MultiIndex.from_frame(pd.DataFrame.from_records(records, columns=key))
+
+
+# Bring the local snapshot of a table up to date, fetching only rows past the last watermark
+# (every row when the table has no usable watermark), and dropping the rows deleted on the server
+# when the keys are compared (see SYNC_RECONCILE_SECONDS). Returns (df, error, stats);
+# stats["delta"] holds the fetched rows and stats["previous"] the snapshot rows they replaced or
+# that were deleted, so derived structures built at stats["base_version"] can be patched to
+# stats["version"] instead of rebuilt.
+def sync_table(client, table_name, required_cols, page_size=PAGE_SIZE, snapshot_dir=SNAPSHOT_DIR):
+    start = time.perf_counter()
+    try:
+        actual_cols = fetch_columns(client, table_name)
+        mapping, error = resolve_columns(client, table_name, required_cols, actual_cols)
+        if error:
+            return pd.DataFrame(columns=required_cols), error, None
+        key_cols = TABLE_KEYS[table_name]
+        key = [mapping[col] for col in key_cols]
+        watermark_col = next((col for col in actual_cols if col.lower() == UPDATED_AT), None)
+        # Without updated_at, new rows are found by key only when the key is a single column
+        # (new rows get greater keys): a new division of a known supplier would be missed
+        incremental = watermark_col is not None or len(key) == 1
+        watermark_name = watermark_col or (key[0] if incremental else None)
+
+        snapshot, meta = read_snapshot(table_name, snapshot_dir)
+        if snapshot is not None and (meta.get("columns") != required_cols or meta.get("watermark_column") != watermark_name):
+            snapshot, meta = None, None
+        # A full sync rewrites the snapshot only when its content hash (the watermark) changed
+        known_watermark = meta["watermark"] if meta else None
+        if not incremental:
+            snapshot, meta = None, None
+
+        columns = list(mapping.values()) + ([watermark_col] if watermark_col else [])
+        filters = None
+        start_after = None
+        if snapshot is not None and watermark_col:
+            filters = lambda query: query.gt(watermark_col, meta["watermark"])
+        elif snapshot is not None:
+            start_after = [meta["watermark"]]
+
+        frames = [
+            pd.DataFrame.from_records(page)
+            for page in fetch_pages(client, table_name, columns, key, page_size, filters, start_after)
+        ]
+        delta = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+        if not incremental:
+            watermark = f"{int(pd.util.hash_pandas_object(delta, index=False).sum()):016x}"
+        elif not delta.empty:
+            watermark = delta[watermark_name].max()
+            watermark = watermark.item() if hasattr(watermark, "item") else watermark
+        else:
+            watermark = meta["watermark"] if meta else None
+        delta = delta.rename(columns={actual: col for col, actual in mapping.items()})[required_cols]
+
+        if snapshot is None:
+            df = delta
+            previous = delta.iloc[0:0]
+        elif delta.empty:
+            df = snapshot
+            previous = snapshot.iloc[0:0]
+        else:
+            # Rows are replaced by key: all the key columns, not just the first
+            replaced = pd.MultiIndex.from_frame(snapshot[key_cols]).isin(pd.MultiIndex.from_frame(delta[key_cols]))
+            previous = snapshot[replaced]
+            df = pd.concat([snapshot[~replaced], delta], ignore_index=True)
+
+        deleted = 0
+        reconciled_at = meta.get("reconciled_at", 0) if snapshot is not None else time.time()
+        if snapshot is not None and time.time() - reconciled_at >= SYNC_RECONCILE_SECONDS:
+            reconciled_at = time.time()
+            on_server = pd.MultiIndex.from_frame(df[key_cols]).isin(_server_keys(client, table_name, key, page_size))
+            deleted = int((~on_server).sum())
+            if deleted:
+                previous = pd.concat([previous, df[~on_server]], ignore_index=True)
+                df = df[on_server].reset_index(drop=True)
+
+        changed = snapshot is None or not delta.empty or deleted > 0 if incremental else watermark != known_watermark
+        new_meta = {
+            "columns": required_cols,
+            "watermark_column": watermark_name,
+            "watermark": watermark,
+            "rows": len(df),
+            "synced_at": pd.Timestamp.now(tz="UTC").isoformat(),
+            "reconciled_at": reconciled_at,
+        }
+        if changed:
+            write_snapshot(table_name, df, new_meta, snapshot_dir)
+        elif snapshot is not None and reconciled_at != meta.get("reconciled_at"):
+            _write_atomic(snapshot_paths(table_name, snapshot_dir)[1], lambda path: _write_json(path, new_meta))
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "mode": "full" if snapshot is None else "delta",
+            "rows": len(df),
+            "fetched": len(delta),
+            "deleted": deleted,
+            "seconds": elapsed,
+            "rows_per_sec": len(delta) / elapsed if elapsed > 0 else float("inf"),
+            "version": f"{watermark}:{len(df)}",
+            "base_version": f"{meta['watermark']}:{meta['rows']}" if meta else None,
+            "delta": delta,
+            "previous": previous,
+        }
+        return df, None, stats
+    except Exception as e:
+        return pd.DataFrame(columns=required_cols), f"⚠️ Erreur lors de la synchronisation de {table_name}: {str(e)}", None
+
+
+# Sync several tables concurrently, returning {table_name: (df, error, stats)}
+def sync_tables(client, tables=None, page_size=PAGE_SIZE, snapshot_dir=SNAPSHOT_DIR):
+    tables = tables or TABLE_COLUMNS
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        futures = {
+            name: executor.submit(sync_table, client, name, cols, page_size, snapshot_dir)
+            for name, cols in tables.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+# Sync all tables and decode them into their schema, returning {table_name: (df, error)} and sync stats
+def load_decoded_tables(client, tables=None, snapshot_dir=SNAPSHOT_DIR):
+    results = sync_tables(client, tables, snapshot_dir=snapshot_dir)
+    data = {}
+    for name, (df, error, _) in results.items():
+        if not error:
+            try:
+                df = apply_schema(df, name)
+            except Exception as e:
+                error = f"Erreur lors de la conversion des types de données : {str(e)}"
+        data[name] = (df, error)
+    stats = {name: stats for name, (_, _, stats) in results.items()}
+    return data, stats
@@ -1,29 +1,40 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from st_aggrid import AgGrid, GridOptionsBuilder
-import base64
-from io import BytesIO
-from sklearn.linear_model import LinearRegression
+from functools import partial
+import threading
 import numpy as np
-import sqlite3
-from pptx import Presentation
-from pptx.util import Inches
-from supabase import create_client, Client
 from dotenv import load_dotenv
+from alert_runner import last_run
+from alerts import (ALERT_RULES, ALERTS_TOP_N, FingerprintStore, alert_message, build_digests, collect_contract_reminders,
+                    collect_notifications, evaluate_alerts)
+from charts import collapse_tail, downsample, label_bars, render_mode
+from comments import CommentStore
+from data_source import create_source, narrowed
+from figure_cache import FigureCache, warm_renderer
+from filter_index import FilterIndex
+from forecast import FORECAST_COLUMNS, Forecasts
+from grid_source import PAGE_SIZES, GridSource
+from loader import TABLE_COLUMNS
+from mailer import MailDispatcher
+from payment_terms import HEATMAP_METRICS, PaymentTermsAnalytics
+from profiler import Profiler, is_admin, waterfall_figure
+from report import start_report
+from rollup import CubeStore, build_cube, slice_cube
+from scorecard import RADAR_METRICS, normalize_scores, supplier_scorecard
+from search_index import SEARCH_COLUMNS, SearchIndex
 import uuid
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Check required environment variables
-required_env_vars = ["SUPABASE_URL", "SUPABASE_KEY"]
+# Check required environment variables: Supabase is optional with the local data backend
+# (DATA_BACKEND=local), which then also skips the Supabase login
+local_backend = os.getenv("DATA_BACKEND", "supabase") == "local"
+supabase_available = all(os.getenv(var) for var in ["SUPABASE_URL", "SUPABASE_KEY"])
+required_env_vars = [] if local_backend else ["SUPABASE_URL", "SUPABASE_KEY"]
 missing_vars = [var for var in required_env_vars if not os.getenv(var)]
 if missing_vars:
     st.error(f"Variables d'environnement manquantes : {', '.join(missing_vars)}. Vérifiez le fichier .env.")
@@ -33,14 +44,34 @@ if missing_vars:
 smtp_vars = ["SMTP_SERVER", "SMTP_PORT", "SMTP_USERNAME", "SMTP_PASSWORD", "NOTIFICATION_RECIPIENT"]
 smtp_available = all(os.getenv(var) for var in smtp_vars)
 
-# Initialize Supabase client
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Heavy optional subsystems (scikit-learn, python-pptx, st_aggrid, plotly.graph_objects, supabase)
+# are imported on first use so the login screen does not pay for them; see benchmarks/import_time.py
+
+# Supabase client of this session, created on first use (login or logout)
+def get_supabase():
+    if "supabase_client" not in st.session_state:
+        from supabase import create_client
+        st.session_state.supabase_client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return st.session_state.supabase_client
+
+# Data source shared by the data loads: Supabase, or the local DuckDB copy of the table files
+@st.cache_resource
+def get_data_source():
+    return create_source()
 
 # Configure page
 st.set_page_config(page_title="Indirect Purchases Dashboard", layout="wide", initial_sidebar_state="expanded")
 
+# Per-session rerun profiler; spans are recorded only while an admin enables it (or PROFILER_ENABLED=1)
+if "profiler" not in st.session_state:
+    st.session_state.profiler = Profiler()
+profiler = st.session_state.profiler
+profiler.start_rerun(
+    enabled=os.getenv("PROFILER_ENABLED") == "1" or st.session_state.get("profiler_enabled", False),
+    trace_memory=st.session_state.get("profiler_memory", False),
+)
+profiler.mark("setup")
+
 # Define theme styles
 def set_theme(theme):
     if theme == "Dark":
@@ -340,6 +371,13 @@ if "logged_in" not in st.session_state:
     st.session_state.user_email = None
     st.session_state.login_message = None
 
+# Without Supabase there is nobody to authenticate against: the local backend runs as a local user
+if not supabase_available and not st.session_state.logged_in:
+    st.session_state.logged_in = True
+    st.session_state.user_email = os.getenv("LOCAL_USER_EMAIL", "local")
+
+profiler.mark("login")
+
 # Login screen
 with st.sidebar:
     st.subheader(t["login"])
@@ -353,7 +391,7 @@ with st.sidebar:
             else:
                 with st.spinner("Connexion en cours..."):
                     try:
-                        response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+                        response = get_supabase().auth.sign_in_with_password({"email": email, "password": password})
                         if response.user:
                             st.session_state.logged_in = True
                             st.session_state.user_email = email
@@ -364,9 +402,9 @@ with st.sidebar:
                         login_placeholder.error(f"Erreur de connexion : {str(e)}")
     else:
         login_placeholder.write(f"Connecté en tant que : {st.session_state.user_email}")
-        if st.button(t["logout_button"], key="logout_btn"):
+        if supabase_available and st.button(t["logout_button"], key="logout_btn"):
             try:
-                supabase.auth.sign_out()
+                get_supabase().auth.sign_out()
                 st.session_state.logged_in = False
                 st.session_state.user_email = None
                 login_placeholder.success("Déconnexion réussie !")
@@ -391,250 +429,430 @@ color_schemes = {
     "Inferno": px.colors.sequential.Inferno
 }
 
-# Send email function
-def send_email(subject, body, to_email):
+# Background mail dispatcher shared by all sessions, keeping SMTP connections open between messages
+@st.cache_resource
+def get_mail_dispatcher():
+    return MailDispatcher.from_env()
+
+# Queue (subject, body, to_email) messages for background delivery and keep the batch handle in the session
+def send_emails(messages, key, on_sent=None):
     if not smtp_available:
         st.error("⚠️ Configuration SMTP manquante. Vérifiez le fichier .env.")
-        return False
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = os.getenv("SMTP_PORT")
-    smtp_username = os.getenv("SMTP_USERNAME")
-    smtp_password = os.getenv("SMTP_PASSWORD")
-
-    msg = MIMEMultipart()
-    msg['From'] = smtp_username
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        with smtplib.SMTP(smtp_server, int(smtp_port)) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.sendmail(smtp_username, to_email, msg.as_string())
-        return True
-    except Exception as e:
-        st.error(f"⚠️ Erreur lors de l'envoi de l'email : {str(e)}")
-        return False
-
-# Check alerts function
+        return None
+    batch = get_mail_dispatcher().submit(messages, on_sent)
+    st.session_state[key] = batch
+    return batch
+
+# Show the delivery progress of the last mail batch queued under key. Only a batch still sending
+# is refreshed by the timed fragment, so nothing polls once it is done
+def show_mail_batch(key):
+    batch = st.session_state.get(key)
+    if batch is None:
+        return
+    if batch.done:
+        mail_batch_status(batch)
+    else:
+        poll_mail_batch(key)
+
+def mail_batch_status(batch):
+    st.progress(batch.progress, text=f"{batch.sent}/{batch.total} email(s) envoyé(s), {batch.failed} échec(s)")
+    for error in batch.errors[:5]:
+        st.caption(f"⚠️ {error}")
+
+# Refreshed every 2 s while the batch sends; once it is done the app reruns, which renders the
+# final status without the timer
+@st.fragment(run_every=2)
+def poll_mail_batch(key):
+    batch = st.session_state[key]
+    if batch.done:
+        st.rerun()
+    mail_batch_status(batch)
+
+# Check alerts function: one digest per recipient, skipping alerts already sent within the dedup window
 def check_alerts(df_contracts, df_po, df_pt):
     if not smtp_available:
         st.error("⚠️ Destinataire des notifications ou configuration SMTP non configuré dans le fichier .env.")
-        return 0
-    to_email = os.getenv("NOTIFICATION_RECIPIENT")
-    notifications_sent = 0
-
-    for index, row in df_contracts.iterrows():
-        days_left = (row["DATE_EXPIRATION"] - pd.Timestamp.now()).days
-        if days_left <= 60:
-            subject = f"Alert: {t['status']} {row['CONTRAT']} Expiration"
-            body = (
-                f"{t['status']} {row['CONTRAT']} with {row['FOURNISSEUR']} "
-                f"expires in {days_left} days.\n"
-                f"Expiration date: {row['DATE_EXPIRATION'].strftime('%d/%m/%Y')}\n"
-                f"Amount: {row['MONTANT_MAD']:,.2f} MAD"
-            )
-            if send_email(subject, body, to_email):
-                notifications_sent += 1
-
-    for index, row in df_po[df_po["STATUT"] == "En attente"].iterrows():
-        subject = f"Alert: {t['status']} {row['PO_NUMBER']} Pending"
-        body = (
-            f"{t['status']} {row['PO_NUMBER']} with {row['FOURNISSEUR']} "
-            f"is pending validation.\n"
-            f"Amount: {row['MONTANT_EUR']:,.2f} EUR\n"
-            f"Department: {row['DEPARTEMENT']}\n"
-            f"Date: {row['DATE'].strftime('%d/%m/%Y')}"
-        )
-        if send_email(subject, body, to_email):
-            notifications_sent += 1
-
-    for index, row in df_pt[df_pt["DELAI_PAIEMENT"] > 0].iterrows():
-        subject = f"Alert: {t['status']} {row['FOURNISSEUR']} Payment Delay"
-        body = (
-            f"{t['status']} {row['FOURNISSEUR']} has a payment delay of {row['DELAI_PAIEMENT']} days.\n"
-            f"Turnover: {row['TURNOVER_EUR']:,.2f} EUR\n"
-            f"Division: {row['DIVISION']}"
-        )
-        if send_email(subject, body, to_email):
-            notifications_sent += 1
-
-    return notifications_sent
-
-# Load data from Supabase
-@st.cache_data
-def load_data(table_name, required_cols, _placeholder=None):
-    try:
-        response = supabase.table(table_name).select("*").execute()
-        if not response.data:
-            return pd.DataFrame(columns=required_cols), f"Aucune donnée trouvée dans la table {table_name}. Vérifiez si la table existe et contient des données."
-        df = pd.DataFrame(response.data)
-        actual_cols = df.columns.tolist()
-        column_mapping = {
-            'po_number': 'PO_NUMBER',
-            'fournisseur': 'FOURNISSEUR',
-            'departement': 'DEPARTEMENT',
-            'montant_eur': 'MONTANT_EUR',
-            'quantite': 'QUANTITE',
-            'date': 'DATE',
-            'type_achat': 'TYPE_ACHAT',
-            'statut': 'STATUT',
-            'old_days': 'OLD_DAYS',
-            'new_days': 'NEW_DAYS',
-            'turnover_eur': 'TURNOVER_EUR',
-            'division': 'DIVISION',
-            'condition_paiement': 'CONDITION_PAIEMENT',
-            'delai_paiement': 'DELAI_PAIEMENT',
-            'contrat': 'CONTRAT',
-            'date_expiration': 'DATE_EXPIRATION',
-            'montant_mad': 'MONTANT_MAD',
-            'responsable_email': 'RESPONSABLE_EMAIL'
-        }
-        df.rename(columns={k: v for k, v in column_mapping.items() if k in df.columns}, inplace=True)
-        missing_cols = [col for col in required_cols if col not in df.columns and col.lower() not in [c.lower() for c in df.columns]]
-        if missing_cols:
-            return pd.DataFrame(columns=required_cols), f"Colonnes manquantes dans {table_name}: {missing_cols}. Colonnes disponibles: {actual_cols}"
-        for col in df.columns:
-            for req_col in required_cols:
-                if col.lower() == req_col.lower() and col != req_col:
-                    df.rename(columns={col: req_col}, inplace=True)
-        return df, None
-    except Exception as e:
-        return pd.DataFrame(columns=required_cols), f"⚠️ Erreur lors du chargement de {table_name}: {str(e)}"
-
-# Export Plotly figure as PNG
+        return None
+    notifications = collect_notifications(df_contracts, df_po, df_pt, os.getenv("NOTIFICATION_RECIPIENT"))
+    return send_digests(notifications, "alerts_batch")
+
+# Queue one digest email per recipient for the notifications not sent recently
+def send_digests(notifications, key):
+    store = FingerprintStore()
+    digests = build_digests(notifications, store)
+    messages = [(subject, body, recipient, attachments) for subject, body, recipient, _, attachments in digests]
+    return send_emails(messages, key, on_sent=lambda i: store.mark(digests[i][2], digests[i][3]))
+
+# Load all tables from the data source, returning {table_name: (df, error)} and load stats
+@st.cache_data(ttl=int(os.getenv("SYNC_TTL_SECONDS", "300")))
+def load_data():
+    return get_data_source().load_tables(TABLE_COLUMNS)
+
+# Build the sidebar filter indexes once per data version
+@st.cache_resource(max_entries=2)
+def build_filter_indexes(_df_po, _df_pt, _df_contracts, version):
+    return (
+        FilterIndex(_df_po, ["FOURNISSEUR", "DEPARTEMENT", "TYPE_ACHAT", "STATUT"], "DATE"),
+        FilterIndex(_df_pt, ["FOURNISSEUR", "DIVISION"]),
+        FilterIndex(_df_contracts, ["FOURNISSEUR"], "DATE_EXPIRATION"),
+    )
+
+# Build the global search indexes on first search, once per data version
+@st.cache_resource(max_entries=2)
+def build_search_indexes(_df_po, _df_pt, _df_contracts, version):
+    return (
+        SearchIndex(_df_po, SEARCH_COLUMNS["purchase_orders"]),
+        SearchIndex(_df_pt, SEARCH_COLUMNS["payment_terms"]),
+        SearchIndex(_df_contracts, SEARCH_COLUMNS["contracts"]),
+    )
+
+# Monthly PO rollup cube shared by all sessions, patched on delta syncs
+@st.cache_resource
+def get_cube_store():
+    return CubeStore()
+
+# Supplier scorecard of the filtered data, computed once per data version and filter state
+@st.cache_data(max_entries=16)
+def supplier_scorecards(_po_rollup, _df_pt_filtered, version, filter_state):
+    return supplier_scorecard(_po_rollup, _df_pt_filtered)
+
+# Tab 1 rollups (monthly cube and supplier scorecard) aggregated by the data source, by the
+# sql/pushdown.sql functions on Supabase or in DuckDB, and the PO detail of a narrowed selection
+# filtered by it (PostgREST filters or SQL), rather than from the in-memory tables: only the
+# selected rows and the aggregates are transferred. On by default with Supabase, which needs
+# sql/pushdown.sql applied; SERVER_ROLLUPS=0 or 1 overrides it.
+server_rollups = os.getenv("SERVER_ROLLUPS", "1" if get_data_source().name == "supabase" else "0") == "1"
+
+@st.cache_data(max_entries=16)
+def server_rows(table_name, _selections, _period, version, filter_state):
+    return get_data_source().rows(table_name, _selections, _period)
+
+@st.cache_data(max_entries=16)
+def server_rollup(_selections, _period, version, filter_state):
+    return get_data_source().rollup(None, _selections, _period)
+
+@st.cache_data(max_entries=16)
+def server_scorecard(_selections, _period, _pt_selections, version, filter_state):
+    return get_data_source().scorecard(_selections, _period, _pt_selections)
+
+# Forecasts of every department and supplier series, fitted in one batch per data version and filter state
+@st.cache_resource(max_entries=4)
+def fit_forecasts(_po_rollup, version, filter_state):
+    return {column: Forecasts(_po_rollup, column) for column in FORECAST_COLUMNS}
+
+# Server-side sources of the PO and contract detail grids, built once per data version
+@st.cache_resource(max_entries=2)
+def build_grid_sources(_df_po, _df_contracts, version):
+    return (
+        GridSource(_df_po, ["PO_NUMBER", "FOURNISSEUR", "DEPARTEMENT", "MONTANT_EUR", "QUANTITE", "DATE", "STATUT"]),
+        GridSource(_df_contracts, list(_df_contracts.columns)),
+    )
+
+# Rendered figure cache shared by the PNG and PowerPoint exports; warms the renderer up in the background
+@st.cache_resource
+def get_figure_cache():
+    threading.Thread(target=warm_renderer, daemon=True, name="kaleido-warmup").start()
+    return FigureCache()
+
+# Tab 2 payment-terms analytics, computed once per data version and filter state
+@st.cache_resource(max_entries=8)
+def payment_terms_analytics(_df_pt_filtered, version, filter_state):
+    return PaymentTermsAnalytics(_df_pt_filtered)
+
+# Export Plotly figure as PNG, rendered only when the download is clicked
 def export_plotly_figure(fig, filename):
     if fig is not None:
-        img_bytes = fig.to_image(format="png")
-        b64 = base64.b64encode(img_bytes).decode()
-        href = f'<a href="data:image/png;base64,{b64}" download="{filename}.png">{t["export_chart"]}</a>'
-        st.markdown(href, unsafe_allow_html=True)
+        st.download_button(t["export_chart"], data=lambda: get_figure_cache().render(fig), file_name=f"{filename}.png",
+                           mime="image/png", key=f"export_{filename}")
     else:
         st.warning("⚠️ Aucune figure disponible pour l'exportation.")
 
-# Export to PowerPoint
-def export_to_ppt(df_po_filtered, df_pt_filtered, df_contracts_filtered, figs):
-    prs = Presentation()
-    
-    slide_layout = prs.slide_layouts[5]
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = t["po_header"]
-    
-    for fig_name, fig in figs.items():
-        if fig:
-            img_bytes = fig.to_image(format="png")
-            img_stream = BytesIO(img_bytes)
-            slide.shapes.add_picture(img_stream, Inches(1), Inches(1.5), width=Inches(8))
-    
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = t["po_tab"]
-    rows, cols = df_po_filtered.shape
-    table = slide.shapes.add_table(rows + 1, cols, Inches(1), Inches(1.5), Inches(8), Inches(3)).table
-    for j, col in enumerate(df_po_filtered.columns):
-        table.cell(0, j).text = col
-    for i in range(rows):
-        for j in range(cols):
-            table.cell(i + 1, j).text = str(df_po_filtered.iloc[i, j])
-    
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = t["pt_tab"]
-    rows, cols = df_pt_filtered.shape
-    table = slide.shapes.add_table(rows + 1, cols, Inches(1), Inches(1.5), Inches(8), Inches(3)).table
-    for j, col in enumerate(df_pt_filtered.columns):
-        table.cell(0, j).text = col
-    for i in range(rows):
-        for j in range(cols):
-            table.cell(i + 1, j).text = str(df_pt_filtered.iloc[i, j])
-    
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = t["contract_tab"]
-    rows, cols = df_contracts_filtered.shape
-    table = slide.shapes.add_table(rows + 1, cols, Inches(1), Inches(1.5), Inches(8), Inches(3)).table
-    for j, col in enumerate(df_contracts_filtered.columns):
-        table.cell(0, j).text = col
-    for i in range(rows):
-        for j in range(cols):
-            table.cell(i + 1, j).text = str(df_contracts_filtered.iloc[i, j])
-    
-    ppt_buffer = BytesIO()
-    prs.save(ppt_buffer)
-    ppt_buffer.seek(0)
-    return ppt_buffer
-
-# Function to get SQLite connection
-def get_sqlite_connection():
-    conn = sqlite3.connect('comments.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS comments (
-            id TEXT,
-            type TEXT,
-            comment TEXT,
-            user TEXT,
-            timestamp TEXT
-        )
-    ''')
-    conn.commit()
-    return conn, cursor
+# Show the progress of the PowerPoint report building in the background, then its download button.
+# Only a job still building is refreshed by the timed fragment, so nothing polls once it is done
+def show_report_job():
+    job = st.session_state.get("ppt_job")
+    if job is None:
+        return
+    if not job.done:
+        poll_report_job()
+        return
+    if job.error:
+        st.error(f"Échec de la génération du rapport : {job.error}")
+        return
+    st.download_button(label=t["export_ppt"], data=job.result, file_name="dashboard_report.pptx",
+                       mime="application/vnd.openxmlformats-officedocument.presentationml.presentation", key="download_ppt")
+    st.caption(" | ".join(f"{stage} {seconds:.2f} s" for stage, seconds in job.timings.items()))
+    if job.skipped:
+        st.warning(f"Graphique(s) non exporté(s) : {', '.join(job.skipped)}")
+
+# Refreshed every 2 s while the report builds; once it is done the app reruns, which renders the
+# download button without the timer
+@st.fragment(run_every=2)
+def poll_report_job():
+    job = st.session_state["ppt_job"]
+    if job.done:
+        st.rerun()
+    st.info(f"Génération du rapport : {job.stage}…")
+
+# Only the open tab is rendered, and Streamlit drops the state of the widgets it did not render:
+# the tab widgets start from a copy of their value kept under kept_<key>, refreshed by keep() on
+# every render, so that they come back as they were left when their tab is reopened
+def kept(key, default=None):
+    return st.session_state.get(f"kept_{key}", default)
+
+def keep(key, value):
+    st.session_state[f"kept_{key}"] = value
+    return value
+
+# Index of the kept value of key among options, default when there is none or it is gone
+def kept_index(key, options, default=0):
+    options = list(options)
+    value = kept(key)
+    return options.index(value) if value in options else default
+
+# Kept selection of a multiselect, restricted to its current options
+def kept_selection(key, options, default):
+    selection = kept(key)
+    return default if selection is None else [value for value in selection if value in set(options)]
+
+# Detail grid paged on the server: sort, text filter and page are picked with widgets and
+# only the rows of the current page are sent to AgGrid. comments=(type, id column) adds a
+# comment count column for the rows of the page.
+def show_grid(source, mask, key, editable, comments=None):
+    from st_aggrid import AgGrid, GridOptionsBuilder
+
+    sort_col, order_col, filter_col, text_col = st.columns([2, 1, 2, 2])
+    sort_options, text_columns = [None] + source.columns, source.text_columns()
+    sort_by = keep(f"{key}_sort", sort_col.selectbox("Trier par", sort_options, index=kept_index(f"{key}_sort", sort_options),
+                                                     format_func=lambda col: col or "—", key=f"{key}_sort"))
+    ascending = keep(f"{key}_order", order_col.radio("Ordre", ["↑", "↓"], index=kept_index(f"{key}_order", ["↑", "↓"]), horizontal=True, key=f"{key}_order")) == "↑"
+    filter_by = keep(f"{key}_filter_col", filter_col.selectbox("Filtrer la colonne", text_columns, index=kept_index(f"{key}_filter_col", text_columns), key=f"{key}_filter_col"))
+    filter_text = keep(f"{key}_filter", text_col.text_input("Contient", kept(f"{key}_filter", ""), key=f"{key}_filter"))
+    if filter_by and filter_text:
+        mask = mask & source.text_mask(filter_by, filter_text)
+
+    size_col, page_col = st.columns([1, 3])
+    page_size = keep(f"{key}_page_size", size_col.selectbox("Lignes par page", PAGE_SIZES, index=kept_index(f"{key}_page_size", PAGE_SIZES), key=f"{key}_page_size"))
+    total = int(np.count_nonzero(mask))
+    pages = max(1, -(-total // page_size))
+    page = keep(f"{key}_page", page_col.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, value=min(kept(f"{key}_page", 1), pages), step=1, key=f"{key}_page"))
+    page = min(page, pages)
+    df_page, total = source.page(mask, sort_by, ascending, page, page_size)
+    st.caption(f"Lignes {(page - 1) * page_size + min(1, len(df_page)):,}–{(page - 1) * page_size + len(df_page):,} sur {total:,}")
+    if comments is not None:
+        item_type, id_column = comments
+        counts = get_comment_store().counts(item_type, df_page[id_column])
+        df_page = df_page.assign(**{"💬": df_page[id_column].astype(str).map(counts).fillna(0).astype(int).to_numpy()})
+
+    gb = GridOptionsBuilder.from_dataframe(df_page)
+    gb.configure_side_bar()
+    gb.configure_default_column(editable=editable, groupable=True, sortable=False)
+    grid_options = gb.build()
+    AgGrid(df_page, gridOptions=grid_options, height=400, width='100%', fit_columns_on_grid_load=True, key=f"{key}_aggrid")
+
+# Last reruns of this session: totals per stage and the waterfall of one rerun
+def show_profiler_panel(profiler):
+    with st.expander(f"Profilage des {len(profiler.runs)} derniers reruns ⏱️"):
+        runs = list(profiler.runs)[::-1]
+        st.dataframe(pd.DataFrame([
+            {"rerun": run["run"], "fragment": run.get("fragment"), "début": run["started_at"], "total (ms)": run["seconds"] * 1000, "complet": run["complete"],
+             "pic processus (MB)": None if run["peak_bytes"] is None else run["peak_bytes"] / 1e6,
+             **{span["name"]: span["seconds"] * 1000 for span in run["spans"] if span["depth"] == 0}}
+            for run in runs
+        ]).round(1), hide_index=True, use_container_width=True)
+        selected = st.selectbox("Rerun", runs, format_func=lambda run: f"#{run['run']} ({run['seconds'] * 1000:.0f} ms)", key="profiler_run")
+        st.plotly_chart(waterfall_figure(selected), use_container_width=True)
+        st.download_button("Exporter les spans (JSON)", data=profiler.to_json(), file_name="profile.json", mime="application/json", key="profiler_export")
+
+# Comment store shared by all sessions of this process
+@st.cache_resource
+def get_comment_store():
+    return CommentStore()
+
+# Tab 1 figures, built from the monthly rollup cube; the PowerPoint export rebuilds them too
+def po_by_dept_figure(po_rollup, view, colors):
+    if view == "Monthly":
+        df_grouped = po_rollup.groupby(["MONTH", "DEPARTEMENT"], observed=True).agg({"MONTANT_EUR": "sum"}).reset_index()
+        df_grouped = df_grouped.assign(DATE=df_grouped["MONTH"].dt.strftime("%Y-%m"))
+        df_grouped = collapse_tail(df_grouped, "DEPARTEMENT", "MONTANT_EUR", keys=["DATE"])
+        fig = label_bars(px.bar(df_grouped, x="DATE", y="MONTANT_EUR", color="DEPARTEMENT", title=t["po_by_dept"], text="MONTANT_EUR", color_discrete_sequence=colors))
+        fig.update_layout(xaxis_title="Month", yaxis_title="Amount (EUR)")
+    else:
+        df_grouped = po_rollup.groupby("DEPARTEMENT", observed=True).agg({"MONTANT_EUR": "sum"}).reset_index()
+        df_grouped = collapse_tail(df_grouped, "DEPARTEMENT", "MONTANT_EUR")
+        fig = label_bars(px.bar(df_grouped, x="DEPARTEMENT", y="MONTANT_EUR", color="DEPARTEMENT", title=t["po_by_dept"], text="MONTANT_EUR", color_discrete_sequence=colors))
+        fig.update_layout(showlegend=False)
+    return fig
+
+def amount_figure(po_rollup, view, colors):
+    if view == "Monthly":
+        df_monthly = po_rollup.groupby("MONTH").agg({"MONTANT_EUR": "sum", "QUANTITE": "sum"}).reset_index()
+        df_monthly = df_monthly.assign(DATE=df_monthly["MONTH"].dt.strftime("%Y-%m"))
+        fig = label_bars(px.bar(df_monthly, x="DATE", y="MONTANT_EUR", title=t["amount_quantity"], text="MONTANT_EUR", color_discrete_sequence=colors))
+        fig.update_layout(height=400)
+    else:
+        df_annual = po_rollup.groupby(po_rollup["MONTH"].dt.year.rename("DATE")).agg({"MONTANT_EUR": "sum", "QUANTITE": "sum"}).reset_index()
+        fig = label_bars(px.bar(df_annual, x="DATE", y="MONTANT_EUR", title=t["amount_quantity"], text="MONTANT_EUR", color_discrete_sequence=colors))
+    return fig
+
+def status_figure(po_rollup, colors):
+    status_counts = po_rollup.groupby("STATUT", observed=True)["COUNT"].sum().reset_index(name="Count")
+    return px.pie(status_counts, names="STATUT", values="Count", title=t["status_dist"], hole=0.4, color_discrete_sequence=colors)
+
+def type_figure(po_rollup, colors):
+    type_counts = po_rollup.groupby("TYPE_ACHAT", observed=True)["COUNT"].sum().reset_index(name="Count")
+    return px.pie(type_counts, names="TYPE_ACHAT", values="Count", title=t["type_dist"], hole=0.4, color_discrete_sequence=colors)
+
+# Dashboard sections with their own widgets, as fragments: changing one of those widgets reruns
+# only its section, with the inputs passed by the last full rerun, instead of the whole script
+@st.fragment
+def po_by_dept_section(po_rollup, colors):
+    with profiler.fragment("tab1.po_by_dept", 1):
+        st.subheader(t["po_by_dept"])
+        view = keep("po_view", st.radio("View", ["Monthly", "Annual"], index=kept_index("po_view", ["Monthly", "Annual"]), key="po_view"))
+        st.plotly_chart(po_by_dept_figure(po_rollup, view, colors), use_container_width=True)
+
+@st.fragment
+def amount_section(po_rollup, colors):
+    with profiler.fragment("tab1.amount", 1):
+        st.subheader(t["amount_quantity"])
+        view = keep("amount_view", st.radio("View", ["Monthly", "Annual"], index=kept_index("amount_view", ["Monthly", "Annual"]), key="amount_view"))
+        st.plotly_chart(amount_figure(po_rollup, view, colors), use_container_width=True)
+
+@st.fragment
+def forecast_section(po_rollup, df_po_filtered, version, filter_state, colors):
+    with profiler.fragment("tab1.forecast", 1):
+        st.subheader(t["forecast"])
+        predict_by = keep("predict_by", st.selectbox(t["predict_by"], ["Département", "Fournisseur"], index=kept_index("predict_by", ["Département", "Fournisseur"]), key="predict_by"))
+        column_name = "DEPARTEMENT" if predict_by == "Département" else "FOURNISSEUR"
+        options = df_po_filtered[column_name].unique()
+        selected_option = keep("predict_option", st.selectbox(f"Sélectionner {predict_by.lower()}", options, index=kept_index("predict_option", options), key="predict_option"))
+
+        forecasts = fit_forecasts(po_rollup, version, filter_state)[column_name]
+        df_predict = forecasts.history(selected_option)
+        if df_predict.empty:
+            st.warning(f"Aucune donnée disponible pour {predict_by.lower()} '{selected_option}'. Vérifiez les filtres ou les données dans Supabase.")
+            return
+        st.write(f"Données agrégées pour {predict_by.lower()} '{selected_option}' :")
+        st.dataframe(df_predict)
+
+        df_line = downsample(df_predict, "DATE", "MONTANT_EUR")
+        fig_predict = px.line(df_line, x="DATE", y="MONTANT_EUR", title=f"{t['forecast']} pour {selected_option}", render_mode=render_mode(len(df_line)), color_discrete_sequence=colors)
+        df_projection = forecasts.projection(selected_option)
+        if df_projection.empty:
+            st.info(f"Données insuffisantes pour une prévision (un seul mois disponible pour {predict_by.lower()} '{selected_option}'). Affichage des données existantes.")
+        else:
+            fig_predict.add_scatter(x=df_projection["DATE"], y=df_projection["MONTANT_EUR"], mode="lines+markers", name="Prévision", line=dict(dash="dash"))
+        st.plotly_chart(fig_predict, use_container_width=True)
+
+# get_scorecard returns the supplier scorecard of the filters, computed (and cached) on first use
+@st.fragment
+def scorecard_section(df_po_filtered, get_scorecard):
+    with profiler.fragment("tab1.scorecard", 1):
+        st.subheader(t["compare_fournisseurs"])
+        suppliers = df_po_filtered["FOURNISSEUR"].unique()
+        fournisseurs_compare = keep("compare_fournisseurs", st.multiselect(t["supplier"], suppliers, default=kept_selection("compare_fournisseurs", suppliers, suppliers[:3]), key="compare_fournisseurs"))
+        if not fournisseurs_compare:
+            return
+        scorecard = get_scorecard()
+        df_compare = scorecard[scorecard["FOURNISSEUR"].isin(fournisseurs_compare)]
+        df_compare = normalize_scores(df_compare, list(RADAR_METRICS))
+
+        import plotly.graph_objects as go
+        fig_radar = go.Figure()
+        for row in df_compare.itertuples(index=False):
+            r = [getattr(row, col) for col in RADAR_METRICS]
+            fig_radar.add_trace(go.Scatterpolar(
+                r=r + r[:1],
+                theta=list(RADAR_METRICS.values()) + [RADAR_METRICS["MONTANT_EUR"]],
+                fill="toself",
+                name=row.FOURNISSEUR
+            ))
+        fig_radar.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 1])), showlegend=True, title=t["compare_fournisseurs"])
+        st.plotly_chart(fig_radar, use_container_width=True)
+
+@st.fragment
+def reorder_section(po_rollup, df_po_filtered):
+    with profiler.fragment("tab1.reorder", 1):
+        st.subheader(t["reorder"])
+        types = df_po_filtered["TYPE_ACHAT"].unique()
+        type_achat_reorder = keep("reorder_type", st.multiselect(t["purchase_type"], types, default=kept_selection("reorder_type", types, []), key="reorder_type"))
+        threshold = keep("reorder_threshold", st.number_input(t["reorder_threshold"], min_value=0, value=kept("reorder_threshold", 100), step=10, key="reorder_threshold"))
+        if type_achat_reorder:
+            df_reorder = po_rollup[po_rollup["TYPE_ACHAT"].isin(type_achat_reorder)].groupby("TYPE_ACHAT", observed=True).agg({"QUANTITE": "sum"}).reset_index()
+            df_reorder["Suggestion"] = df_reorder["QUANTITE"].apply(lambda x: t["reorder"] if x < threshold else "Stock suffisant")
+            st.dataframe(df_reorder)
+
+@st.fragment
+def po_grid_section(po_mask, df_po, df_pt, df_contracts, version):
+    with profiler.fragment("tab1.grid", 1):
+        st.subheader("Purchase Orders Details")
+        search_term = keep("po_search", st.text_input("Search PO", kept("po_search", ""), key="po_search"))
+        grid_mask = po_mask
+        if search_term:
+            po_search = build_search_indexes(df_po, df_pt, df_contracts, version)[0]
+            grid_mask = po_mask & po_search.mask(search_term)
+        show_grid(build_grid_sources(df_po, df_contracts, version)[0], grid_mask, "po_grid", editable=True, comments=("PO", "PO_NUMBER"))
+
+@st.fragment
+def contracts_grid_section(contracts_mask, df_po, df_contracts, version):
+    with profiler.fragment("tab3.grid", 1):
+        show_grid(build_grid_sources(df_po, df_contracts, version)[1], contracts_mask, "contracts_grid", editable=False, comments=("Contract", "CONTRAT"))
+
+# Comments of one item type; keys are the widget keys of the item id, text, user and add button
+@st.fragment
+def comments_section(item_type, id_label, keys, span_name):
+    with profiler.fragment(span_name, 1):
+        id_key, text_key, user_key, button_key = keys
+        st.subheader(t["comments"])
+        selected_id = keep(id_key, st.text_input(id_label, kept(id_key, ""), key=id_key))
+        comment = keep(text_key, st.text_area(t["comment_text"], kept(text_key, ""), key=text_key))
+        user = keep(user_key, st.text_input(t["comment_user"], kept(user_key, ""), key=user_key))
+        if st.button(t["add_comment"], key=button_key):
+            if comment and user and selected_id:
+                get_comment_store().add(item_type, selected_id, comment, user)
+                st.success("Commentaire ajouté !")
+        st.dataframe(get_comment_store().list(item_type, selected_id), use_container_width=True)
+
+@st.fragment
+def heatmap_section(pt_analytics, colors):
+    with profiler.fragment("tab2.heatmap", 1):
+        st.subheader(t["heatmap"])
+        metric = keep("heatmap_metric", st.selectbox("Métrique", list(HEATMAP_METRICS), index=kept_index("heatmap_metric", HEATMAP_METRICS), key="heatmap_metric"))
+        st.plotly_chart(pt_analytics.heatmap_figure(metric, t["heatmap"], colors), use_container_width=True)
 
 # Main configuration
 st.title(t["title"])
 
+profiler.mark("load_data")
+
 # Load data from Supabase
 loading_placeholder = st.empty()
 with st.spinner(t["loading"]):
-    loading_placeholder.write("Chargement de la table purchase_orders...")
-    df_po, error_po = load_data("purchase_orders", ["PO_NUMBER", "FOURNISSEUR", "DEPARTEMENT", "MONTANT_EUR", "QUANTITE", "DATE", "TYPE_ACHAT", "STATUT"])
-    if error_po:
-        loading_placeholder.error(error_po)
-        st.stop()
-    loading_placeholder.write("Colonnes trouvées dans purchase_orders: " + str(df_po.columns.tolist()))
-
-    loading_placeholder.write("Chargement de la table payment_terms...")
-    df_pt, error_pt = load_data("payment_terms", ["FOURNISSEUR", "OLD_DAYS", "NEW_DAYS", "TURNOVER_EUR", "DIVISION", "CONDITION_PAIEMENT", "DELAI_PAIEMENT"])
-    if error_pt:
-        loading_placeholder.error(error_pt)
-        st.stop()
-    loading_placeholder.write("Colonnes trouvées dans payment_terms: " + str(df_pt.columns.tolist()))
-
-    loading_placeholder.write("Chargement de la table contracts...")
-    df_contracts, error_contracts = load_data("contracts", ["CONTRAT", "FOURNISSEUR", "DATE_EXPIRATION", "MONTANT_MAD", "RESPONSABLE_EMAIL"])
-    if error_contracts:
-        loading_placeholder.error(error_contracts)
-        st.stop()
-    loading_placeholder.write("Colonnes trouvées dans contracts: " + str(df_contracts.columns.tolist()))
+    loading_placeholder.write("Chargement des tables purchase_orders, payment_terms et contracts...")
+    data, load_stats = load_data()
+    for table_name, (_, error) in data.items():
+        if error:
+            loading_placeholder.error(error)
+            st.stop()
+    df_po, _ = data["purchase_orders"]
+    df_pt, _ = data["payment_terms"]
+    df_contracts, _ = data["contracts"]
 
     # Clear the loading placeholder
     loading_placeholder.empty()
 
-    # Convert data types
-    try:
-        df_po["DATE"] = pd.to_datetime(df_po["DATE"], errors='coerce')
-        df_po["MONTANT_EUR"] = pd.to_numeric(df_po["MONTANT_EUR"], errors='coerce')
-        df_po["QUANTITE"] = pd.to_numeric(df_po["QUANTITE"], errors='coerce')
-        df_po["STATUT"] = df_po["STATUT"].astype(str)
-        df_po["TYPE_ACHAT"] = df_po["TYPE_ACHAT"].astype(str)
-
-        df_pt["NEW_DAYS"] = pd.to_numeric(df_pt["NEW_DAYS"], errors='coerce')
-        df_pt["OLD_DAYS"] = pd.to_numeric(df_pt["OLD_DAYS"], errors='coerce')
-        df_pt["TURNOVER_EUR"] = pd.to_numeric(df_pt["TURNOVER_EUR"], errors='coerce')
-        df_pt["DELAI_PAIEMENT"] = pd.to_numeric(df_pt["DELAI_PAIEMENT"], errors='coerce')
-
-        df_contracts["DATE_EXPIRATION"] = pd.to_datetime(df_contracts["DATE_EXPIRATION"], errors='coerce')
-        df_contracts["MONTANT_MAD"] = pd.to_numeric(df_contracts["MONTANT_MAD"], errors='coerce')
-
-        if df_po["DATE"].isna().any() or df_contracts["DATE_EXPIRATION"].isna().any():
-            st.warning("Certaines dates n'ont pas pu être converties. Vérifiez le format des données dans Supabase.")
-    except Exception as e:
-        st.error(f"Erreur lors de la conversion des types de données : {str(e)}")
-        st.stop()
+    # Data types are decoded once at load time (see schema.py)
+    if df_po["DATE"].isna().any() or df_contracts["DATE_EXPIRATION"].isna().any():
+        st.warning("Certaines dates n'ont pas pu être converties. Vérifiez le format des données dans Supabase.")
 
 st.success(t["data_loaded"])
+st.caption(" | ".join(
+    f"{name}: {stats['fetched']:,}/{stats['rows']:,} lignes ({stats['mode']}) en {stats['seconds']:.2f} s ({stats['rows_per_sec']:,.0f} lignes/s)"
+    for name, stats in load_stats.items()
+))
+
+profiler.mark("summary")
 
 # Global summary
 st.markdown('<div class="section">', unsafe_allow_html=True)
@@ -651,402 +869,274 @@ with col_sum3:
     st.metric(t["total_turnover"], f"{total_turnover:,.2f} EUR")
 st.markdown('</div>', unsafe_allow_html=True)
 
+profiler.mark("filter_indexes")
+
+# Filter indexes, rebuilt only when the synced data changes
+data_version = "|".join(f"{name}={stats['version']}" for name, stats in load_stats.items())
+po_index, pt_index, contracts_index = build_filter_indexes(df_po, df_pt, df_contracts, data_version)
+
+profiler.mark("sidebar")
+
 # Sidebar
 with st.sidebar:
     st.header(t["filters_alerts"])
     
+    if st.button("Rafraîchir les données 🔄", key="refresh_data_btn"):
+        load_data.clear()
+        st.rerun()
+
     global_search = st.text_input("Recherche globale 🔍", key="global_search")
     
     st.subheader(t["po_filters"])
-    fournisseur_po = st.multiselect(t["supplier"] + " (PO)", df_po["FOURNISSEUR"].unique(), default=df_po["FOURNISSEUR"].unique())
-    departement = st.multiselect(t["department"], df_po["DEPARTEMENT"].unique(), default=df_po["DEPARTEMENT"].unique())
-    type_achat = st.multiselect(t["purchase_type"], df_po["TYPE_ACHAT"].unique(), default=df_po["TYPE_ACHAT"].unique())
-    statut = st.multiselect(t["status"], df_po["STATUT"].unique(), default=df_po["STATUT"].unique())
-    period = st.slider(t["period"], df_po["DATE"].min().to_pydatetime(), df_po["DATE"].max().to_pydatetime(), 
-                       (df_po["DATE"].min().to_pydatetime(), df_po["DATE"].max().to_pydatetime()))
+    fournisseur_po = st.multiselect(t["supplier"] + " (PO)", po_index.values("FOURNISSEUR"), default=po_index.values("FOURNISSEUR"))
+    departement = st.multiselect(t["department"], po_index.values("DEPARTEMENT"), default=po_index.values("DEPARTEMENT"))
+    type_achat = st.multiselect(t["purchase_type"], po_index.values("TYPE_ACHAT"), default=po_index.values("TYPE_ACHAT"))
+    statut = st.multiselect(t["status"], po_index.values("STATUT"), default=po_index.values("STATUT"))
+    period = st.slider(t["period"], po_index.date_min.to_pydatetime(), po_index.date_max.to_pydatetime(), 
+                       (po_index.date_min.to_pydatetime(), po_index.date_max.to_pydatetime()))
 
     if not all([fournisseur_po, departement, type_achat, statut]):
         st.warning(t["select_filter"])
 
     st.subheader(t["pt_filters"])
-    fournisseur_pt = st.multiselect(t["supplier"] + " (PT)", df_pt["FOURNISSEUR"].unique(), default=df_pt["FOURNISSEUR"].unique())
-    division = st.multiselect(t["division"], df_pt["DIVISION"].unique(), default=df_pt["DIVISION"].unique())
+    fournisseur_pt = st.multiselect(t["supplier"] + " (PT)", pt_index.values("FOURNISSEUR"), default=pt_index.values("FOURNISSEUR"))
+    division = st.multiselect(t["division"], pt_index.values("DIVISION"), default=pt_index.values("DIVISION"))
     period_pt = st.slider(t["period"], datetime(2023, 1, 1), datetime(2025, 12, 31), (datetime(2023, 1, 1), datetime(2025, 12, 31)))
 
     if not all([fournisseur_pt, division]):
         st.warning(t["select_filter"])
 
     st.subheader(t["contract_filters"])
-    fournisseur_contract = st.multiselect(t["supplier"] + " (Contrats)", df_contracts["FOURNISSEUR"].unique(), default=df_contracts["FOURNISSEUR"].unique())
-    expiration_period = st.slider(t["period"], df_contracts["DATE_EXPIRATION"].min().to_pydatetime(), 
-                                  df_contracts["DATE_EXPIRATION"].max().to_pydatetime(), 
-                                  (df_contracts["DATE_EXPIRATION"].min().to_pydatetime(), df_contracts["DATE_EXPIRATION"].max().to_pydatetime()))
+    fournisseur_contract = st.multiselect(t["supplier"] + " (Contrats)", contracts_index.values("FOURNISSEUR"), default=contracts_index.values("FOURNISSEUR"))
+    expiration_period = st.slider(t["period"], contracts_index.date_min.to_pydatetime(), 
+                                  contracts_index.date_max.to_pydatetime(), 
+                                  (contracts_index.date_min.to_pydatetime(), contracts_index.date_max.to_pydatetime()))
 
     st.subheader(t["alerts"])
     seuil_alert = st.number_input(t["amount_threshold"], min_value=0.0, value=100000.0, step=1000.0)
     seuil_delai = st.number_input(t["delay_threshold"], min_value=0, value=5, step=1)
 
-    df_po_filtered = df_po[
-        (df_po["FOURNISSEUR"].isin(fournisseur_po)) &
-        (df_po["DEPARTEMENT"].isin(departement)) &
-        (df_po["TYPE_ACHAT"].isin(type_achat)) &
-        (df_po["STATUT"].isin(statut)) &
-        (df_po["DATE"].between(period[0], period[1]))
-    ]
-    df_pt_filtered = df_pt[
-        (df_pt["FOURNISSEUR"].isin(fournisseur_pt)) &
-        (df_pt["DIVISION"].isin(division))
-    ]
-    df_contracts_filtered = df_contracts[
-        (df_contracts["FOURNISSEUR"].isin(fournisseur_contract)) &
-        (df_contracts["DATE_EXPIRATION"].between(expiration_period[0], expiration_period[1]))
-    ]
+    profiler.mark("sidebar.filters", 1)
+    po_filters = {
+        "FOURNISSEUR": fournisseur_po,
+        "DEPARTEMENT": departement,
+        "TYPE_ACHAT": type_achat,
+        "STATUT": statut,
+    }
+    pt_filters = {
+        "FOURNISSEUR": fournisseur_pt,
+        "DIVISION": division,
+    }
+    # Hashable signature of the filters shaping df_po_filtered and df_pt_filtered
+    filter_state = (
+        tuple((col, tuple(selected)) for col, selected in po_filters.items()), period,
+        tuple((col, tuple(selected)) for col, selected in pt_filters.items()), global_search,
+    )
+
+    # The filters that leave values out, as pushed down to the data source
+    po_selections = narrowed(po_filters, {col: po_index.values(col) for col in po_filters})
+    pt_selections = narrowed(pt_filters, {col: pt_index.values(col) for col in pt_filters})
+
+    po_mask = po_index.mask(po_filters, period)
+    pt_mask = pt_index.mask(pt_filters)
+    contracts_mask = contracts_index.mask({
+        "FOURNISSEUR": fournisseur_contract,
+    }, expiration_period)
 
     if global_search:
-        df_po_filtered = df_po_filtered[df_po_filtered.apply(lambda row: global_search.lower() in str(row).lower(), axis=1)]
-        df_pt_filtered = df_pt_filtered[df_pt_filtered.apply(lambda row: global_search.lower() in str(row).lower(), axis=1)]
-        df_contracts_filtered = df_contracts_filtered[df_contracts_filtered.apply(lambda row: global_search.lower() in str(row).lower(), axis=1)]
-
-    alerts_displayed = False
-    for index, row in df_po_filtered.iterrows():
-        if row["MONTANT_EUR"] > seuil_alert:
-            st.warning(f"⚠️ {row['FOURNISSEUR']}: {row['MONTANT_EUR']:,.2f} EUR exceeds threshold", icon="🚨")
-            alerts_displayed = True
-        if row["STATUT"] == "En attente":
-            st.warning(f"⚠️ Order {row['PO_NUMBER']} pending", icon="⏳")
-            alerts_displayed = True
-    for index, row in df_contracts_filtered.iterrows():
-        days_left = (row["DATE_EXPIRATION"] - pd.Timestamp.now()).days
-        if days_left <= 60:
-            st.warning(f"⚠️ Contract {row['CONTRAT']} expires in {days_left} days", icon="📅")
-            alerts_displayed = True
-    for index, row in df_pt_filtered.iterrows():
-        if row["DELAI_PAIEMENT"] > seuil_delai:
-            st.warning(f"⚠️ {row['FOURNISSEUR']}: {row['DELAI_PAIEMENT']} days payment delay", icon="⏰")
-            alerts_displayed = True
-    if not alerts_displayed:
+        with profiler.span("sidebar.global_search"):
+            po_search, pt_search, contracts_search = build_search_indexes(df_po, df_pt, df_contracts, data_version)
+            po_mask &= po_search.mask(global_search)
+            pt_mask &= pt_search.mask(global_search)
+            contracts_mask &= contracts_search.mask(global_search)
+
+    # A narrowed PO selection is read from the data source; the full load still feeds the option
+    # lists, the summary and the global search
+    po_period = None if period == (po_index.date_min.to_pydatetime(), po_index.date_max.to_pydatetime()) else period
+    if server_rollups and not global_search and (po_selections or po_period is not None):
+        df_po_filtered = server_rows("purchase_orders", po_selections, po_period, data_version, filter_state[:2])
+    else:
+        df_po_filtered = df_po[po_mask]
+    df_pt_filtered = df_pt[pt_mask]
+    df_contracts_filtered = df_contracts[contracts_mask]
+
+    profiler.mark("sidebar.alerts", 1)
+    alerts_df = evaluate_alerts(df_po_filtered, df_contracts_filtered, df_pt_filtered, seuil_alert, seuil_delai)
+    for rule, (icon, label) in ALERT_RULES.items():
+        rule_alerts = alerts_df[alerts_df["rule"] == rule]
+        if rule_alerts.empty:
+            continue
+        top = rule_alerts.head(ALERTS_TOP_N)
+        st.warning(f"**{label} : {len(rule_alerts)}**\n\n" + "\n".join(f"- {alert_message(*row)}" for row in top.itertuples(index=False)), icon=icon)
+        if len(rule_alerts) > ALERTS_TOP_N:
+            with st.expander(f"Afficher plus ({len(rule_alerts) - ALERTS_TOP_N})"):
+                st.dataframe(rule_alerts.iloc[ALERTS_TOP_N:][["key", "fournisseur", "value"]], hide_index=True, use_container_width=True)
+    if alerts_df.empty:
         st.info(t["no_alerts"])
 
     if smtp_available and st.button(t["check_alerts"], key="check_alerts_btn"):
-        notifications_sent = check_alerts(df_contracts_filtered, df_po_filtered, df_pt_filtered)
-        if notifications_sent > 0:
-            st.success(f"{notifications_sent} {t['alerts'].lower()}(s) sent.")
+        batch = check_alerts(df_contracts_filtered, df_po_filtered, df_pt_filtered)
+        if batch is not None and batch.total > 0:
+            st.success(f"{batch.total} digest(s) queued.")
         else:
             st.info("Aucune alerte à notifier.")
+    show_mail_batch("alerts_batch")
+
+    runner_entry = last_run()
+    if runner_entry is not None:
+        st.caption(
+            f"Dernière vérification automatique : {runner_entry['finished_at']} ({runner_entry['status']}) — "
+            f"{runner_entry.get('alerts', 0)} alerte(s), {runner_entry.get('sent', 0)} digest(s) envoyé(s)"
+        )
 
     st.subheader(t["help"])
     st.write(t["help_text"])
 
-# Main tabs
-tab1, tab2, tab3 = st.tabs([t["po_tab"], t["pt_tab"], t["contract_tab"]])
+# Monthly rollup cube of the filtered POs, sliced by tab 1 and the PowerPoint export
+def filtered_rollup():
+    # Every chart slices the monthly rollup cube instead of rescanning the POs
+    if global_search:
+        return build_cube(df_po_filtered)
+    if server_rollups:
+        return server_rollup(po_selections, period, data_version, filter_state)
+    return slice_cube(get_cube_store().get(df_po, load_stats["purchase_orders"], build=get_data_source().rollup), po_filters, period, df_po_filtered)
+
+profiler.mark("tab1")
+
+# Main tabs: only the selected tab is computed, selecting another one reruns the script
+tab1, tab2, tab3 = st.tabs([t["po_tab"], t["pt_tab"], t["contract_tab"]], key="main_tab", on_change="rerun")
+colors = color_schemes[color_scheme]
 
 with tab1:
     st.markdown('<div class="section">', unsafe_allow_html=True)
     st.subheader(t["po_header"])
-    if df_po_filtered.empty:
+    if tab1.open and df_po_filtered.empty:
         st.warning(t["no_data"])
-    else:
-        fig_po_count = None
-        fig_status = None
-        fig_type = None
-        fig_monthly = None
-        fig_annual = None
+    elif tab1.open:
+        profiler.mark("tab1.rollup", 1)
+        po_rollup = filtered_rollup()
 
         col1, col2 = st.columns(2)
         with col1:
-            st.subheader(t["po_by_dept"])
-            view = st.radio("View", ["Monthly", "Annual"], key="po_view")
-            if view == "Monthly":
-                df_grouped = df_po_filtered.groupby([df_po_filtered["DATE"].dt.to_period("M").astype(str), "DEPARTEMENT"]).agg({"MONTANT_EUR": "sum"}).reset_index()
-                fig_po_count = px.bar(df_grouped, x="DATE", y="MONTANT_EUR", color="DEPARTEMENT", title=t["po_by_dept"], text="MONTANT_EUR", color_discrete_sequence=color_schemes[color_scheme])
-                fig_po_count.update_traces(textposition="outside")
-                fig_po_count.update_layout(xaxis_title="Month", yaxis_title="Amount (EUR)")
-            else:
-                df_grouped = df_po_filtered.groupby("DEPARTEMENT").agg({"MONTANT_EUR": "sum"}).reset_index()
-                fig_po_count = px.bar(df_grouped, x="DEPARTEMENT", y="MONTANT_EUR", color="DEPARTEMENT", title=t["po_by_dept"], text="MONTANT_EUR", color_discrete_sequence=color_schemes[color_scheme])
-                fig_po_count.update_traces(textposition="outside")
-                fig_po_count.update_layout(showlegend=False)
-            st.plotly_chart(fig_po_count, use_container_width=True)
-
+            po_by_dept_section(po_rollup, colors)
         with col2:
-            st.subheader(t["amount_quantity"])
-            view = st.radio("View", ["Monthly", "Annual"], key="amount_view")
-            if view == "Monthly":
-                df_monthly = df_po_filtered.groupby(df_po_filtered["DATE"].dt.to_period("M").astype(str)).agg({"MONTANT_EUR": "sum", "QUANTITE": "sum"}).reset_index()
-                fig_monthly = px.bar(df_monthly, x="DATE", y="MONTANT_EUR", title=t["amount_quantity"], text="MONTANT_EUR", color_discrete_sequence=color_schemes[color_scheme])
-                fig_monthly.update_traces(textposition="outside")
-                fig_monthly.update_layout(height=400)
-            else:
-                df_annual = df_po_filtered.groupby(df_po_filtered["DATE"].dt.year).agg({"MONTANT_EUR": "sum", "QUANTITE": "sum"}).reset_index()
-                fig_annual = px.bar(df_annual, x="DATE", y="MONTANT_EUR", title=t["amount_quantity"], text="MONTANT_EUR", color_discrete_sequence=color_schemes[color_scheme])
-                fig_annual.update_traces(textposition="outside")
-            fig_to_plot = fig_monthly if view == "Monthly" else fig_annual
-            st.plotly_chart(fig_to_plot, use_container_width=True)
+            amount_section(po_rollup, colors)
 
+        profiler.mark("tab1.distributions", 1)
         st.subheader(t["status_dist"])
-        status_counts = df_po_filtered.groupby("STATUT").size().reset_index(name="Count")
-        fig_status = px.pie(status_counts, names="STATUT", values="Count", title=t["status_dist"], hole=0.4, color_discrete_sequence=color_schemes[color_scheme])
-        st.plotly_chart(fig_status, use_container_width=True)
-
+        st.plotly_chart(status_figure(po_rollup, colors), use_container_width=True)
         st.subheader(t["type_dist"])
-        fig_type = px.pie(df_po_filtered.groupby("TYPE_ACHAT").size().reset_index(name="Count"), names="TYPE_ACHAT", values="Count", title=t["type_dist"], hole=0.4, color_discrete_sequence=color_schemes[color_scheme])
-        st.plotly_chart(fig_type, use_container_width=True)
+        st.plotly_chart(type_figure(po_rollup, colors), use_container_width=True)
 
-        st.subheader(t["forecast"])
-        predict_by = st.selectbox(t["predict_by"], ["Département", "Fournisseur"], key="predict_by")
-        if predict_by == "Département":
-            options = df_po_filtered["DEPARTEMENT"].unique()
-        else:
-            options = df_po_filtered["FOURNISSEUR"].unique()
-        selected_option = st.selectbox(f"Sélectionner {predict_by.lower()}", options, key="predict_option")
-
-        column_name = "DEPARTEMENT" if predict_by == "Département" else "FOURNISSEUR"
-        df_predict = df_po_filtered[df_po_filtered[column_name] == selected_option]
-
-        if df_predict.empty:
-            st.warning(f"Aucune donnée disponible pour {predict_by.lower()} '{selected_option}'. Vérifiez les filtres ou les données dans Supabase.")
+        forecast_section(po_rollup, df_po_filtered, data_version, filter_state, colors)
+        if server_rollups and not global_search:
+            get_scorecard = partial(server_scorecard, po_selections, period, pt_selections, data_version, filter_state)
         else:
-            df_predict = df_predict.groupby(df_predict["DATE"].dt.to_period("M")).agg({"MONTANT_EUR": "sum"}).reset_index()
-            df_predict["DATE"] = df_predict["DATE"].dt.to_timestamp()
-
-            if df_predict["DATE"].isna().any():
-                st.error(f"Données de date invalides pour {predict_by.lower()} '{selected_option}'. Vérifiez le format des dates dans la table 'purchase_orders'.")
-            else:
-                df_predict["time_index"] = (df_predict["DATE"] - df_predict["DATE"].min()).dt.days
-
-                st.write(f"Données agrégées pour {predict_by.lower()} '{selected_option}' :")
-                st.dataframe(df_predict[["DATE", "MONTANT_EUR"]])
-
-                if len(df_predict) < 2:
-                    st.info(f"Données insuffisantes pour une prévision (un seul mois disponible pour {predict_by.lower()} '{selected_option}'). Affichage des données existantes.")
-                    fig_predict = px.line(df_predict, x="DATE", y="MONTANT_EUR", title=f"{t['forecast']} pour {selected_option}", color_discrete_sequence=color_schemes[color_scheme])
-                    st.plotly_chart(fig_predict, use_container_width=True)
-                else:
-                    X = df_predict[["time_index"]]  # Keep as DataFrame
-                    y = df_predict["MONTANT_EUR"]
-                    model = LinearRegression()
-                    model.fit(X, y)
-                    future_dates = pd.date_range(start=df_predict["DATE"].max() + pd.offsets.MonthBegin(1), periods=6, freq="MS")
-                    future_time_index = pd.DataFrame([(date - df_predict["DATE"].min()).days for date in future_dates], columns=["time_index"])
-                    future_predictions = model.predict(future_time_index)
-                    fig_predict = px.line(df_predict, x="DATE", y="MONTANT_EUR", title=f"{t['forecast']} pour {selected_option}", color_discrete_sequence=color_schemes[color_scheme])
-                    fig_predict.add_scatter(x=future_dates, y=future_predictions, mode="lines+markers", name="Prévision", line=dict(dash="dash"))
-                    st.plotly_chart(fig_predict, use_container_width=True)
-
-        st.subheader(t["compare_fournisseurs"])
-        fournisseurs_compare = st.multiselect(t["supplier"], df_po_filtered["FOURNISSEUR"].unique(), default=df_po_filtered["FOURNISSEUR"].unique()[:3], key="compare_fournisseurs")
-        if fournisseurs_compare:
-            df_compare = df_po_filtered[df_po_filtered["FOURNISSEUR"].isin(fournisseurs_compare)]
-            df_compare = df_compare.groupby("FOURNISSEUR").agg({
-                "MONTANT_EUR": "sum",
-                "QUANTITE": "sum",
-                "PO_NUMBER": "count"
-            }).reset_index()
-            df_compare["Taux_Pending"] = df_compare["FOURNISSEUR"].apply(
-                lambda x: len(df_po_filtered[(df_po_filtered["FOURNISSEUR"] == x) & (df_po_filtered["STATUT"] == "En attente")]) / 
-                          len(df_po_filtered[df_po_filtered["FOURNISSEUR"] == x]) * 100 if len(df_po_filtered[df_po_filtered["FOURNISSEUR"] == x]) > 0 else 0
-            )
-            df_compare = df_compare.merge(df_pt_filtered[["FOURNISSEUR", "NEW_DAYS"]], on="FOURNISSEUR", how="left")
-            for col in ["MONTANT_EUR", "QUANTITE", "Taux_Pending", "NEW_DAYS"]:
-                df_compare[col] = (df_compare[col] - df_compare[col].min()) / (df_compare[col].max() - df_compare[col].min() + 1e-6)
-            
-            fig_radar = go.Figure()
-            for fournisseur in fournisseurs_compare:
-                df_fournisseur = df_compare[df_compare["FOURNISSEUR"] == fournisseur]
-                fig_radar.add_trace(go.Scatterpolar(
-                    r=df_fournisseur[["MONTANT_EUR", "QUANTITE", "Taux_Pending", "NEW_DAYS"]].values.flatten().tolist() + [df_fournisseur["MONTANT_EUR"].iloc[0]],
-                    theta=["Montant", "Quantité", "Taux Pending", "Délai Paiement", "Montant"],
-                    fill="toself",
-                    name=fournisseur
-                ))
-            fig_radar.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 1])), showlegend=True, title=t["compare_fournisseurs"])
-            st.plotly_chart(fig_radar, use_container_width=True)
-
-        st.subheader(t["reorder"])
-        type_achat_reorder = st.multiselect(t["purchase_type"], df_po_filtered["TYPE_ACHAT"].unique(), key="reorder_type")
-        threshold = st.number_input(t["reorder_threshold"], min_value=0, value=100, step=10)
-        if type_achat_reorder:
-            df_reorder = df_po_filtered[df_po_filtered["TYPE_ACHAT"].isin(type_achat_reorder)].groupby("TYPE_ACHAT").agg({"QUANTITE": "sum"}).reset_index()
-            df_reorder["Suggestion"] = df_reorder["QUANTITE"].apply(lambda x: t["reorder"] if x < threshold else "Stock suffisant")
-            st.dataframe(df_reorder)
-
-        st.subheader("Purchase Orders Details")
-        search_term = st.text_input("Search PO", "", key="po_search")
-        filtered_df = df_po_filtered[["PO_NUMBER", "FOURNISSEUR", "DEPARTEMENT", "MONTANT_EUR", "QUANTITE", "DATE", "STATUT"]]
-        if search_term:
-            filtered_df = filtered_df[filtered_df.apply(lambda row: search_term.lower() in str(row).lower(), axis=1)]
-        gb = GridOptionsBuilder.from_dataframe(filtered_df)
-        gb.configure_pagination(paginationAutoPageSize=True)
-        gb.configure_side_bar()
-        gb.configure_default_column(editable=True, groupable=True)
-        grid_options = gb.build()
-        AgGrid(filtered_df, gridOptions=grid_options, height=200, width='100%', fit_columns_on_grid_load=True)
-
-        st.subheader(t["comments"])
-        selected_po = st.text_input("PO_NUMBER", key="comment_po_number")
-        comment = st.text_area(t["comment_text"], key="comment_text")
-        user = st.text_input(t["comment_user"], key="comment_user")
-        if st.button(t["add_comment"], key="add_comment_po"):
-            if comment and user and selected_po:
-                conn, cursor = get_sqlite_connection()
-                try:
-                    cursor.execute("INSERT INTO comments (id, type, comment, user, timestamp) VALUES (?, ?, ?, ?, ?)", 
-                                   (selected_po, "PO", comment, user, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-                    conn.commit()
-                    st.success("Commentaire ajouté !")
-                finally:
-                    conn.close()
-        conn, cursor = get_sqlite_connection()
-        try:
-            comments_df = pd.read_sql_query("SELECT * FROM comments WHERE id = ? AND type = ?", conn, params=(selected_po, "PO"))
-            st.dataframe(comments_df[["comment", "user", "timestamp"]], use_container_width=True)
-        finally:
-            conn.close()
+            get_scorecard = partial(supplier_scorecards, po_rollup, df_pt_filtered, data_version, filter_state)
+        scorecard_section(df_po_filtered, get_scorecard)
+        reorder_section(po_rollup, df_po_filtered)
+        po_grid_section(po_mask, df_po, df_pt, df_contracts, data_version)
+        comments_section("PO", "PO_NUMBER", ("comment_po_number", "comment_text", "comment_user", "add_comment_po"), "tab1.po_comments")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+profiler.mark("tab2")
 with tab2:
     st.markdown('<div class="section">', unsafe_allow_html=True)
     st.subheader(t["pt_header"])
-    if df_pt_filtered.empty:
+    if tab2.open and df_pt_filtered.empty:
         st.warning(t["no_data"])
-    else:
-        fig_new_terms = None
-        fig_old_terms = None
+    elif tab2.open:
+        profiler.mark("tab2.analytics", 1)
+        pt_analytics = payment_terms_analytics(df_pt_filtered, data_version, filter_state)
 
         col1, col2 = st.columns(2)
         with col1:
             st.subheader(t["new_terms"])
-            fig_new_terms = px.pie(
-                df_pt_filtered.groupby(pd.cut(df_pt_filtered["NEW_DAYS"], bins=[0, 45, 60, float("inf")],
-                                              labels=["≤45 days", "45-60 days", "≥60 days"])).size().reset_index(name="Count"),
-                names="NEW_DAYS",
-                values="Count",
-                hole=0.4,
-                title=t["new_terms"],
-                color_discrete_sequence=color_schemes[color_scheme]
-            )
-            st.plotly_chart(fig_new_terms, use_container_width=True)
+            st.plotly_chart(pt_analytics.terms_figure("new", t["new_terms"], colors), use_container_width=True)
 
         with col2:
             st.subheader(t["old_terms"])
-            fig_old_terms = px.pie(
-                df_pt_filtered.groupby(pd.cut(df_pt_filtered["OLD_DAYS"], bins=[0, 45, 60, float("inf")],
-                                              labels=["≤45 days", "45-60 days", "≥60 days"])).size().reset_index(name="Count"),
-                names="OLD_DAYS",
-                values="Count",
-                hole=0.4,
-                title=t["old_terms"],
-                color_discrete_sequence=color_schemes[color_scheme]
-            )
-            st.plotly_chart(fig_old_terms, use_container_width=True)
+            st.plotly_chart(pt_analytics.terms_figure("old", t["old_terms"], colors), use_container_width=True)
 
-        st.subheader(t["heatmap"])
-        metric = st.selectbox("Métrique", ["Turnover (EUR)", "Délai Paiement (jours)"], key="heatmap_metric")
-        df_heatmap = df_pt_filtered.groupby(["FOURNISSEUR", "DIVISION"]).agg({
-            "TURNOVER_EUR": "sum",
-            "NEW_DAYS": "mean"
-        }).reset_index()
-        if metric == "Turnover (EUR)":
-            z = df_heatmap.pivot(index="FOURNISSEUR", columns="DIVISION", values="TURNOVER_EUR").fillna(0)
-        else:
-            z = df_heatmap.pivot(index="FOURNISSEUR", columns="DIVISION", values="NEW_DAYS").fillna(0)
-        fig_heatmap = px.imshow(z, title=f"{t['heatmap']} ({metric})", color_continuous_scale=color_schemes[color_scheme])
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+        heatmap_section(pt_analytics, colors)
 
+        profiler.mark("tab2.kpis", 1)
         st.subheader(t["kpis"])
         col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
         with col_kpi1:
-            turnover_total = df_pt_filtered["TURNOVER_EUR"].sum()
-            st.metric(t["turnover"], f"{turnover_total:,.2f}")
+            st.metric(t["turnover"], f"{pt_analytics.kpis['turnover']:,.2f}")
         with col_kpi2:
-            improved_suppliers = len(df_pt_filtered[df_pt_filtered["NEW_DAYS"] < df_pt_filtered["OLD_DAYS"]])
-            total_suppliers = len(df_pt_filtered)
-            pt_improvement = (improved_suppliers / total_suppliers) * 100 if total_suppliers > 0 else 0
-            st.metric(t["improvement"], f"{pt_improvement:.2f}")
+            st.metric(t["improvement"], f"{pt_analytics.kpis['improvement']:.2f}")
         with col_kpi3:
-            cash_flow_gain = ((df_pt_filtered["OLD_DAYS"] - df_pt_filtered["NEW_DAYS"]) * df_pt_filtered["TURNOVER_EUR"] / 360).sum()
-            st.metric(t["cash_flow"], f"{cash_flow_gain:,.2f}")
+            st.metric(t["cash_flow"], f"{pt_analytics.kpis['cash_flow']:,.2f}")
 
         st.subheader(t["terms_by_division"])
-        df_division = df_pt_filtered.groupby("DIVISION").agg({"NEW_DAYS": "mean", "OLD_DAYS": "mean", "TURNOVER_EUR": "sum"}).reset_index()
-        fig_division = px.bar(df_division, x="DIVISION", y=["NEW_DAYS", "OLD_DAYS"], barmode="group", title=t["terms_by_division"], color_discrete_sequence=color_schemes[color_scheme])
-        fig_division.add_scatter(x=df_division["DIVISION"], y=df_division["TURNOVER_EUR"], mode="lines+markers", name="Turnover", yaxis="y2")
-        fig_division.update_layout(yaxis2=dict(title="Turnover (EUR)", overlaying="y", side="right"), yaxis_title="Days")
-        st.plotly_chart(fig_division, use_container_width=True)
+        st.plotly_chart(pt_analytics.division_figure(t["terms_by_division"], colors), use_container_width=True)
 
         st.subheader("KPI by Division")
-        kpi_df = df_pt_filtered.groupby("DIVISION").agg({"TURNOVER_EUR": "sum", "NEW_DAYS": "mean", "OLD_DAYS": "mean"}).reset_index()
-        kpi_df["Improvement"] = ((kpi_df["OLD_DAYS"] - kpi_df["NEW_DAYS"]) / kpi_df["OLD_DAYS"] * 100).round(2)
-        st.dataframe(kpi_df, use_container_width=True)
+        st.dataframe(pt_analytics.division_table, use_container_width=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+profiler.mark("tab3")
 with tab3:
     st.markdown('<div class="section">', unsafe_allow_html=True)
     st.subheader(t["contract_header"])
-    if df_contracts_filtered.empty:
+    if tab3.open and df_contracts_filtered.empty:
         st.warning(t["no_data"])
-    else:
-        gb = GridOptionsBuilder.from_dataframe(df_contracts_filtered)
-        gb.configure_pagination(paginationAutoPageSize=True)
-        gb.configure_side_bar()
-        gb.configure_default_column(editable=False, groupable=True)
-        grid_options = gb.build()
-        AgGrid(df_contracts_filtered, gridOptions=grid_options, height=200, width='100%', fit_columns_on_grid_load=True)
+    elif tab3.open:
+        contracts_grid_section(contracts_mask, df_po, df_contracts, data_version)
 
         if smtp_available and st.button(t["send_contract_reminders"], key="send_contract_reminders"):
-            notifications_sent = 0
-            for _, row in df_contracts_filtered.iterrows():
-                days_left = (row["DATE_EXPIRATION"] - pd.Timestamp.now()).days
-                if days_left <= 60 and pd.notna(row["RESPONSABLE_EMAIL"]):
-                    subject = f"Rappel : Contrat {row['CONTRAT']} expire bientôt"
-                    body = f"Le contrat {row['CONTRAT']} avec {row['FOURNISSEUR']} expire dans {days_left} jours.\nDate d'expiration : {row['DATE_EXPIRATION'].strftime('%d/%m/%Y')}"
-                    if send_email(subject, body, row["RESPONSABLE_EMAIL"]):
-                        notifications_sent += 1
-            if notifications_sent > 0:
-                st.success(f"{notifications_sent} rappel(s) envoyé(s).")
+            batch = send_digests(collect_contract_reminders(df_contracts_filtered), "reminders_batch")
+            if batch is not None and batch.total > 0:
+                st.success(f"{batch.total} rappel(s) en cours d'envoi.")
         else:
             st.info("Aucun rappel à envoyer.")
+        show_mail_batch("reminders_batch")
 
-        st.subheader(t["comments"])
-        selected_contract = st.text_input("CONTRAT", key="comment_contract_number")
-        comment = st.text_area(t["comment_text"], key="comment_text_contract")
-        user = st.text_input(t["comment_user"], key="comment_user_contract")
-        if st.button(t["add_comment"], key="add_comment_contract"):
-            if comment and user and selected_contract:
-                conn, cursor = get_sqlite_connection()
-                try:
-                    cursor.execute("INSERT INTO comments (id, type, comment, user, timestamp) VALUES (?, ?, ?, ?, ?)", 
-                                   (selected_contract, "Contract", comment, user, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-                    conn.commit()
-                    st.success("Commentaire ajouté !")
-                finally:
-                    conn.close()
-        conn, cursor = get_sqlite_connection()
-        try:
-            comments_df = pd.read_sql_query("SELECT * FROM comments WHERE id = ? AND type = ?", conn, params=(selected_contract, "Contract"))
-            st.dataframe(comments_df[["comment", "user", "timestamp"]], use_container_width=True)
-        finally:
-            conn.close()
+        comments_section("Contract", "CONTRAT", ("comment_contract_number", "comment_text_contract", "comment_user_contract", "add_comment_contract"), "tab3.comments")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
-# Export PowerPoint
+profiler.mark("export")
+
+# Export PowerPoint: the figures are rebuilt with the views last picked in the tabs, whichever
+# tab is open (the figure cache renders each one only once)
 st.markdown('<div class="section">', unsafe_allow_html=True)
 if st.button(t["export_ppt"], key="export_ppt_btn"):
-    figs = {
-        "po_by_dept": fig_po_count,
-        "status_dist": fig_status,
-        "type_dist": fig_type,
-        "new_terms": fig_new_terms,
-        "old_terms": fig_old_terms
-    }
-    ppt_buffer = export_to_ppt(df_po_filtered, df_pt_filtered, df_contracts_filtered, figs)
-    st.download_button(label=t["export_ppt"], data=ppt_buffer.getvalue(), file_name="dashboard_report.pptx", 
-                       mime="application/vnd.openxmlformats-officedocument.presentationml.presentation", key="download_ppt")
+    figures = []
+    if not df_po_filtered.empty:
+        po_rollup = filtered_rollup()
+        figures += [
+            (t["po_by_dept"], po_by_dept_figure(po_rollup, kept("po_view", "Monthly"), colors)),
+            (t["status_dist"], status_figure(po_rollup, colors)),
+            (t["type_dist"], type_figure(po_rollup, colors)),
+        ]
+    if not df_pt_filtered.empty:
+        pt_analytics = payment_terms_analytics(df_pt_filtered, data_version, filter_state)
+        figures += [
+            (t["new_terms"], pt_analytics.terms_figure("new", t["new_terms"], colors)),
+            (t["old_terms"], pt_analytics.terms_figure("old", t["old_terms"], colors)),
+        ]
+    st.session_state["ppt_job"] = start_report(
+        figures,
+        [(t["po_tab"], df_po_filtered), (t["pt_tab"], df_pt_filtered), (t["contract_tab"], df_contracts_filtered)],
+        figure_cache=get_figure_cache(),
+    )
+show_report_job()
 st.markdown('</div>', unsafe_allow_html=True)
 
 # Footer
 st.markdown("---")
 st.markdown(f"{t['footer']} {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+profiler.finish()
+
+# Profiler panel, for admins only
+if is_admin(st.session_state.user_email):
+    with st.sidebar.expander("Profilage ⏱️"):
+        st.checkbox("Activer le profilage", key="profiler_enabled")
+        st.checkbox("Mesurer la mémoire (tracemalloc, tout le processus)", key="profiler_memory")
+    if profiler.runs:
+        show_profiler_panel(profiler)